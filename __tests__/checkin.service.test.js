@@ -36,6 +36,65 @@ describe('CheckinService', () => {
 //     });
 //   });
 
+  describe('createCheckinsBulk', () => {
+    const item = (userId, phasedayId) => ({
+      userId,
+      campaignId: new mongoose.Types.ObjectId().toString(),
+      phaseId: new mongoose.Types.ObjectId().toString(),
+      phasedayId,
+      method: 'face',
+    });
+
+    it('should insert new checkins in one call and report existing ones as 409', async () => {
+      const phasedayId = new mongoose.Types.ObjectId().toString();
+      const existedUser = new mongoose.Types.ObjectId().toString();
+      const newUser = new mongoose.Types.ObjectId().toString();
+      Checkin.find.mockReturnValue({
+        lean: jest.fn().mockResolvedValue([{ userId: existedUser, phasedayId }]),
+      });
+      Checkin.insertMany.mockResolvedValue([]);
+
+      const results = await checkinService.createCheckinsBulk([
+        item(existedUser, phasedayId),
+        item(newUser, phasedayId),
+        { userId: newUser },
+        item(newUser, phasedayId),
+      ]);
+
+      expect(results.map(r => r.status)).toEqual([409, 201, 400, 409]);
+      expect(Checkin.find).toHaveBeenCalledTimes(1);
+      expect(Checkin.insertMany).toHaveBeenCalledTimes(1);
+      expect(Checkin.insertMany.mock.calls[0][0]).toHaveLength(1);
+    });
+
+    it('should report duplicate key errors from insertMany as 409', async () => {
+      const phasedayId = new mongoose.Types.ObjectId().toString();
+      const users = [new mongoose.Types.ObjectId().toString(), new mongoose.Types.ObjectId().toString()];
+      Checkin.find.mockReturnValue({ lean: jest.fn().mockResolvedValue([]) });
+      Checkin.insertMany.mockRejectedValue(
+        Object.assign(new Error('E11000'), { writeErrors: [{ index: 1, code: 11000 }] })
+      );
+
+      const results = await checkinService.createCheckinsBulk(users.map(u => item(u, phasedayId)));
+
+      expect(results.map(r => r.status)).toEqual([201, 409]);
+    });
+
+    it('should report other insertMany write errors as 500 with the error message', async () => {
+      const phasedayId = new mongoose.Types.ObjectId().toString();
+      const users = [new mongoose.Types.ObjectId().toString(), new mongoose.Types.ObjectId().toString()];
+      Checkin.find.mockReturnValue({ lean: jest.fn().mockResolvedValue([]) });
+      Checkin.insertMany.mockRejectedValue(Object.assign(new Error('bulk write failed'), {
+        writeErrors: [{ index: 0, err: { code: 121, errmsg: 'Document failed validation' } }],
+      }));
+
+      const results = await checkinService.createCheckinsBulk(users.map(u => item(u, phasedayId)));
+
+      expect(results.map(r => r.status)).toEqual([500, 201]);
+      expect(results[0].message).toContain('Document failed validation');
+    });
+  });
+
   describe('getCheckinStatusByPhaseday', () => {
     it('should return true if user has checked in', async () => {}, 10000);
 
@@ -1,4 +1,4 @@
-import { createCheckin } from "../services/checkin.service.js";
+import { createCheckin, createCheckinsBulk } from "../services/checkin.service.js";
 
 import { getCheckinStatusByPhaseday } from "../services/checkin.service.js";
 
@@ -34,3 +34,24 @@ export const postCheckin = async (req, res) => {
   }
 };
 
+const BULK_CHECKIN_MAX_ITEMS = 500;
+
+export const postCheckinBulk = async (req, res) => {
+  try {
+    const { items } = req.body;
+
+    if (!Array.isArray(items) || items.length === 0) {
+      return res.status(400).json({ message: "Thiếu danh sách check-in." });
+    }
+    if (items.length > BULK_CHECKIN_MAX_ITEMS) {
+      return res.status(400).json({ message: `Tối đa ${BULK_CHECKIN_MAX_ITEMS} check-in mỗi lần.` });
+    }
+
+    const results = await createCheckinsBulk(items);
+    return res.status(200).json({ results });
+
+  } catch (err) {
+    console.error("❌ Lỗi controller:", err);
+    return res.status(500).json({ message: "Lỗi server khi xử lý check-in." });
+  }
+};
@@ -1,17 +1,13 @@
-import os
-import requests
 import logging
 from bson import ObjectId
 from utils import extract_campaign_name
 from database import campaign_collection
-from dotenv import load_dotenv
-load_dotenv()
+from campaign_index import find_campaign
+import http_client
 
 logger = logging.getLogger(__name__)
 
-BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:4000")
-
-def register_campaign_from_input(user_input: str, token: str = None):
+async def register_campaign_from_input(user_input: str, token: str = None):
     if not token:
         return "Anh/chị cần đăng nhập trước khi đăng ký chiến dịch nha 🫣!"
 
@@ -19,18 +15,16 @@ def register_campaign_from_input(user_input: str, token: str = None):
     if not name:
         return "Em chưa nhận ra tên chiến dịch nào trong câu nói 😵 Anh/chị nói rõ hơn nha!"
 
-    campaign = campaign_collection.find_one({
-        "name": {"$regex": f"^{name}$", "$options": "i"},
-        "acceptStatus": "approved"
-    })
+    campaign, _ = await find_campaign(campaign_collection, name, {"name": 1})
     if not campaign:
         return f"Em không tìm thấy chiến dịch tên **{name}** đã được duyệt á 😢"
+    name = campaign["name"]
 
     campaign_id = str(campaign["_id"])
-    url = f"{BACKEND_URL}/campaigns/{campaign_id}/register"
+    url = f"/campaigns/{campaign_id}/register"
 
     try:
-        response = requests.post(
+        response = await http_client.post(
             url,
             headers={"Authorization": token}
         )
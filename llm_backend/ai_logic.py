@@ -1,310 +1,266 @@
-import os
 import logging
 import re
-from datetime import datetime, timedelta
+from functools import partial
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from openai import OpenAI
-from action_intents import handle_action_intents, normalize_user_input
+from action_intents import normalize_user_input, CERTIFICATE_TRIGGERS, CERTIFICATE_REPLY
 import traceback
-import re
 from bson import ObjectId
-from bson.errors import InvalidId
 from actions import register_campaign_from_input
-from utils import extract_campaign_name
-
-# Cấu hình logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("chatbot.log"),
-        logging.StreamHandler()
-    ]
-)
+from utils import extract_campaign_name, format_date
+from campaign_context import build_campaign_context
+from context_budget import CONTEXT_TOKEN_BUDGET, ContextReport, count_tokens, detect_question_types, fit_sections, context_mode
+from campaign_index import find_campaign
+from intent_router import IntentRouter, ChatTurn
+from task_resolver import resolve_user_tasks, today_range, week_range
+from database import campaign_collection
+from llm_client import stream_chat, embed_texts, LLMBusy
+from rag.index import retrieve, render_chunks, worth_retrieving, GENERAL
+from response_cache import response_cache
+from session_store import session_store, session_key
+from tracing import stage
+
 logger = logging.getLogger(__name__)
 
 # Load biến môi trường
 load_dotenv()
 
-# Kết nối MongoDB
-mongo_uri = os.getenv("MONGO_URI")
-if not mongo_uri:
-    raise ValueError("MONGO_URI không được thiết lập")
-mongo_client = MongoClient(mongo_uri)
-db = mongo_client["VHHT"]
-campaign_collection = db["campaigns"]
-phase_collection = db["phases"]
-phase_day_collection = db["phasedays"]
-task_collection = db["tasks"]
-department_collection = db["departments"]
-user_collection = db["users"]
-
-# Kết nối OpenAI
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY không được thiết lập")
-client = OpenAI(api_key=api_key)
-
-# Biến toàn cục lưu campaign cuối cùng
-last_campaign = None
-
-def format_date(d):
-    try:
-        if isinstance(d, str):
-            return datetime.strptime(d, "%Y-%m-%dT%H:%M:%S.%fZ").strftime("%d/%m/%Y")
-        return d.strftime("%d/%m/%Y")
-    except:
-        return str(d)
-
-def get_campaign_by_name(name: str):
-    return campaign_collection.find_one({
-        "name": {"$regex": f"^{re.escape(name)}$", "$options": "i"},
-        "acceptStatus": "approved"
-    })
-
-def build_campaign_context(campaign):
-    campaign_id = campaign["_id"]
-    
-    # ==== Volunteers ====
-    volunteers = campaign.get("volunteers", [])
-    status_summary = {}
-    for vol in volunteers:
-        status = vol.get("status", "unknown")
-        status_summary[status] = status_summary.get(status, 0) + 1
-    volunteer_info = ", ".join([f"{k}: {v}" for k, v in status_summary.items()])
-    total_volunteers = len(volunteers)
-
-    # ==== Phases & PhaseDays ====
-    phases = list(phase_collection.find({"campaignId": campaign_id}))
-    phase_info_lines = []
-    phase_day_ids = []
-    for i, p in enumerate(phases):
-        phase_info_lines.append(f"{i+1}. {p['name']} ({format_date(p['startDate'])} - {format_date(p['endDate'])})")
-        phase_days = list(phase_day_collection.find({ "phaseId": p["_id"] }))
-        phase_day_ids.extend([d["_id"] for d in phase_days])
-    phase_info = "\n".join(phase_info_lines) or "Không có giai đoạn nào cả."
-
-    # ==== Tasks ====
-    tasks = list(task_collection.find({ "phaseDayId": {"$in": phase_day_ids} }))
-    task_titles = [t.get("title", "(Không tên)") for t in tasks]
-    task_info = ", ".join(task_titles[:10])
-    if len(task_titles) > 10:
-        task_info += f", ... (tổng cộng {len(task_titles)} nhiệm vụ)"
-
-    # ==== Departments ====
-    departments = list(department_collection.find({"campaignId": campaign_id}))
-    department_info = ", ".join([d.get("name", "Không tên") for d in departments]) or "Không có phòng ban nào."
-
-    # ==== Return context string ====
-    return f"""
-📌 Tên chiến dịch: {campaign.get('name')}
-📅 Thời gian: {format_date(campaign.get('startDate'))} đến {format_date(campaign.get('endDate'))}
-📍 Địa điểm: {campaign.get('location', {}).get('address', 'Không rõ')}
-📝 Mô tả: {campaign.get('description', 'Không có mô tả')}
-🧑‍🤝‍🧑 Tình nguyện viên: {total_volunteers} người ({volunteer_info})
-📜 Chứng chỉ: {'Đã phát' if campaign.get('certificatesIssued') else 'Chưa phát'}
-
-🗓️ Giai đoạn:
-{phase_info}
-
-✅ Nhiệm vụ tiêu biểu:
-{task_info}
-
-🏢 Phòng ban:
-{department_info}
-"""
+async def get_campaign_by_name(name: str):
+    # Khớp gần đúng qua index tên trong RAM (bỏ dấu, chịu được từ thừa), không quét $regex
+    campaign, _ = await find_campaign(campaign_collection, name)
+    return campaign
 
-def to_objectid_safe(id):
-    if isinstance(id, ObjectId):
-        return id
-    try:
-        return ObjectId(str(id))
-    except InvalidId:
-        return None
+CAMPAIGN_INTRO = "Dưới đây là thông tin về một chiến dịch thiện nguyện:"
+KNOWLEDGE_INTRO = "Dưới đây là một số thông tin liên quan từ hệ thống VHHT:"
 
-def get_task_details(task):
-    title = task.get('title', '(Không tên nhiệm vụ)')
-    task_date = "Không rõ ngày"
-    phase_name = "Không rõ giai đoạn"
-    campaign_name = "Không rõ chiến dịch"
+def build_rag_messages(context: str, user_input: str, intro: str = CAMPAIGN_INTRO):
+    prompt = f"""
+{intro}
 
-    try:
-        # 🌱 Log task info
-        logger.debug(f"🔍 Task: {title} | phaseDayId = {task.get('phaseDayId')}")
+{context}
 
-        # Ép phaseDayId về ObjectId nếu cần
-        phase_day_id = to_objectid_safe(task.get("phaseDayId"))
-        if not phase_day_id:
-            logger.debug(f"⚠️ phaseDayId không hợp lệ: {task.get('phaseDayId')}")
-            return title, task_date, phase_name, campaign_name
+Câu hỏi của người dùng: "{user_input}"
 
-        phase_day = phase_day_collection.find_one({ "_id": phase_day_id })
-        if not phase_day:
-            logger.debug(f"⚠️ Không tìm thấy phaseDay với _id = {phase_day_id}")
-            return title, task_date, phase_name, campaign_name
+→ Trả lời bằng tiếng Việt tự nhiên, dễ thương, gần gũi như Gen Z. KHÔNG bịa đặt. Nếu thiếu thông tin thì nói kiểu: "Chưa rõ phần này nha, để mình tìm thêm!"
+"""
+    return [{"role": "user", "content": prompt}]
 
-        logger.debug(f"✅ phaseDay: {phase_day.get('date')} | phaseId = {phase_day.get('phaseId')}")
+def _rag_chat(context: str, user_input: str, intro: str, report: ContextReport = None):
+    on_first_token = report.record if report is not None else None
+    return stream_chat(build_rag_messages(context, user_input, intro), on_first_token=on_first_token)
 
-        if "date" in phase_day:
-            task_date = format_date(phase_day["date"])
+async def call_openai_rag(context: str, user_input: str, intro: str = CAMPAIGN_INTRO, report: ContextReport = None):
+    try:
+        return "".join([delta async for delta in _rag_chat(context, user_input, intro, report)])
+    except LLMBusy:
+        raise
+    except Exception as e:
+        logger.error(f"Lỗi gọi OpenAI: {e}\n{traceback.format_exc()}")
+        return "Có lỗi khi gọi GPT"
 
-        # Ép phaseId về ObjectId nếu cần
-        phase_id = to_objectid_safe(phase_day.get("phaseId"))
-        if not phase_id:
-            logger.debug(f"⚠️ phaseId không hợp lệ: {phase_day.get('phaseId')}")
-            return title, task_date, phase_name, campaign_name
+async def stream_openai_rag(context: str, user_input: str, intro: str = CAMPAIGN_INTRO, report: ContextReport = None,
+                            on_complete=None):
+    """Bản streaming của call_openai_rag: yield từng đoạn câu trả lời ngay khi có.
+    on_complete(câu trả lời) chỉ được gọi khi stream chạy hết không lỗi (vd để lưu cache)."""
+    parts = []
+    try:
+        async for delta in _rag_chat(context, user_input, intro, report):
+            parts.append(delta)
+            yield delta
+    except LLMBusy:
+        raise
+    except Exception as e:
+        # Câu trả lời dở dang + thông báo lỗi: không được gọi on_complete
+        logger.error(f"Lỗi gọi OpenAI (stream): {e}\n{traceback.format_exc()}")
+        yield "Có lỗi khi gọi GPT"
+        return
+    if on_complete is not None:
+        await on_complete("".join(parts))
+
+async def lookup_answer(campaign_id, scope: str, user_input: str):
+    """(câu trả lời đã cache hoặc None, token để store() khi trượt); scope là nội dung quyết định câu trả lời."""
+    if response_cache is None:
+        return None, None
+    return await response_cache.lookup(campaign_id, scope, user_input)
+
+async def generate_answer(context: str, user_input: str, stream: bool = False, intro: str = CAMPAIGN_INTRO,
+                          report: ContextReport = None, cache_token=None):
+    """Gọi GPT (stream hoặc không); có cache_token thì lưu câu trả lời khi xong không lỗi."""
+    if stream:
+        on_complete = partial(response_cache.store, cache_token) if cache_token is not None else None
+        return stream_openai_rag(context, user_input, intro, report, on_complete)
+
+    reply = await call_openai_rag(context, user_input, intro, report)
+    if cache_token is not None:
+        await response_cache.store(cache_token, reply)
+    return reply
+
+async def answer_from_context(campaign_id, context: str, user_input: str, stream: bool = False,
+                              intro: str = CAMPAIGN_INTRO):
+    """Trả lời bằng GPT, dùng lại câu trả lời đã cache nếu cùng campaign + context + câu hỏi."""
+    cached, cache_token = await lookup_answer(campaign_id, context, user_input)
+    if cached is not None:
+        return cached
+    return await generate_answer(context, user_input, stream, intro, cache_token=cache_token)
+
+async def answer_campaign_question(campaign, user_input: str, stream: bool = False):
+    """Trả lời câu hỏi về một chiến dịch: context chiến dịch + vài đoạn kiến thức chung liên quan (nếu có).
+
+    Mặc định chỉ gửi các phần ứng với loại câu hỏi, vừa CONTEXT_TOKEN_BUDGET token (kiến thức
+    chung dùng phần ngân sách còn lại); một tỉ lệ nhỏ câu hỏi gửi bản đầy đủ làm đối chứng.
+
+    Cache câu trả lời được tra trước khi retrieve (trúng thì không tốn call embedding lẫn slot OpenAI),
+    theo phiên bản context chiến dịch + loại câu hỏi, nên bản rút gọn và bản đầy đủ dùng chung cache;
+    câu hỏi đối chứng thì bỏ qua cache."""
+    with stage("context"):
+        campaign_context = await build_campaign_context(campaign)
+        question_types = detect_question_types(user_input)
+        mode = context_mode()
+        compact = mode == "compact"
+        if compact:
+            context, tokens = campaign_context.compact(question_types)
+        else:
+            context, tokens = campaign_context.full, campaign_context.full_tokens
+
+    cache_token = None
+    if mode != "holdout":
+        scope = f"{campaign_context.version}:{','.join(sorted(question_types))}"
+        cached, cache_token = await lookup_answer(campaign["_id"], scope, user_input)
+        if cached is not None:
+            return cached
+
+    with stage("retrieval"):
+        results = await retrieve(user_input, embed_texts, scope=GENERAL)
+    full_tokens = campaign_context.full_tokens
+    if results:
+        knowledge = render_chunks(results)
+        knowledge_tokens = count_tokens(knowledge)
+        full_tokens += knowledge_tokens
+        if compact:
+            knowledge, knowledge_tokens = fit_sections([(knowledge, knowledge_tokens)], CONTEXT_TOKEN_BUDGET - tokens)
+        if knowledge:
+            context += f"\n📚 Kiến thức liên quan:\n{knowledge}\n"
+            tokens += knowledge_tokens
+    report = ContextReport("compact" if compact else "full", question_types, full_tokens, tokens)
+    return await generate_answer(context, user_input, stream, CAMPAIGN_INTRO, report, cache_token)
+
+async def answer_user_question(user_input: str, user_id: str = None, token: str = None,
+                               stream: bool = False, session_id: str = None):
+    """Trả về câu trả lời dạng str. Với stream=True, nhánh cần gọi GPT trả về
+    async generator các đoạn text thay vì chờ cả câu trả lời.
+
+    Campaign đang nói tới được nhớ theo phiên (user id trong access token / token / session id),
+    không dùng chung giữa các người dùng."""
+    key = session_key(token, session_id)
+    with stage("session"):
+        session = await session_store.touch(key)
+    turn = ChatTurn(
+        text=user_input,
+        lower=normalize_user_input(user_input),
+        user_id=user_id,
+        token=token,
+        stream=stream,
+        session_key=key,
+        session=session,
+    )
+    return await router.dispatch(turn)
+
+# === Định tuyến intent: thứ tự khai báo = thứ tự ưu tiên ===
+router = IntentRouter()
+
+# Phạm vi "nhiệm vụ ..." → (hàm tính khoảng ngày, câu trả lời khi không có nhiệm vụ)
+TASK_SCOPES = {
+    "hôm nay": (today_range, "Hôm nay bạn không có nhiệm vụ nào cả đó nha 🎉"),
+    "tuần này": (week_range, "Tuần này bạn không có nhiệm vụ nào cả đó 🧘‍♂️ Chill nhaa"),
+}
+
+@router.intent("nhiem_vu", triggers=[r"nhiệm vụ"], pattern=r"nhiệm vụ (của tôi|hôm nay|tuần này)")
+async def handle_my_tasks(turn: ChatTurn, match):
+    if not turn.user_id:
+        return "Bạn chưa đăng nhập nên em không biết bạn là ai á 😅 Đăng nhập để xem nhiệm vụ nha!"
 
-        phase = phase_collection.find_one({ "_id": phase_id })
-        if not phase:
-            logger.debug(f"⚠️ Không tìm thấy phase với _id = {phase_id}")
-            return title, task_date, phase_name, campaign_name
+    try:
+        object_user_id = ObjectId(turn.user_id)
+    except Exception as e:
+        logger.warning("❌ user_id không hợp lệ: %s – %s", turn.user_id, e)
+        return "Thông tin đăng nhập không hợp lệ rồi đó anh/chị 😢"
 
-        phase_name = phase.get("name", phase_name)
-        logger.debug(f"✅ Phase: {phase_name} | campaignId = {phase.get('campaignId')}")
+    scope = next((s for s in TASK_SCOPES if s in turn.lower), None)
+    if scope is not None:
+        range_fn, empty_reply = TASK_SCOPES[scope]
+        date_range = range_fn()
+    else:
+        date_range, empty_reply = None, "Em không thấy nhiệm vụ nào được giao cho anh/chị cả 😢"
 
-        # Ép campaignId về ObjectId nếu cần
-        campaign_id = to_objectid_safe(phase.get("campaignId"))
-        if not campaign_id:
-            logger.debug(f"⚠️ campaignId không hợp lệ: {phase.get('campaignId')}")
-            return title, task_date, phase_name, campaign_name
+    total, tasks = await resolve_user_tasks(object_user_id, date_range, limit=5)
+    if not total:
+        return empty_reply
 
-        campaign = campaign_collection.find_one({ "_id": campaign_id })
-        if not campaign:
-            logger.debug(f"⚠️ Không tìm thấy campaign với _id = {campaign_id}")
-            return title, task_date, phase_name, campaign_name
+    reply = f"🎯 Bạn có {total} nhiệm vụ" + (f" trong {scope}" if scope else "") + ":\n"
 
-        campaign_name = campaign.get("name", campaign_name)
-        logger.debug(f"✅ Campaign: {campaign_name}")
+    for title, task_date, phase_name, campaign_name in tasks:
+        reply += f"- **{title}** (📅 {task_date} – 🧭 {phase_name} – 📌 {campaign_name})\n"
 
-    except Exception as e:
-        logger.warning(f"❌ Lỗi khi lấy thông tin task '{title}': {e}")
+    if total > 5:
+        reply += f"... và {total - 5} nhiệm vụ khác nữa đó nha!"
 
-    return title, task_date, phase_name, campaign_name
+    return reply
 
-def call_openai_rag(context: str, user_input: str):
-    prompt = f"""
-Dưới đây là thông tin về một chiến dịch thiện nguyện:
+@router.intent("dang_ky", triggers=[r"đăng ?k[íýy]", r"tham gia"], pattern=r"(đăng ?k[íýy]|tham gia).+chiến dịch")
+async def handle_register(turn: ChatTurn, match):
+    if not turn.token:
+        return "Bạn cần đăng nhập để đăng ký chiến dịch nha 😅"
+    return await register_campaign_from_input(turn.text, turn.token)
 
-{context}
+@router.intent("chung_chi", triggers=[re.escape(t) for t in CERTIFICATE_TRIGGERS])
+async def handle_certificate(turn: ChatTurn, match):
+    return CERTIFICATE_REPLY
 
-Câu hỏi của người dùng: "{user_input}"
+@router.intent("dang_dien_ra", triggers=[r"đang diễn ra", r"đang chạy"])
+async def handle_running_campaigns(turn: ChatTurn, match):
+    campaigns = await campaign_collection.find({
+        "status": "in-progress",
+        "acceptStatus": "approved"
+    }).limit(5).to_list(None)
+    if not campaigns:
+        return "Hiện tại chưa có chiến dịch nào đang diễn ra."
+
+    reply = "Dưới đây là một vài chiến dịch đang hoạt động nè:\n"
+    for c in campaigns:
+        reply += f"🌱 {c['name']} (Từ {format_date(c['startDate'])} đến {format_date(c['endDate'])})\n"
+    await session_store.update(turn.session_key, campaign_id=campaigns[0]["_id"])
+    reply += "Anh/chị muốn tìm hiểu thêm về chiến dịch nào thì cứ hỏi tiếp nha! 💬"
+    return reply
+
+@router.intent("ten_chien_dich", triggers=[r"chiến dịch", r"tham gia", r"đăng ký", r"vào"])
+async def handle_campaign_question(turn: ChatTurn, match):
+    name = extract_campaign_name(turn.text)
+    if not name:
+        return None
+    campaign = await get_campaign_by_name(name)
+    if not campaign:
+        return f"Hình như chiến dịch tên ‘{name}’ chưa được duyệt hoặc không tồn tại. Anh/chị kiểm tra lại giúp em nha!"
+    await session_store.update(turn.session_key, campaign_id=campaign["_id"])
+    return await answer_campaign_question(campaign, turn.text, turn.stream)
+
+# === Dự phòng: nếu phiên này đã nói tới một chiến dịch thì trả lời theo context đó ===
+@router.intent("theo_phien")
+async def handle_follow_up(turn: ChatTurn, match):
+    campaign_id = turn.session.get("campaignId")
+    if not campaign_id:
+        return None
+    return await answer_campaign_question({"_id": campaign_id}, turn.text, turn.stream)
 
-→ Trả lời bằng tiếng Việt tự nhiên, dễ thương, gần gũi như Gen Z. KHÔNG bịa đặt. Nếu thiếu thông tin thì nói kiểu: "Chưa rõ phần này nha, để mình tìm thêm!"
-"""
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        logger.error(f"Lỗi gọi OpenAI: {e}\n{traceback.format_exc()}")
-        return "Có lỗi khi gọi GPT"
-    
-def answer_user_question(user_input: str, user_id: str = None, token: str = None):
-    global last_campaign
-
-    user_input_lower = normalize_user_input(user_input)
-
-    # === Regex Intent: nhiệm vụ của tôi / hôm nay / tuần này ===
-    match_nhiemvu = re.search(r"nhiệm vụ (của tôi|hôm nay|tuần này)", user_input_lower)
-    if match_nhiemvu:
-        if not user_id:
-            return "Bạn chưa đăng nhập nên em không biết bạn là ai á 😅 Đăng nhập để xem nhiệm vụ nha!"
-
-        try:
-            object_user_id = ObjectId(user_id)
-        except Exception as e:
-            logger.warning(f"❌ user_id không hợp lệ: {user_id} – {e}")
-            return "Thông tin đăng nhập không hợp lệ rồi đó anh/chị 😢"
-
-        match_filter = {"assignedUsers.userId": object_user_id}
-        tasks = list(task_collection.find(match_filter))
-        if not tasks:
-            return "Em không thấy nhiệm vụ nào được giao cho anh/chị cả 😢"
-
-        now = datetime.now()
-        today_str = now.strftime("%Y-%m-%d")
-
-        if "hôm nay" in user_input_lower:
-            tasks = [
-                task for task in tasks
-                if (pd := phase_day_collection.find_one({"_id": task.get("phaseDayId")}))
-                and pd.get("date", "").startswith(today_str)
-            ]
-            if not tasks:
-                return "Hôm nay bạn không có nhiệm vụ nào cả đó nha 🎉"
-
-        elif "tuần này" in user_input_lower:
-            start_week = now - timedelta(days=now.weekday())  # Thứ 2
-            end_week = start_week + timedelta(days=6)         # Chủ nhật
-            tasks = [
-                task for task in tasks
-                if (pd := phase_day_collection.find_one({"_id": task.get("phaseDayId")}))
-                and "date" in pd
-                and start_week.date() <= datetime.strptime(pd["date"], "%Y-%m-%d").date() <= end_week.date()
-            ]
-            if not tasks:
-                return "Tuần này bạn không có nhiệm vụ nào cả đó 🧘‍♂️ Chill nhaa"
-
-        reply = f"🎯 Bạn có {len(tasks)} nhiệm vụ"
-        if "hôm nay" in user_input_lower:
-            reply += " trong hôm nay"
-        elif "tuần này" in user_input_lower:
-            reply += " trong tuần này"
-        reply += ":\n"
-
-        for task in tasks[:5]:
-            title, task_date, phase_name, campaign_name = get_task_details(task)
-            reply += f"- **{title}** (📅 {task_date} – 🧭 {phase_name} – 📌 {campaign_name})\n"
-
-        if len(tasks) > 5:
-            reply += f"... và {len(tasks) - 5} nhiệm vụ khác nữa đó nha!"
-
-        return reply
-
-    # === Đăng ký chiến dịch 📝 ===
-    match_dangky = re.search(r"(đăng[ ]?k[íy]|tham gia).+chiến dịch", user_input_lower)
-    if match_dangky:
-        if not token:
-            return "Bạn cần đăng nhập để đăng ký chiến dịch nha 😅"
-        return register_campaign_from_input(user_input, token)
-
-    # === Intent hành động khác ===
-    action_response = handle_action_intents(user_input_lower)
-    if action_response:
-        return action_response
-
-    # === Các chiến dịch đang diễn ra ===
-    if "đang diễn ra" in user_input_lower or "đang chạy" in user_input_lower:
-        campaigns = list(campaign_collection.find({
-            "status": "in-progress",
-            "acceptStatus": "approved"
-        }).limit(5))
-        if not campaigns:
-            return "Hiện tại chưa có chiến dịch nào đang diễn ra."
-
-        reply = "Dưới đây là một vài chiến dịch đang hoạt động nè:\n"
-        for c in campaigns:
-            reply += f"🌱 {c['name']} (Từ {format_date(c['startDate'])} đến {format_date(c['endDate'])})\n"
-        last_campaign = campaigns[0]
-        reply += "Anh/chị muốn tìm hiểu thêm về chiến dịch nào thì cứ hỏi tiếp nha! 💬"
-        return reply
-
-    # === Tìm theo tên chiến dịch ===
-    name = extract_campaign_name(user_input)
-    if name:
-        campaign = get_campaign_by_name(name)
-        if not campaign:
-            return f"Hình như chiến dịch tên ‘{name}’ chưa được duyệt hoặc không tồn tại. Anh/chị kiểm tra lại giúp em nha!"
-        last_campaign = campaign
-        context = build_campaign_context(campaign)
-        return call_openai_rag(context, user_input)
-
-    # === fallback: nếu đã có last_campaign thì trả lời theo context ===
-    if last_campaign:
-        context = build_campaign_context(last_campaign)
-        return call_openai_rag(context, user_input)
+# === Câu hỏi chung: tìm các đoạn kiến thức / mô tả chiến dịch liên quan ===
+@router.intent("kien_thuc")
+async def handle_knowledge(turn: ChatTurn, match):
+    if not worth_retrieving(turn.text):
+        return None
+    with stage("retrieval"):
+        results = await retrieve(turn.text, embed_texts)
+    if not results:
+        return None
+    return await answer_from_context("knowledge", render_chunks(results), turn.text, turn.stream, KNOWLEDGE_INTRO)
 
+@router.intent("khong_ro")
+async def handle_unknown(turn: ChatTurn, match):
     return "Em không biết anh/chị đang nói đến chiến dịch nào á 😅 Nói rõ tên giúp em nha!"
@@ -0,0 +1,57 @@
+# llm_backend/auth.py
+# Xác thực access token do Node backend ký (JWT HS256 với JWT_SECRET_ACCESS_TOKEN, payload
+# {user_id, role, token_type}) ngay trong process, không phải gọi sang Node cho mỗi request.
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+JWT_SECRET_ACCESS_TOKEN = os.getenv("JWT_SECRET_ACCESS_TOKEN")
+ACCESS_TOKEN_TYPE = 0  # TokenType.AccessToken bên Node (constants/enums.js)
+STAFF_ROLES = {"admin", "manager", "organization"}
+
+if not JWT_SECRET_ACCESS_TOKEN:
+    logger.warning("⚠️ JWT_SECRET_ACCESS_TOKEN chưa được thiết lập, mọi access token sẽ bị từ chối")
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def verify_access_token(authorization: str = None):
+    """Header "Bearer <token>" → payload nếu chữ ký, hạn dùng và loại token hợp lệ; ngược lại None."""
+    if not authorization or not JWT_SECRET_ACCESS_TOKEN:
+        return None
+    parts = authorization.split(" ")
+    token = parts[1] if len(parts) == 2 else None
+    if not token or token.count(".") != 2:
+        return None
+    header_b64, payload_b64, signature_b64 = token.split(".")
+    try:
+        header = json.loads(_b64decode(header_b64))
+        payload = json.loads(_b64decode(payload_b64))
+        signature = _b64decode(signature_b64)
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get("alg") != "HS256":
+        return None
+    expected = hmac.new(
+        JWT_SECRET_ACCESS_TOKEN.encode("utf-8"), f"{header_b64}.{payload_b64}".encode("ascii"), hashlib.sha256,
+    ).digest()
+    if not hmac.compare_digest(signature, expected):
+        return None
+    if not isinstance(payload, dict) or payload.get("token_type") != ACCESS_TOKEN_TYPE:
+        return None
+    exp = payload.get("exp")
+    if exp is not None and exp < time.time():
+        return None
+    return payload
@@ -0,0 +1,122 @@
+# llm_backend/batching.py
+# Gom nhiều request check-in thành một batch ArcFace (micro-batching).
+import asyncio
+import logging
+import os
+import time
+
+import metrics
+from inference import executor, represent_face, represent_faces, InferenceQueueFull
+
+logger = logging.getLogger(__name__)
+
+# === Cấu hình qua biến môi trường ===
+FACE_BATCHING = os.getenv("FACE_BATCHING", "0") == "1"
+FACE_BATCH_MAX_SIZE = int(os.getenv("FACE_BATCH_MAX_SIZE", "8"))
+FACE_BATCH_MAX_WAIT_MS = float(os.getenv("FACE_BATCH_MAX_WAIT_MS", "10"))
+
+batch_size = metrics.histogram("face_batch_size", "Số ảnh trong mỗi batch ArcFace",
+                               buckets=(1, 2, 4, 8, 16, 32, 64))
+batch_added_latency = metrics.histogram("face_batch_wait_seconds", "Độ trễ thêm do chờ gom batch")
+batch_seconds = metrics.histogram("face_batch_seconds", "Thời gian chạy một batch (gồm chờ executor)")
+batch_images = metrics.counter("face_batch_images_total", "Tổng số ảnh đã xử lý qua batcher")
+
+
+class EmbeddingBatcher:
+    def __init__(self, max_batch_size: int = FACE_BATCH_MAX_SIZE, max_wait_ms: float = FACE_BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue = None
+        self._task = None
+        self._inflight = set()
+
+    def start(self):
+        if self._task is not None:
+            return
+        # Giới hạn hàng đợi theo sức chứa executor để backpressure vẫn hoạt động
+        self._queue = asyncio.Queue(maxsize=executor.capacity * self.max_batch_size)
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def embed(self, img_array):
+        if self._task is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((img_array, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise InferenceQueueFull()
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Không chờ batch chạy xong để batch kế tiếp gom tiếp; executor tự giới hạn
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch):
+        dispatched_at = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            batch_added_latency.observe(dispatched_at - enqueued_at)
+        batch_size.observe(len(batch))
+
+        try:
+            results = await executor.run(represent_faces, [img for img, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        batch_seconds.observe(time.perf_counter() - dispatched_at)
+        batch_images.inc(len(batch))
+        for (_, future, _), (embedding, error) in zip(batch, results):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(ValueError(error))
+            else:
+                future.set_result(embedding)
+
+    def stats(self):
+        processed = batch_images.value
+        busy = batch_seconds.sum
+        return {
+            "enabled": True,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "images_per_second": round(processed / busy, 2) if busy else 0.0,
+            "avg_batch_size": batch_size.snapshot()["avg"],
+            "added_latency": batch_added_latency.snapshot(),
+        }
+
+
+batcher = EmbeddingBatcher() if FACE_BATCHING else None
+
+
+async def embed_face(img_array):
+    """Tính embedding cho một ảnh, qua batcher nếu bật FACE_BATCHING."""
+    if batcher is not None:
+        return await batcher.embed(img_array)
+    return await executor.run(represent_face, img_array)
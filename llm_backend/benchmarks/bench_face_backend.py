@@ -0,0 +1,117 @@
+# llm_backend/benchmarks/bench_face_backend.py
+# So sánh các backend nhận diện (FACE_BACKEND): DeepFace/TensorFlow hiện tại với ONNX Runtime
+# (fp32, INT8) — thời gian warm-up, latency mỗi ảnh, throughput theo batch và RSS đỉnh.
+# Mỗi cấu hình chạy trong process riêng để RSS không cộng dồn.
+#
+#   python benchmarks/bench_face_backend.py --image references/reference.jpg --runs 30 --threads 2
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = [
+    ("deepface", "deepface", None),
+    ("onnx fp32", "onnx", "models/arcface.onnx"),
+    ("onnx int8", "onnx", "models/arcface.int8.onnx"),
+]
+
+
+def peak_rss_kb() -> int:
+    # VmHWM được reset khi exec, còn ru_maxrss thì kế thừa từ process cha trên Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_child(image_path: str, runs: int, batch: int):
+    sys.path.insert(0, BACKEND_DIR)
+    import inference
+    from image_io import decode_image
+
+    with open(image_path, "rb") as f:
+        image = decode_image(f.read())
+
+    t0 = time.perf_counter()
+    inference.warm_up()
+    warm_up_seconds = time.perf_counter() - t0
+
+    latencies = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        inference.represent_face(image)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    batches = max(1, runs // batch)
+    for _ in range(batches):
+        inference.represent_faces([image] * batch)
+    throughput = batches * batch / (time.perf_counter() - t0)
+
+    latencies.sort()
+    return {
+        "warm_up_s": warm_up_seconds,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "throughput": throughput,
+        "rss_mb": peak_rss_kb() / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image", default=os.path.join(BACKEND_DIR, "references", "reference.jpg"))
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--batch", type=int, default=16, help="Số ảnh mỗi lượt khi đo throughput")
+    parser.add_argument("--threads", type=int, default=0, help="FACE_ONNX_THREADS (0 = mặc định ORT)")
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(os.path.abspath(args.image), args.runs, args.batch)))
+        return
+
+    results = []
+    for name, backend, model in CONFIGS:
+        env = {**os.environ, "FACE_BACKEND": backend, "FACE_ONNX_THREADS": str(args.threads)}
+        if model is not None:
+            model_path = os.path.join(BACKEND_DIR, model)
+            if not os.path.exists(model_path):
+                print(f"⏭️  {name}: chưa có {model} (chạy export_face_onnx.py)", file=sys.stderr)
+                continue
+            env["FACE_ONNX_MODEL"] = model_path
+            env.setdefault(
+                "FACE_ONNX_DETECTOR", os.path.join(BACKEND_DIR, "models", "face_detection_yunet_2023mar.onnx"),
+            )
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", "--image", os.path.abspath(args.image),
+             "--runs", str(args.runs), "--batch", str(args.batch)],
+            capture_output=True, text=True, env=env, cwd=BACKEND_DIR,
+        )
+        if out.returncode != 0:
+            raise SystemExit(f"{name}: {out.stderr.strip().splitlines()[-1]}")
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        results.append({"config": name, **{k: round(v, 1) for k, v in result.items()}})
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f"{'config':<14}{'warm-up s':>10}{'p50 ms':>9}{'p95 ms':>9}{'ảnh/s':>8}{'RSS MB':>9}")
+    for r in results:
+        print(f"{r['config']:<14}{r['warm_up_s']:>10}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+              f"{r['throughput']:>8}{r['rss_mb']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# llm_backend/benchmarks/bench_image_ingest.py
+# So sánh bộ nhớ cấp phát / thời gian mỗi request giữa đường ảnh cũ (base64 + re-encode)
+# và đường mới (bytes nhị phân → numpy, draft-mode JPEG).
+#
+#   python benchmarks/bench_image_ingest.py --megapixels 8 --runs 5
+import argparse
+import base64
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def peak_rss_kb() -> int:
+    # VmHWM được reset khi exec, còn ru_maxrss thì kế thừa từ process cha trên Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_photo(megapixels: float) -> bytes:
+    """Ảnh JPEG tổng hợp có nhiễu + gradient, kích thước tương đương ảnh điện thoại."""
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    pixels = np.clip(gradient + rng.normal(0, 25, (height, width, 3)), 0, 255).astype(np.uint8)
+    buffered = io.BytesIO()
+    Image.fromarray(pixels).save(buffered, format="JPEG", quality=90)
+    return buffered.getvalue()
+
+
+# === Đường cũ: y hệt main.py trước khi có image_io ===
+def legacy_checkin(payload: str):
+    base64_str = payload
+    if "," in base64_str:
+        base64_str = base64_str.split(",")[1]
+    img_data = base64.b64decode(base64_str)
+    img = Image.open(io.BytesIO(img_data)).convert("RGB")
+    return np.array(img)
+
+
+def legacy_register(image_bytes: bytes):
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    img_array = np.array(image)
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    image_base64 = "data:image/jpeg;base64," + base64.b64encode(buffered.getvalue()).decode()
+    return img_array, image_base64
+
+
+# === Đường mới ===
+def raw_checkin(image_bytes: bytes):
+    from image_io import decode_image
+    return decode_image(image_bytes)
+
+
+def base64_checkin(payload: str):
+    from image_io import decode_base64_image
+    return decode_base64_image(payload)
+
+
+def new_register(image_bytes: bytes):
+    from image_io import open_image
+    from face_storage import encode_jpeg
+    image = open_image(image_bytes)
+    return np.asarray(image), encode_jpeg(image)
+
+
+VARIANTS = {
+    "legacy_checkin_base64": (legacy_checkin, "base64"),
+    "new_checkin_base64": (base64_checkin, "base64"),
+    "new_checkin_raw": (raw_checkin, "raw"),
+    "legacy_register": (legacy_register, "raw"),
+    "new_register": (new_register, "raw"),
+}
+
+
+def run_variant(name: str, photo_path: str, runs: int):
+    fn, kind = VARIANTS[name]
+    with open(photo_path, "rb") as f:
+        photo = f.read()
+    payload = "data:image/jpeg;base64," + base64.b64encode(photo).decode() if kind == "base64" else photo
+    import image_io, face_storage  # noqa: F401 — import trước để RSS chỉ phản ánh phần decode
+
+    rss_before = peak_rss_kb()
+    tracemalloc.start()
+    timings = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(payload)
+        timings.append(time.perf_counter() - t0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = peak_rss_kb()
+
+    return {
+        "variant": name,
+        "input_bytes": len(payload),
+        "traced_peak_bytes": peak,
+        "rss_growth_kb": rss_after - rss_before,
+        "avg_ms": round(1000 * sum(timings[1:] or timings) / len(timings[1:] or timings), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megapixels", type=float, default=8)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--variant", choices=list(VARIANTS))
+    parser.add_argument("--photo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.photo, args.runs)))
+        return
+
+    # Ảnh được tạo một lần; mỗi biến thể chạy trong process riêng để số RSS không lẫn vào nhau
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        f.write(make_photo(args.megapixels))
+        photo_path = f.name
+    print(f"{'variant':<24}{'input':>12}{'traced peak':>14}{'RSS growth':>13}{'avg ms':>9}")
+    for name in VARIANTS:
+        out = subprocess.run(
+            [sys.executable, __file__, "--variant", name, "--photo", photo_path, "--runs", str(args.runs)],
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{r['variant']:<24}{r['input_bytes'] / 1e6:>10.1f}MB{r['traced_peak_bytes'] / 1e6:>12.1f}MB"
+              f"{r['rss_growth_kb'] / 1e3:>11.1f}MB{r['avg_ms']:>9}")
+    os.unlink(photo_path)
+
+
+if __name__ == "__main__":
+    main()
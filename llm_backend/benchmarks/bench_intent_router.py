@@ -0,0 +1,152 @@
+# llm_backend/benchmarks/bench_intent_router.py
+# Đo thời gian chọn intent cho mỗi câu hỏi: chuỗi if/elif + re.search cũ so với IntentRouter.
+# Chỉ đo phần định tuyến (không gọi Mongo/OpenAI); handler không chạy.
+#
+#   python benchmarks/bench_intent_router.py --rounds 2000
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# ai_logic cần hai biến này lúc import; benchmark không gọi ra ngoài nên giá trị giả là đủ
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+# Câu hỏi thật lấy từ log chatbot (đã bỏ thông tin cá nhân)
+CORPUS = [
+    "nhiệm vụ của tôi",
+    "Nhiệm vụ hôm nay của mình là gì vậy",
+    "cho mình xem nhiệm vụ tuần này",
+    "nhiệm vụ của tôi ở chiến dịch mùa hè xanh",
+    "em muốn đăng ký chiến dịch Mùa Hè Xanh",
+    "Đăng kí tham gia chiến dịch Tiếp sức mùa thi",
+    "cho mình tham gia chiến dịch Xuân tình nguyện với",
+    "đăngký chiến dịch hiến máu nhân đạo",
+    "làm sao để nhận chứng chỉ",
+    "khi nào được cấp chứng chỉ vậy ad",
+    "có chiến dịch nào đang diễn ra không",
+    "các chiến dịch đang chạy",
+    "chiến dịch Mùa Hè Xanh có những giai đoạn nào",
+    "Chiến dịch Tiếp sức mùa thi được tổ chức ở đâu",
+    "chiến dịch Đông ấm vùng cao là gì",
+    "chiến dịch Xuân tình nguyện gồm những phòng ban nào?",
+    "chiến dịch Trung thu cho em",
+    "tôi muốn vào chiến dịch Hiến máu nhân đạo",
+    "tham gia Mùa hè xanh cần chuẩn bị gì",
+    "nó diễn ra ở đâu vậy",
+    "bao giờ bắt đầu",
+    "có bao nhiêu tình nguyện viên rồi",
+    "mình cần mang theo gì",
+    "thời gian kết thúc là khi nào",
+    "có được cấp giấy chứng nhận không",
+    "quyên góp như thế nào",
+    "làm sao để trở thành tình nguyện viên",
+    "hello",
+    "cảm ơn nha",
+    "ai là người tổ chức",
+    "địa điểm check-in ở đâu",
+    "mình bị trễ thì có sao không",
+    "vào nhóm zalo ở đâu",
+    "chiến dịch này có cho người dưới 18 tuổi tham gia không",
+    "cho hỏi lịch trình ngày mai",
+    "có mấy phase vậy",
+    "làm sao để huỷ đăng ký",
+    "ứng dụng bị lỗi không check-in được",
+    "em có thể đăng ký nhiều chiến dịch cùng lúc không",
+    "nhiệm vụ hôm nay có gì mới",
+]
+
+
+# === Đường cũ: y hệt answer_user_question trước khi có IntentRouter ===
+def legacy_extract_campaign_name(text: str):
+    text = text.replace("\n", " ")
+    match1 = re.search(r"chiến dịch\s+(.+?)(?=\s+(có|gồm|với|được|là|\?|$))", text, re.IGNORECASE)
+    if match1:
+        return match1.group(1).strip().title()
+    match2 = re.search(r"(?:tham gia|đăng ký|vào)\s+(chiến dịch\s+)?(.+)", text, re.IGNORECASE)
+    if match2:
+        return match2.group(2).strip().title()
+    return None
+
+
+def legacy_route(text: str):
+    lower = text.lower().strip()
+    if re.search(r"nhiệm vụ (của tôi|hôm nay|tuần này)", lower):
+        return "nhiem_vu"
+    if re.search(r"(đăng[ ]?k[íy]|tham gia).+chiến dịch", lower):
+        return "dang_ky"
+    if "nhận chứng chỉ" in lower or "cấp chứng chỉ" in lower:
+        return "chung_chi"
+    if "đang diễn ra" in lower or "đang chạy" in lower:
+        return "dang_dien_ra"
+    if legacy_extract_campaign_name(text):
+        return "ten_chien_dich"
+    return "du_phong"
+
+
+def make_router_route():
+    from ai_logic import router
+    from utils import extract_campaign_name
+
+    def route(text: str):
+        for intent, _ in router.route(text.lower().strip()):
+            # Handler tên chiến dịch nhường lượt khi không trích được tên: tính luôn bước này
+            if intent.name == "ten_chien_dich" and not extract_campaign_name(text):
+                continue
+            if intent.name in ("theo_phien", "kien_thuc", "khong_ro"):
+                return "du_phong"
+            return intent.name
+        return "du_phong"
+    return route
+
+
+def measure(route, rounds: int):
+    per_message = []
+    for text in CORPUS:
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            route(text)
+        per_message.append((time.perf_counter() - t0) / rounds * 1e6)
+    per_message.sort()
+    return {
+        "mean_us": round(statistics.mean(per_message), 2),
+        "p50_us": round(per_message[len(per_message) // 2], 2),
+        "max_us": round(per_message[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    args = parser.parse_args()
+
+    router_route = make_router_route()
+    # Xả cache regex của module re để lượt đo đầu của đường cũ không được lợi
+    re.purge()
+    results = {
+        "messages": len(CORPUS),
+        "legacy": measure(legacy_route, args.rounds),
+        "router": measure(router_route, args.rounds),
+        "disagreements": [
+            {"text": t, "legacy": legacy_route(t), "router": router_route(t)}
+            for t in CORPUS if legacy_route(t) != router_route(t)
+        ],
+    }
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f"{'':<8}{'mean µs':>10}{'p50 µs':>10}{'max µs':>10}")
+    for name in ("legacy", "router"):
+        r = results[name]
+        print(f"{name:<8}{r['mean_us']:>10}{r['p50_us']:>10}{r['max_us']:>10}")
+    for d in results["disagreements"]:
+        print(f"≠ {d['text']!r}: cũ={d['legacy']} mới={d['router']}")
+
+
+if __name__ == "__main__":
+    main()
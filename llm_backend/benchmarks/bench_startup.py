@@ -0,0 +1,104 @@
+# llm_backend/benchmarks/bench_startup.py
+# Đo thời gian import `main` và RSS của process cho từng cách deploy (LLM_SERVICES).
+# Mỗi cấu hình chạy trong process riêng (cold start thật); "+ deepface" là cái giá
+# trước đây mọi process đều phải trả, giờ chỉ service khuôn mặt trả lúc warm-up.
+#
+#   python benchmarks/bench_startup.py --runs 3
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = [
+    ("chat", "chat", False),
+    ("face", "face", False),
+    ("chat,face", "chat,face", False),
+    ("face + deepface", "face", True),
+    ("chat,face + deepface", "chat,face", True),
+]
+
+
+def peak_rss_kb() -> int:
+    # VmHWM được reset khi exec, còn ru_maxrss thì kế thừa từ process cha trên Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_child(services: str, eager: bool):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ["LLM_SERVICES"] = services
+    # main import database/llm_client, hai module này cần biến môi trường; không kết nối thật
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    t0 = time.perf_counter()
+    import main  # noqa: F401
+    import_seconds = time.perf_counter() - t0
+    deepface_seconds = 0.0
+    if eager:
+        t1 = time.perf_counter()
+        from deepface import DeepFace  # noqa: F401
+        deepface_seconds = time.perf_counter() - t1
+    return {
+        "import_seconds": import_seconds,
+        "deepface_seconds": deepface_seconds,
+        "rss_mb": peak_rss_kb() / 1024,
+        "modules": len(sys.modules),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child[0], args.child[1] == "1")))
+        return
+
+    results = []
+    # cwd tạm: ai_logic ghi chatbot.log vào thư mục hiện tại
+    workdir = tempfile.mkdtemp()
+    for name, services, eager in CONFIGS:
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", services, "1" if eager else "0"],
+                capture_output=True, text=True, cwd=workdir,
+            )
+            if out.returncode != 0:
+                raise SystemExit(f"{name}: {out.stderr.strip().splitlines()[-1]}")
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        results.append({
+            "config": name,
+            "import_s": round(statistics.median(r["import_seconds"] + r["deepface_seconds"] for r in runs), 3),
+            "rss_mb": round(statistics.median(r["rss_mb"] for r in runs), 1),
+            "modules": runs[-1]["modules"],
+        })
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f"{'config':<24}{'import s':>10}{'RSS MB':>10}{'modules':>9}")
+    for r in results:
+        print(f"{r['config']:<24}{r['import_s']:>10}{r['rss_mb']:>10}{r['modules']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# llm_backend/benchmarks/check_face_parity.py
+# Kiểm tra FACE_BACKEND=onnx cho embedding đủ sát đường DeepFace trước khi bật trên production.
+# Descriptor đã đăng ký được tính bằng DeepFace, nên điều cần giữ là:
+# - cosine distance giữa embedding DeepFace và ONNX của cùng một ảnh (≈ 0)
+# - distance giữa hai ảnh khác nhau tính bằng ONNX lệch ít so với DeepFace,
+#   để ngưỡng FACE_MATCH_THRESHOLD = 0.35 vẫn cho cùng kết quả khớp / không khớp
+# Thoát với mã 1 nếu độ lệch lớn nhất vượt --tolerance.
+#
+#   python benchmarks/check_face_parity.py --images ./faces --model models/arcface.int8.onnx
+import argparse
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+FACE_MATCH_THRESHOLD = 0.35  # giống checkin.FACE_MATCH_THRESHOLD (không import để khỏi cần Mongo)
+
+
+def cosine_distance(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return 1 - float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def load_images(directory: str):
+    from image_io import decode_image
+    images = {}
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(directory, name), "rb") as f:
+                images[name] = decode_image(f.read())
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", default=os.path.join(BACKEND_DIR, "references"),
+                        help="Thư mục ảnh khuôn mặt (nên có nhiều người, mỗi người vài ảnh)")
+    parser.add_argument("--model", help="File ArcFace ONNX (mặc định FACE_ONNX_MODEL)")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Độ lệch cosine distance tối đa cho phép")
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    args = parser.parse_args()
+
+    os.environ["FACE_BACKEND"] = "deepface"
+    if args.model:
+        os.environ["FACE_ONNX_MODEL"] = args.model
+    import face_onnx
+    import inference
+
+    embeddings = {}
+    skipped = []
+    for name, image in load_images(args.images).items():
+        try:
+            embeddings[name] = (inference.represent_face(image), face_onnx.represent_face(image))
+        except ValueError as e:
+            skipped.append({"image": name, "error": str(e)})
+    if not embeddings:
+        raise SystemExit("Không có ảnh nào detect được khuôn mặt")
+
+    # Cùng ảnh: DeepFace (như descriptor đã lưu) với ONNX (như ảnh check-in mới)
+    same_image = {name: cosine_distance(ref, onnx) for name, (ref, onnx) in embeddings.items()}
+    # Cặp ảnh: độ lệch distance và số cặp đổi kết quả so với ngưỡng
+    pair_deltas, flipped = [], 0
+    for (a, (ref_a, onnx_a)), (b, (ref_b, onnx_b)) in itertools.combinations(embeddings.items(), 2):
+        d_ref = cosine_distance(ref_a, ref_b)
+        d_onnx = cosine_distance(ref_a, onnx_b)
+        pair_deltas.append(abs(d_ref - d_onnx))
+        flipped += (d_ref < FACE_MATCH_THRESHOLD) != (d_onnx < FACE_MATCH_THRESHOLD)
+
+    worst = max([*same_image.values(), *pair_deltas])
+    result = {
+        "model": face_onnx.FACE_ONNX_MODEL,
+        "images": len(embeddings),
+        "skipped": skipped,
+        "same_image_max": round(max(same_image.values()), 4),
+        "same_image_mean": round(float(np.mean(list(same_image.values()))), 4),
+        "pair_delta_max": round(max(pair_deltas), 4) if pair_deltas else None,
+        "pairs": len(pair_deltas),
+        "pairs_flipped": flipped,
+        "tolerance": args.tolerance,
+        "ok": worst <= args.tolerance and flipped == 0,
+    }
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        for name, distance in sorted(same_image.items(), key=lambda kv: -kv[1]):
+            print(f"{name:<40}{distance:>10.4f}")
+        for item in skipped:
+            print(f"{item['image']:<40}{'bỏ qua':>10}  ({item['error'][:60]})")
+        print(f"\nmodel {result['model']}: {result['images']} ảnh, "
+              f"cùng ảnh max {result['same_image_max']} / mean {result['same_image_mean']}, "
+              f"cặp ảnh lệch max {result['pair_delta_max']} ({flipped}/{result['pairs']} cặp đổi kết quả)")
+        print("✅ Đạt" if result["ok"] else f"❌ Vượt ngưỡng {args.tolerance}")
+    if not result["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# llm_backend/benchmarks/loadtest.py
+# Đo tải toàn bộ service (main.py, cả chat lẫn face) hoàn toàn offline, lặp lại được:
+# - app chạy trong process con (uvicorn) với Mongo trong process, dữ liệu tổng hợp theo --users/--campaigns...
+# - OpenAI + Node backend là server giả có độ trễ cấu hình được; khuôn mặt dùng backend giả (xem loadtest_fakes.py)
+# - bắn /checkin, /register, /chat với --concurrency request đồng thời, báo p50/p95/p99, throughput,
+#   số lệnh Mongo mỗi request (từ /metrics) và RSS đỉnh của app; lưu JSON để so sánh giữa các lần chạy
+#
+#   pip install -r requirements-dev.txt   # requirements.txt + mongomock-motor (Mongo trong process)
+#   python benchmarks/loadtest.py --concurrency 32 --requests 500 --output before.json
+#   python benchmarks/loadtest.py --concurrency 32 --requests 500 --baseline before.json
+#   python benchmarks/loadtest.py --openai-prefill-ms 400 --full-context --output full.json  # rồi bỏ --full-context, --baseline full.json
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import loadtest_fakes  # noqa: E402
+
+SCENARIOS = ("checkin", "register", "chat")
+ENDPOINTS = {"checkin": "/checkin", "register": "/register", "chat": "/chat"}
+CHAT_QUESTIONS = (
+    "chiến dịch {name} diễn ra khi nào",
+    "chiến dịch {name} ở đâu vậy",
+    "nhiệm vụ hôm nay",
+    "nhiệm vụ của tôi",
+    "các chiến dịch đang diễn ra",
+    "làm sao nhận chứng chỉ",
+    "tình nguyện viên cần chuẩn bị gì khi tham gia",
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def proc_status_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+# === Process con: app + Mongo trong process ===
+def serve(args):
+    loadtest_fakes.install_fake_face_backend(args.face_ms)
+    db = loadtest_fakes.install_mongo_stand_in()
+    fixture = asyncio.run(loadtest_fakes.seed(
+        db, users=args.users, campaigns=args.campaigns, volunteers=args.volunteers, phases=args.phases,
+        days=args.days, tasks_per_day=args.tasks_per_day, knowledge_chunks=args.knowledge_chunks,
+    ))
+    with open(args.fixture, "w") as f:
+        json.dump(fixture, f)
+
+    import uvicorn
+    import main
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+def child_env(args, upstream: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "MONGO_URI": "mongodb://loadtest-stand-in:27017",  # không kết nối thật, database.py bị thay
+        "OPENAI_API_KEY": "sk-loadtest",
+        "OPENAI_BASE_URL": f"{upstream}/v1",
+        "BACKEND_URL": upstream,
+        "FACE_BACKEND": "onnx",  # face_onnx là module giả do loadtest_fakes cài
+        "INFERENCE_MODE": "thread",
+        "LOG_FILE": "",
+        "LOG_ACCESS": "0",
+        "RESPONSE_CACHE": "1" if args.response_cache else "0",
+        "CONTEXT_COMPACT": "0" if args.full_context else "1",
+        "CONTEXT_COMPACT_HOLDOUT": "0",
+    })
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+# === Bộ tạo tải ===
+def parse_metrics(text: str):
+    """request_mongo_queries_{sum,count}{endpoint="..."} → {endpoint: (sum, count)}"""
+    out = {}
+    for line in text.splitlines():
+        m = re.match(r'request_mongo_queries_(sum|count)\{endpoint="([^"]*)"\} (\S+)', line)
+        if m:
+            kind, endpoint, value = m.groups()
+            total, count = out.get(endpoint, (0.0, 0.0))
+            out[endpoint] = (float(value), count) if kind == "sum" else (total, float(value))
+    return out
+
+
+def make_requests(name: str, fixture: dict, n: int, rng: random.Random, image_size):
+    images = {}
+
+    def image_b64(index):
+        if index not in images:
+            raw = loadtest_fakes.face_image(index, image_size)
+            images[index] = (raw, "data:image/jpeg;base64," + base64.b64encode(raw).decode())
+        return images[index]
+
+    campaigns = fixture["campaigns"]
+    users = fixture["users"]
+    for _ in range(n):
+        campaign = rng.choice(campaigns)
+        if name == "checkin":
+            # Chỉ TNV đã đăng ký khuôn mặt lúc seed (các user đầu danh sách)
+            index = rng.choice([v for v in campaign["volunteers"] if v < fixture["registered"]] or [0])
+            yield "POST", "/checkin", {"json": {
+                "user_id": users[index], "image": image_b64(index)[1], "campaignId": campaign["id"],
+                "phaseId": campaign["id"], "phasedayId": rng.choice(campaign["phaseDays"]), "method": "face",
+            }}
+        elif name == "register":
+            index = rng.randrange(len(users))
+            yield "POST", "/register", {
+                "data": {"user_id": users[index]},
+                "files": {"file": ("face.jpg", image_b64(index)[0], "image/jpeg")},
+            }
+        else:
+            question = rng.choice(CHAT_QUESTIONS).format(name=campaign["name"])
+            user = users[rng.choice(campaign["volunteers"])]
+            yield "POST", "/chat", {
+                "json": {"message": question, "userId": user}, "headers": {"Authorization": "Bearer loadtest"},
+            }
+
+
+async def run_scenario(client, name: str, requests, concurrency: int):
+    latencies, statuses, errors = [], {}, 0
+    queue = list(requests)
+    queue.reverse()
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            method, path, kwargs = queue.pop()
+            t0 = time.perf_counter()
+            try:
+                res = await client.request(method, path, **kwargs)
+                status = res.status_code
+            except Exception:
+                status = "error"
+            latencies.append(time.perf_counter() - t0)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == "error" or status >= 500:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "throughput_rps": len(latencies) / elapsed,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+async def drive(args, app_url: str, fixture: dict, pid: int):
+    import httpx
+
+    rng = random.Random(args.seed)
+    image_size = tuple(int(v) for v in args.image_size.split("x"))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=120) as client:
+        for name in args.scenarios.split(","):
+            if args.warmup:
+                await run_scenario(client, name, make_requests(name, fixture, args.warmup, rng, image_size),
+                                   args.concurrency)
+            before = parse_metrics((await client.get("/metrics")).text).get(ENDPOINTS[name], (0.0, 0.0))
+            result = await run_scenario(
+                client, name, make_requests(name, fixture, args.requests, rng, image_size), args.concurrency,
+            )
+            after = parse_metrics((await client.get("/metrics")).text).get(ENDPOINTS[name], (0.0, 0.0))
+            count = after[1] - before[1]
+            result["mongo_queries_per_request"] = (after[0] - before[0]) / count if count else None
+            result["rss_mb"] = proc_status_kb(pid, "VmRSS") / 1024
+            results[name] = result
+            print(f"  {name}: {result['throughput_rps']:.1f} req/s, p95 {result['p95_ms']:.1f}ms", file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BACKEND_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_table(report: dict, baseline: dict = None):
+    columns = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "mongo_queries_per_request", "rss_mb")
+    header = f"{'scenario':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'mongo/req':>10}{'RSS MB':>9}{'errors':>8}"
+    print(header)
+    for name, r in report["scenarios"].items():
+        row = f"{name:<10}"
+        for key, width in zip(columns, (9, 9, 9, 9, 10, 9)):
+            value = r.get(key)
+            row += f"{'-' if value is None else f'{value:.1f}':>{width}}"
+        print(row + f"{r['errors']:>8}")
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        if base:
+            row = f"{'  Δ%':<10}"
+            for key, width in zip(columns, (9, 9, 9, 9, 10, 9)):
+                old, new = base.get(key), r.get(key)
+                row += f"{f'{(new - old) / old * 100:+.1f}' if old and new is not None else '-':>{width}}"
+            print(row)
+    print(f"peak RSS: {report['peak_rss_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=300, help="Số request đo cho mỗi kịch bản")
+    parser.add_argument("--warmup", type=int, default=20, help="Số request chạy trước, không tính")
+    parser.add_argument("--seed", type=int, default=0)
+    # Quy mô dữ liệu
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--volunteers", type=int, default=100, help="TNV mỗi chiến dịch")
+    parser.add_argument("--phases", type=int, default=3, help="Giai đoạn mỗi chiến dịch")
+    parser.add_argument("--days", type=int, default=5, help="Ngày mỗi giai đoạn")
+    parser.add_argument("--tasks-per-day", type=int, default=5)
+    parser.add_argument("--knowledge-chunks", type=int, default=200)
+    parser.add_argument("--image-size", default="640x480")
+    # Độ trễ giả lập
+    parser.add_argument("--openai-ttft-ms", type=float, default=300)
+    parser.add_argument("--openai-prefill-ms", type=float, default=0,
+                        help="TTFT thêm cho mỗi 1000 token prompt")
+    parser.add_argument("--openai-token-ms", type=float, default=10)
+    parser.add_argument("--openai-tokens", type=int, default=60)
+    parser.add_argument("--embedding-ms", type=float, default=50)
+    parser.add_argument("--node-ms", type=float, default=20)
+    parser.add_argument("--face-ms", type=float, default=80, help="Độ trễ thay cho một lượt ArcFace")
+    parser.add_argument("--response-cache", action="store_true", help="Bật RESPONSE_CACHE (mặc định tắt)")
+    parser.add_argument("--full-context", action="store_true",
+                        help="Gửi context chiến dịch đầy đủ (CONTEXT_COMPACT=0) để so với bản rút gọn")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra file")
+    parser.add_argument("--baseline", help="File JSON của lần chạy trước để so sánh")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--fixture", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    try:
+        import mongomock_motor  # noqa: F401 — app con cần để chạy Mongo trong process
+    except ImportError:
+        sys.exit("❌ Thiếu mongomock-motor: pip install -r requirements-dev.txt")
+
+    if args.serve:
+        serve(args)
+        return
+
+    upstream_port, app_port = free_port(), free_port()
+    loadtest_fakes.start_upstream(
+        upstream_port, ttft_ms=args.openai_ttft_ms, token_ms=args.openai_token_ms, tokens=args.openai_tokens,
+        embedding_ms=args.embedding_ms, node_ms=args.node_ms, prefill_ms=args.openai_prefill_ms,
+    )
+    upstream = f"http://127.0.0.1:{upstream_port}"
+    workdir = tempfile.mkdtemp()
+    fixture_path = os.path.join(workdir, "fixture.json")
+    child = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--serve", "--port", str(app_port),
+         "--fixture", fixture_path],
+        env=child_env(args, upstream), cwd=workdir,
+    )
+    try:
+        import httpx
+        app_url = f"http://127.0.0.1:{app_port}"
+        deadline = time.time() + 120
+        while True:
+            if child.poll() is not None:
+                raise SystemExit("App không khởi động được (xem log ở trên)")
+            try:
+                if httpx.get(f"{app_url}/ready", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.time() > deadline:
+                raise SystemExit("App không sẵn sàng sau 120s")
+            time.sleep(0.2)
+        with open(fixture_path) as f:
+            fixture = json.load(f)
+
+        scenarios = asyncio.run(drive(args, app_url, fixture, child.pid))
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "args": {k: v for k, v in vars(args).items() if k not in ("serve", "port", "fixture")},
+                "data": fixture["counts"],
+            },
+            "scenarios": scenarios,
+            "peak_rss_mb": proc_status_kb(child.pid, "VmHWM") / 1024,
+        }
+    finally:
+        child.terminate()
+        child.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_table(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+# llm_backend/benchmarks/loadtest_fakes.py
+# Các thành phần giả cho benchmarks/loadtest.py, để chạy tải hoàn toàn offline:
+# - Mongo trong process (mongomock-motor) + dữ liệu tổng hợp: campaigns, phases, phasedays, tasks, users
+# - server giả vừa là OpenAI (/v1/chat/completions stream, /v1/embeddings) vừa là Node (/checkin...)
+#   với độ trễ cấu hình được
+# - backend khuôn mặt giả (thay face_onnx qua FACE_BACKEND=onnx): embedding rẻ, tất định theo ảnh,
+#   cộng thêm độ trễ cố định thay cho ArcFace — chi phí model thật đo riêng ở bench_face_backend.py
+import asyncio
+import datetime
+import hashlib
+import io
+import json
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+from PIL import Image
+
+FAKE_EMBEDDING_DIM = 256
+
+
+# === Ảnh khuôn mặt tổng hợp ===
+def face_image(index: int, size=(640, 480)) -> bytes:
+    """JPEG tất định cho "người" thứ index: ảnh check-in và ảnh đăng ký của cùng người giống nhau."""
+    rng = np.random.default_rng(index)
+    coarse = rng.integers(0, 256, size=(12, 16, 3), dtype=np.uint8)
+    image = Image.fromarray(coarse).resize(size, Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def fake_face_embedding(img_array) -> list:
+    # Ảnh xám 32x16 = 512 chiều như ArcFace; trừ trung bình để ảnh của hai người khác nhau gần trực giao
+    thumb = Image.fromarray(np.asarray(img_array, dtype=np.uint8)).convert("L").resize((32, 16))
+    vector = np.asarray(thumb, dtype=np.float32).ravel()
+    vector -= vector.mean()
+    return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+
+def install_fake_face_backend(latency_ms: float):
+    """Cài module face_onnx giả; inference.py gọi nó khi FACE_BACKEND=onnx (chỉ dùng với INFERENCE_MODE=thread)."""
+    module = types.ModuleType("face_onnx")
+
+    def warm_up():
+        return 0
+
+    def represent_face(img_array):
+        time.sleep(latency_ms / 1000)
+        return fake_face_embedding(img_array)
+
+    def represent_faces(img_arrays):
+        # Batch rẻ hơn từng ảnh như model thật: trả độ trễ một lần + 1/4 mỗi ảnh thêm
+        time.sleep(latency_ms / 1000 * (1 + 0.25 * (len(img_arrays) - 1)))
+        return [(fake_face_embedding(img), None) for img in img_arrays]
+
+    module.warm_up = warm_up
+    module.represent_face = represent_face
+    module.represent_faces = represent_faces
+    sys.modules["face_onnx"] = module
+
+
+# === Mongo trong process ===
+def _lookup_values(doc, path: str):
+    values = [doc]
+    for part in path.split("."):
+        nxt = []
+        for value in values:
+            if isinstance(value, list):
+                value = [v.get(part) for v in value if isinstance(v, dict)]
+                nxt.extend(v for v in value if v is not None)
+            elif isinstance(value, dict) and part in value:
+                nxt.append(value[part])
+        values = nxt
+    flat = []
+    for value in values:
+        flat.extend(value if isinstance(value, list) else [value])
+    return flat or [None]
+
+
+def _patch_mongomock_lookup():
+    """mongomock chưa hỗ trợ $lookup dạng localField/foreignField + pipeline (MongoDB 5.0) mà
+    campaign_context / task_resolver dùng: join bằng $in rồi chạy pipeline con trên các document khớp."""
+    from mongomock import aggregate
+
+    original = aggregate._PIPELINE_HANDLERS["$lookup"]
+
+    def lookup(in_collection, database, options):
+        if "pipeline" not in options or "localField" not in options:
+            return original(in_collection, database, options)
+        foreign = database.get_collection(options["from"])
+        out = []
+        for doc in in_collection:
+            values = _lookup_values(doc, options["localField"])
+            matched = list(foreign.find({options["foreignField"]: {"$in": values}}))
+            joined = list(aggregate.process_pipeline(matched, database, options["pipeline"], None))
+            out.append({**doc, options["as"]: joined})
+        return out
+
+    aggregate._PIPELINE_HANDLERS["$lookup"] = lookup
+
+
+_COUNTED_METHODS = (
+    "find", "find_one", "aggregate", "count_documents", "distinct", "insert_one", "insert_many",
+    "update_one", "update_many", "replace_one", "delete_one", "delete_many", "bulk_write",
+    "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+)
+
+
+def _count_operations():
+    """Mỗi thao tác collection tính là một lệnh Mongo (như MongoCommandListener với Mongo thật,
+    trừ getMore) để /metrics vẫn có request_mongo_queries theo endpoint."""
+    import mongomock_motor
+    from tracing import count_mongo_query
+
+    cls = mongomock_motor.AsyncMongoMockCollection
+    for name in _COUNTED_METHODS:
+        method = getattr(cls, name, None)
+        if method is None:
+            continue
+        if asyncio.iscoroutinefunction(method):
+            async def counted(self, *args, _method=method, **kwargs):
+                count_mongo_query()
+                return await _method(self, *args, **kwargs)
+        else:
+            def counted(self, *args, _method=method, **kwargs):
+                count_mongo_query()
+                return _method(self, *args, **kwargs)
+        setattr(cls, name, counted)
+
+
+def _no_change_streams(*args, **kwargs):
+    # Như Mongo standalone: campaign_context chuyển sang chỉ dùng TTL
+    from pymongo.errors import OperationFailure
+    raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+
+def install_mongo_stand_in():
+    """Thay client Motor trong database.py bằng mongomock; gọi trước khi import main."""
+    from mongomock_motor import AsyncMongoMockClient
+    import database
+
+    _patch_mongomock_lookup()
+    _count_operations()
+    client = AsyncMongoMockClient()
+    database.mongo_client = client
+    database.db = client[database.MONGO_DB_NAME]
+    database.db.watch = _no_change_streams
+    for attr, value in list(vars(database).items()):
+        if attr.endswith("_collection"):
+            setattr(database, attr, database.db[value.name])
+    return database.db
+
+
+# === Dữ liệu tổng hợp ===
+def _utc_today():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return datetime.datetime(now.year, now.month, now.day)
+
+
+async def seed(db, users: int, campaigns: int, volunteers: int, phases: int, days: int, tasks_per_day: int,
+               knowledge_chunks: int, rng_seed: int = 0):
+    """Tạo dữ liệu theo quy mô yêu cầu; trả về fixture (id, tên) để tạo request tải."""
+    from bson import Binary, ObjectId
+    from image_io import decode_image
+
+    rng = np.random.default_rng(rng_seed)
+    today = _utc_today()
+    users = [ObjectId() for _ in range(max(users, 1))]
+    # Một nửa số user đã đăng ký khuôn mặt (descriptor tính bằng backend giả trên chính ảnh của họ)
+    registered = len(users) // 2
+    user_docs = []
+    for i, uid in enumerate(users):
+        doc = {"_id": uid, "name": f"TNV {i}", "email": f"tnv{i}@example.com"}
+        if i < registered:
+            doc["faceDescriptor"] = fake_face_embedding(decode_image(face_image(i)))
+        user_docs.append(doc)
+    await db["users"].insert_many(user_docs)
+
+    fixture = {"users": [str(u) for u in users], "registered": registered, "campaigns": []}
+    campaign_docs, phase_docs, day_docs, task_docs, department_docs = [], [], [], [], []
+    for c in range(campaigns):
+        cid = ObjectId()
+        start = today - datetime.timedelta(days=int(rng.integers(0, days)))
+        members = rng.choice(len(users), size=min(volunteers, len(users)), replace=False)
+        campaign_docs.append({
+            "_id": cid,
+            "name": f"Chiến dịch Tình Nguyện {c}",
+            "description": "Chiến dịch tình nguyện tổng hợp phục vụ benchmark. " * 20,
+            "location": {"address": f"{c} Đường Số {c}, Quận {c % 12 + 1}, TP.HCM"},
+            "status": "in-progress",
+            "acceptStatus": "approved",
+            "startDate": start,
+            "endDate": start + datetime.timedelta(days=phases * days),
+            "certificatesIssued": False,
+            "volunteers": [
+                {"user": users[int(m)], "status": "approved" if k % 5 else "pending"} for k, m in enumerate(members)
+            ],
+            "updatedAt": datetime.datetime.utcnow(),
+        })
+        department_docs.append({"campaignId": cid, "name": "Hậu cần"})
+        phase_days = []
+        for p in range(phases):
+            pid = ObjectId()
+            phase_start = start + datetime.timedelta(days=p * days)
+            phase_docs.append({
+                "_id": pid, "campaignId": cid, "name": f"Giai đoạn {p + 1}",
+                "startDate": phase_start, "endDate": phase_start + datetime.timedelta(days=days - 1),
+            })
+            for d in range(days):
+                did = ObjectId()
+                day_docs.append({"_id": did, "phaseId": pid, "date": phase_start + datetime.timedelta(days=d)})
+                phase_days.append(str(did))
+                for t in range(tasks_per_day):
+                    assignees = rng.choice(members, size=min(3, len(members)), replace=False)
+                    task_docs.append({
+                        "title": f"Nhiệm vụ {c}-{p}-{d}-{t}", "phaseDayId": did,
+                        "assignedUsers": [{"userId": users[int(a)]} for a in assignees],
+                    })
+        fixture["campaigns"].append({
+            "id": str(cid), "name": campaign_docs[-1]["name"], "phaseDays": phase_days,
+            "volunteers": [int(m) for m in members],
+        })
+    for name, docs in (("campaigns", campaign_docs), ("phases", phase_docs), ("phasedays", day_docs),
+                       ("tasks", task_docs), ("departments", department_docs)):
+        if docs:
+            await db[name].insert_many(docs)
+
+    if knowledge_chunks:
+        vectors = rng.normal(size=(knowledge_chunks, FAKE_EMBEDDING_DIM)).astype(np.float32)
+        await db["vhht_knowledge_chunks"].insert_many([
+            {"title": f"Kiến thức {i}", "text": f"Nội dung kiến thức tình nguyện số {i}. " * 10, "seq": 0,
+             "campaignId": None, "embedding": Binary(v.tobytes()), "dim": FAKE_EMBEDDING_DIM}
+            for i, v in enumerate(vectors)
+        ])
+
+    fixture["counts"] = {
+        "users": len(users), "campaigns": len(campaign_docs), "phases": len(phase_docs),
+        "phasedays": len(day_docs), "tasks": len(task_docs), "knowledge_chunks": knowledge_chunks,
+    }
+    return fixture
+
+
+# === Server giả: OpenAI + Node backend ===
+def fake_embedding(text: str) -> list:
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).normal(size=FAKE_EMBEDDING_DIM)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def upstream_app(ttft_ms: float, token_ms: float, tokens: int, embedding_ms: float, node_ms: float,
+                 prefill_ms: float = 0):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+    seen = set()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "gpt-4o")
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+
+        def chunk(delta=None, usage=None):
+            choices = [] if delta is None else [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]
+            payload = {"id": "chatcmpl-loadtest", "object": "chat.completion.chunk", "created": 0,
+                       "model": model, "choices": choices}
+            if usage is not None:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            # prefill_ms: thêm cho mỗi 1000 token prompt, để context dài/ngắn thấy được qua TTFT
+            await asyncio.sleep((ttft_ms + prefill_ms * prompt_tokens / 1000) / 1000)
+            for i in range(tokens):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                yield chunk(f"tok{i} ")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk(usage={"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                                   "total_tokens": prompt_tokens + tokens})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(embedding_ms / 1000)
+        tokens = sum(len(t) for t in inputs) // 4
+        return {
+            "object": "list", "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(t)} for i, t in enumerate(inputs)],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def record(item):
+        key = (item["userId"], item["phasedayId"])
+        if key in seen:
+            return 409, "Đã check-in"
+        seen.add(key)
+        return 201, "OK"
+
+    @app.post("/checkin")
+    async def checkin(request: Request):
+        await asyncio.sleep(node_ms / 1000)
+        status, message = record(await request.json())
+        return JSONResponse({"message": message}, status_code=status)
+
+    @app.post("/checkin/bulk")
+    async def checkin_bulk(request: Request):
+        await asyncio.sleep(node_ms / 1000)
+        body = await request.json()
+        results = []
+        for item in body["items"]:
+            status, message = record(item)
+            results.append({"status": status, "message": message})
+        return {"results": results}
+
+    @app.post("/campaigns/{campaign_id}/register")
+    async def register(campaign_id: str):
+        await asyncio.sleep(node_ms / 1000)
+        return {"message": "OK"}
+
+    return app
+
+
+def start_upstream(port: int, **latencies):
+    """Chạy server giả trên thread riêng (event loop riêng, không tranh với bộ tạo tải)."""
+    import uvicorn
+
+    config = uvicorn.Config(upstream_app(**latencies), host="127.0.0.1", port=port,
+                            log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
@@ -0,0 +1,77 @@
+# llm_backend/cache.py
+# Cache LRU + TTL dùng chung, an toàn khi gọi từ nhiều thread.
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300):
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data = OrderedDict()  # key → (hết hạn lúc, value)
+        self._lock = threading.Lock()
+        self.hits = metrics.counter(f"{name}_cache_hits_total", f"Số lần cache {name} trúng")
+        self.misses = metrics.counter(f"{name}_cache_misses_total", f"Số lần cache {name} trượt")
+        self.evictions = metrics.counter(f"{name}_cache_evictions_total", f"Số entry cache {name} bị loại")
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key, default=None, count: bool = True):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (self.ttl is None or item[0] > now):
+                self._data.move_to_end(key)
+                if count:
+                    self.hits.inc()
+                return item[1]
+            if item is not None:
+                del self._data[key]  # hết hạn
+        if count:
+            self.misses.inc()
+        return default
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions.inc()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def items(self):
+        now = time.monotonic()
+        with self._lock:
+            return [(k, v) for k, (exp, v) in self._data.items() if exp > now]
+
+    def stats(self):
+        hits, misses = self.hits.value, self.misses.value
+        total = hits + misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,266 @@
+# llm_backend/campaign_context.py
+# Context chiến dịch cho RAG: một aggregation $lookup + cache theo campaign, invalidate qua change stream.
+# Cache giữ sẵn cả bản đầy đủ lẫn từng phần đã tóm tắt + số token (xem context_budget.py).
+import asyncio
+import hashlib
+import logging
+import os
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from cache import LRUTTLCache
+from context_budget import CONTEXT_TOKEN_BUDGET, count_tokens, fit_sections, summarize
+from database import db, campaign_collection
+from utils import format_date
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "500"))
+CONTEXT_CACHE_TTL = float(os.getenv("CONTEXT_CACHE_TTL", "300"))  # giây
+MAX_TASK_TITLES = 10
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "120"))  # mô tả dài hơn thì tóm tắt sẵn
+
+# Câu hỏi chung (không đoán được loại) thì gửi đủ các phần theo thứ tự này
+GENERAL_SECTIONS = ("dates", "location", "description", "volunteers", "certificates", "tasks")
+
+# Các collection có dữ liệu nằm trong context
+WATCHED_COLLECTIONS = ["campaigns", "phases", "phasedays", "tasks", "departments"]
+
+context_cache = LRUTTLCache("campaign_context", maxsize=CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL)
+
+# Map ngược phase/phaseDay → campaign, để biết invalidate context nào khi task/phaseDay đổi
+# (chỉ giữ cho campaign còn trong context_cache, xem _prune_owners)
+_phase_owner = {}
+_phase_day_owner = {}
+_owned = {}  # campaign → (phase ids, phaseDay ids) đã ghi vào hai map trên
+
+
+def _forget_owner(key):
+    phase_ids, phase_day_ids = _owned.pop(key, ((), ()))
+    for phase_id in phase_ids:
+        if _phase_owner.get(phase_id) == key:
+            del _phase_owner[phase_id]
+    for phase_day_id in phase_day_ids:
+        if _phase_day_owner.get(phase_day_id) == key:
+            del _phase_day_owner[phase_day_id]
+
+
+def _prune_owners():
+    """Bỏ map ngược của các campaign đã rời context_cache (LRU loại hoặc hết TTL)."""
+    for key in [k for k in _owned if k not in context_cache]:
+        _forget_owner(key)
+
+
+def _context_pipeline(campaign_id):
+    return [
+        {"$match": {"_id": campaign_id}},
+        {"$project": {
+            "name": 1, "startDate": 1, "endDate": 1, "description": 1,
+            "location.address": 1, "certificatesIssued": 1, "volunteers.status": 1,
+        }},
+        {"$lookup": {
+            "from": "phases",
+            "localField": "_id",
+            "foreignField": "campaignId",
+            "pipeline": [{"$project": {"name": 1, "startDate": 1, "endDate": 1}}],
+            "as": "phases",
+        }},
+        {"$lookup": {
+            "from": "phasedays",
+            "localField": "phases._id",
+            "foreignField": "phaseId",
+            "pipeline": [{"$project": {"phaseId": 1}}],
+            "as": "phaseDays",
+        }},
+        # Đếm + lấy 10 tiêu đề ngay trên server, không kéo toàn bộ task về
+        {"$lookup": {
+            "from": "tasks",
+            "localField": "phaseDays._id",
+            "foreignField": "phaseDayId",
+            "pipeline": [{"$facet": {
+                "titles": [{"$limit": MAX_TASK_TITLES}, {"$project": {"_id": 0, "title": 1}}],
+                "total": [{"$count": "n"}],
+            }}],
+            "as": "taskInfo",
+        }},
+        {"$lookup": {
+            "from": "departments",
+            "localField": "_id",
+            "foreignField": "campaignId",
+            "pipeline": [{"$project": {"_id": 0, "name": 1}}],
+            "as": "departments",
+        }},
+    ]
+
+
+def _fields(doc):
+    """Các phần của context đã format sẵn, dùng chung cho bản đầy đủ và bản rút gọn."""
+    # ==== Volunteers ====
+    volunteers = doc.get("volunteers", [])
+    status_summary = {}
+    for vol in volunteers:
+        status = vol.get("status", "unknown")
+        status_summary[status] = status_summary.get(status, 0) + 1
+    volunteer_info = ", ".join([f"{k}: {v}" for k, v in status_summary.items()])
+    total_volunteers = len(volunteers)
+
+    # ==== Phases ====
+    phase_info_lines = [
+        f"{i+1}. {p['name']} ({format_date(p['startDate'])} - {format_date(p['endDate'])})"
+        for i, p in enumerate(doc.get("phases", []))
+    ]
+    phase_info = "\n".join(phase_info_lines) or "Không có giai đoạn nào cả."
+
+    # ==== Tasks ====
+    task_facet = (doc.get("taskInfo") or [{}])[0]
+    task_titles = [t.get("title", "(Không tên)") for t in task_facet.get("titles", [])]
+    total_tasks = (task_facet.get("total") or [{"n": 0}])[0]["n"]
+    task_info = ", ".join(task_titles)
+    if total_tasks > MAX_TASK_TITLES:
+        task_info += f", ... (tổng cộng {total_tasks} nhiệm vụ)"
+
+    # ==== Departments ====
+    department_info = ", ".join([d.get("name", "Không tên") for d in doc.get("departments", [])]) or "Không có phòng ban nào."
+
+    return {
+        "header": f"📌 Tên chiến dịch: {doc.get('name')}",
+        "time": f"📅 Thời gian: {format_date(doc.get('startDate'))} đến {format_date(doc.get('endDate'))}",
+        "location": f"📍 Địa điểm: {doc.get('location', {}).get('address', 'Không rõ')}",
+        "volunteers": f"🧑‍🤝‍🧑 Tình nguyện viên: {total_volunteers} người ({volunteer_info})",
+        "certificates": f"📜 Chứng chỉ: {'Đã phát' if doc.get('certificatesIssued') else 'Chưa phát'}",
+        "phases": f"🗓️ Giai đoạn:\n{phase_info}",
+        "tasks": f"✅ Nhiệm vụ tiêu biểu:\n{task_info}",
+        "departments": f"🏢 Phòng ban:\n{department_info}",
+    }
+
+
+def render_campaign_context(doc):
+    f = _fields(doc)
+    return f"""
+{f['header']}
+{f['time']}
+{f['location']}
+📝 Mô tả: {doc.get('description', 'Không có mô tả')}
+{f['volunteers']}
+{f['certificates']}
+
+{f['phases']}
+
+{f['tasks']}
+
+{f['departments']}
+"""
+
+
+class CampaignContext:
+    """Context một chiến dịch, dựng một lần khi nạp vào cache: bản đầy đủ như cũ + từng phần
+    (mô tả đã tóm tắt sẵn) kèm số token, để mỗi câu hỏi chỉ còn việc chọn và ghép."""
+    __slots__ = ("full", "full_tokens", "sections", "version")
+
+    def __init__(self, doc):
+        f = _fields(doc)
+        description = summarize(doc.get("description") or "Không có mô tả", CONTEXT_SUMMARY_TOKENS)
+        sections = {
+            "header": f["header"],
+            "dates": f"{f['time']}\n{f['phases']}",
+            "location": f["location"],
+            "description": f"📝 Mô tả: {description}",
+            "volunteers": f"{f['volunteers']}\n{f['departments']}",
+            "certificates": f["certificates"],
+            "tasks": f["tasks"],
+        }
+        self.full = render_campaign_context(doc)
+        self.full_tokens = count_tokens(self.full)
+        self.sections = {name: (text, count_tokens(text)) for name, text in sections.items()}
+        self.version = hashlib.sha1(self.full.encode("utf-8")).hexdigest()[:16]
+
+    def compact(self, question_types, budget: int = CONTEXT_TOKEN_BUDGET):
+        """Chỉ các phần ứng với loại câu hỏi (câu hỏi chung thì đủ cả, mô tả đã tóm tắt),
+        cắt cho vừa budget. Trả về (context, số token)."""
+        names = ["header", *(question_types or GENERAL_SECTIONS)]
+        return fit_sections([self.sections[name] for name in names], budget)
+
+
+async def build_campaign_context(campaign):
+    campaign_id = campaign["_id"]
+    key = str(campaign_id)
+    cached = context_cache.get(key)
+    if cached is not None:
+        return cached
+
+    docs = await campaign_collection.aggregate(_context_pipeline(campaign_id)).to_list(1)
+    doc = docs[0] if docs else campaign
+    context = CampaignContext(doc)
+
+    _forget_owner(key)
+    phase_ids = [p["_id"] for p in doc.get("phases", [])]
+    phase_day_ids = [d["_id"] for d in doc.get("phaseDays", [])]
+    for phase_id in phase_ids:
+        _phase_owner[phase_id] = key
+    for phase_day_id in phase_day_ids:
+        _phase_day_owner[phase_day_id] = key
+    _owned[key] = (phase_ids, phase_day_ids)
+    context_cache.set(key, context)
+    _prune_owners()
+    return context
+
+
+def _owner_of(change):
+    """Tìm campaign bị ảnh hưởng bởi một change event; None nếu không xác định được."""
+    coll = change["ns"]["coll"]
+    doc_id = change.get("documentKey", {}).get("_id")
+    full = change.get("fullDocument") or {}
+    if coll == "campaigns":
+        return str(doc_id)
+    if coll in ("phases", "departments"):
+        if full.get("campaignId"):
+            return str(full["campaignId"])
+        return _phase_owner.get(doc_id) if coll == "phases" else None
+    if coll == "phasedays":
+        return _phase_owner.get(full.get("phaseId")) or _phase_day_owner.get(doc_id)
+    if coll == "tasks":
+        return _phase_day_owner.get(full.get("phaseDayId"))
+    return None
+
+
+async def watch_context_changes():
+    """Invalidate context khi dữ liệu liên quan đổi. Cần replica set (Atlas có sẵn);
+    nếu không hỗ trợ change stream thì chỉ còn dựa vào TTL."""
+    # updateLookup vẫn cần (task chỉ biết thuộc phaseDay nào qua fullDocument) nhưng chỉ trả về các field
+    # để tìm campaign sở hữu, không kéo cả document (campaign có mảng volunteers rất dài) về mỗi lần đổi
+    pipeline = [
+        {"$match": {"ns.coll": {"$in": WATCHED_COLLECTIONS}}},
+        {"$project": {
+            "operationType": 1, "ns": 1, "documentKey": 1,
+            "fullDocument.campaignId": 1, "fullDocument.phaseId": 1, "fullDocument.phaseDayId": 1,
+        }},
+    ]
+    resume_token = None
+    backoff = 1
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                logger.info("✅ Đang theo dõi change stream để invalidate context chiến dịch")
+                backoff = 1
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    owner = _owner_of(change)
+                    if owner is not None:
+                        context_cache.pop(owner)
+                        _forget_owner(owner)
+                    elif change["ns"]["coll"] != "campaigns" and change["operationType"] == "delete":
+                        # Document đã xoá, không còn biết thuộc campaign nào → xoá hết cho chắc
+                        context_cache.clear()
+                        _prune_owners()
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            logger.info(f"ℹ️ Change stream không khả dụng ({e}), context cache chỉ hết hạn theo TTL")
+            return
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Change stream bị ngắt: {e}, thử lại sau {backoff}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+        except Exception as e:
+            logger.error(f"❌ Lỗi không mong muốn ở change stream: {e}, context cache chỉ hết hạn theo TTL")
+            return
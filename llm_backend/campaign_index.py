@@ -0,0 +1,176 @@
+# llm_backend/campaign_index.py
+# Index tên chiến dịch (đã duyệt) trong RAM: bỏ dấu, so khớp trigram, thay cho $regex quét cả collection.
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGN_MATCH_MIN_SCORE = float(os.getenv("CAMPAIGN_MATCH_MIN_SCORE", "0.6"))
+CAMPAIGN_INDEX_REFRESH = float(os.getenv("CAMPAIGN_INDEX_REFRESH", "30"))  # giây giữa hai lần đồng bộ
+CAMPAIGN_INDEX_FULL_EVERY = int(os.getenv("CAMPAIGN_INDEX_FULL_EVERY", "20"))  # nạp lại toàn bộ sau N lần
+CAMPAIGN_INDEX_MISS_REFRESH = float(os.getenv("CAMPAIGN_INDEX_MISS_REFRESH", "2"))  # giây tối thiểu giữa hai lần đồng bộ do trượt
+CAMPAIGN_INDEX_COMMON_GRAM = 64  # trigram xuất hiện ở nhiều tên hơn mức này thì không dùng để chọn ứng viên
+
+
+def fold(text: str) -> str:
+    """Chuẩn hoá để so khớp: thường hoá, bỏ dấu tiếng Việt (đ → d), bỏ ký tự đặc biệt."""
+    text = unicodedata.normalize("NFD", (text or "").lower().replace("đ", "d"))
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def trigrams(folded: str):
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CampaignNameIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # _id → (tên gốc, tên đã fold, tập trigram)
+        self._by_folded = {}  # tên đã fold → _id
+        self._postings = defaultdict(set)  # trigram → {_id}
+        self._last_updated = None
+        self._rounds = 0
+        self._refreshed_at = 0.0
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_stale(self, max_age: float) -> bool:
+        """Lần đồng bộ gần nhất đã cách đây hơn max_age giây."""
+        return time.monotonic() - self._refreshed_at > max_age
+
+    def _remove(self, campaign_id):
+        entry = self._entries.pop(campaign_id, None)
+        if entry is None:
+            return
+        _, folded, grams = entry
+        if self._by_folded.get(folded) == campaign_id:
+            del self._by_folded[folded]
+        for g in grams:
+            self._postings[g].discard(campaign_id)
+
+    def upsert(self, campaign_id, name: str):
+        folded = fold(name)
+        with self._lock:
+            self._remove(campaign_id)
+            if not folded:
+                return
+            grams = trigrams(folded)
+            self._entries[campaign_id] = (name, folded, grams)
+            self._by_folded[folded] = campaign_id
+            for g in grams:
+                self._postings[g].add(campaign_id)
+
+    def remove(self, campaign_id):
+        with self._lock:
+            self._remove(campaign_id)
+
+    async def refresh(self, campaign_collection, full: bool = False):
+        """Đồng bộ tăng dần theo updatedAt; định kỳ nạp lại toàn bộ để bắt các campaign bị xoá."""
+        full = full or not self.loaded or self._rounds % CAMPAIGN_INDEX_FULL_EVERY == 0
+        self._rounds += 1
+        self._refreshed_at = time.monotonic()
+        query = {} if full or self._last_updated is None else {"updatedAt": {"$gt": self._last_updated}}
+        seen = set()
+        async for doc in campaign_collection.find(query, {"name": 1, "acceptStatus": 1, "updatedAt": 1}):
+            seen.add(doc["_id"])
+            if doc.get("acceptStatus") == "approved" and doc.get("name"):
+                self.upsert(doc["_id"], doc["name"])
+            else:
+                self.remove(doc["_id"])
+            updated = doc.get("updatedAt")
+            if updated is not None and (self._last_updated is None or updated > self._last_updated):
+                self._last_updated = updated
+        if full:
+            for campaign_id in [i for i in self._entries if i not in seen]:
+                self.remove(campaign_id)
+            if not self.loaded:
+                logger.info(f"✅ Đã nạp {len(self)} tên chiến dịch vào index")
+        self.loaded = True
+
+    def match(self, query: str, min_score: float = CAMPAIGN_MATCH_MIN_SCORE):
+        """Trả về (campaign_id, tên, score ∈ [0, 1]) khớp nhất, hoặc None.
+
+        - Trùng tên sau khi bỏ dấu: 1.0
+        - Tên chiến dịch nằm trọn trong câu (câu có thêm từ thừa): 0.9 → 1.0, ưu tiên tên dài
+        - Còn lại: độ giống trigram (gõ sai / thiếu vài chữ)
+        """
+        q = fold(query)
+        if not q:
+            return None
+        words = q.split()
+        with self._lock:
+            # Tra các cụm từ liên tiếp của câu, dài trước: O(số từ²) lần tra dict
+            for length in range(len(words), 0, -1):
+                for start in range(len(words) - length + 1):
+                    campaign_id = self._by_folded.get(" ".join(words[start:start + length]))
+                    if campaign_id is not None:
+                        folded = self._entries[campaign_id][1]
+                        score = 1.0 if length == len(words) else 0.9 + 0.1 * len(folded) / len(q)
+                        return campaign_id, self._entries[campaign_id][0], round(score, 4)
+
+            # Ứng viên lấy từ các trigram hiếm; trigram có mặt ở quá nhiều tên (vd "chien dich") bỏ qua
+            q_grams = trigrams(q)
+            candidates = set()
+            for g in q_grams:
+                posting = self._postings.get(g)
+                if posting and len(posting) <= CAMPAIGN_INDEX_COMMON_GRAM:
+                    candidates |= posting
+
+            best = None
+            for cid in candidates:
+                name, folded, grams = self._entries[cid]
+                shared = len(grams & q_grams)
+                # Trung bình giữa "tên nằm trong câu bao nhiêu" và Dice của hai chuỗi
+                containment = shared / len(grams)
+                dice = 2 * shared / (len(grams) + len(q_grams))
+                score = 0.85 * (containment + dice) / 2
+                if best is None or score > best[2]:
+                    best = (cid, name, score)
+        if best is None or best[2] < min_score:
+            return None
+        return best[0], best[1], round(best[2], 4)
+
+
+async def keep_campaign_index_fresh(campaign_collection):
+    while True:
+        try:
+            await campaign_index.refresh(campaign_collection)
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Không đồng bộ được index tên chiến dịch: {e}")
+        await asyncio.sleep(CAMPAIGN_INDEX_REFRESH)
+
+
+async def find_campaign(campaign_collection, name: str, projection=None):
+    """Tìm chiến dịch đã duyệt theo tên gần đúng; trả về (document, score) hoặc (None, 0)."""
+    if not campaign_index.loaded:
+        await campaign_index.refresh(campaign_collection)
+    hit = campaign_index.match(name)
+    if hit is None and campaign_index.is_stale(CAMPAIGN_INDEX_MISS_REFRESH):
+        # Có thể là chiến dịch vừa được duyệt: đồng bộ tăng dần (theo updatedAt) rồi thử lại
+        await campaign_index.refresh(campaign_collection)
+        hit = campaign_index.match(name)
+    if hit is None:
+        return None, 0.0
+    campaign_id, _, score = hit
+    campaign = await campaign_collection.find_one({"_id": campaign_id, "acceptStatus": "approved"}, projection)
+    if campaign is None:
+        campaign_index.remove(campaign_id)
+        return None, 0.0
+    return campaign, score
+
+
+campaign_index = CampaignNameIndex()
@@ -0,0 +1,163 @@
+# llm_backend/chat_app.py
+# Các endpoint chatbot (/chat, /chat/stream) + các tác vụ nền giữ index / cache của chatbot.
+# Không import gì từ stack khuôn mặt nên process chỉ chạy chatbot không phải nạp TensorFlow.
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+
+from ai_logic import answer_user_question, router as intent_router  # Logic chatbot
+from context_budget import load_tokenizer
+import llm_client
+from llm_client import LLMBusy, embed_texts
+from campaign_context import context_cache, watch_context_changes
+from campaign_index import campaign_index, keep_campaign_index_fresh
+from response_cache import response_cache
+from session_store import session_store
+from rag.index import knowledge_index, keep_fresh, RAG_RETRIEVAL, RAG_AUTO_INGEST
+from rag.ingest import ingest
+import database
+from database import campaign_collection
+from utils import sse_event
+from log_setup import bind
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+_tasks = []
+
+# === Vòng đời: các tác vụ nền của chatbot ===
+async def ingest_knowledge():
+    await ingest(
+        database.knowledge_chunk_collection, database.knowledge_collection,
+        campaign_collection, embed_texts,
+    )
+
+def start():
+    _tasks.append(asyncio.create_task(asyncio.to_thread(load_tokenizer)))
+    _tasks.append(asyncio.create_task(watch_context_changes()))
+    _tasks.append(asyncio.create_task(keep_campaign_index_fresh(campaign_collection)))
+    if RAG_RETRIEVAL:
+        _tasks.append(asyncio.create_task(keep_fresh(
+            database.knowledge_chunk_collection, ingest_knowledge if RAG_AUTO_INGEST else None,
+        )))
+
+async def stop():
+    while _tasks:
+        _tasks.pop().cancel()
+    await llm_client.close()
+
+def not_ready_reason():
+    return None
+
+def stats():
+    return {
+        "campaign_context_cache": context_cache.stats(),
+        "chat_sessions": session_store.stats(),
+        "campaign_index": {"size": len(campaign_index), "loaded": campaign_index.loaded},
+        "intents": intent_router.stats(),
+        "knowledge_index": {"chunks": len(knowledge_index), "loaded": knowledge_index.loaded},
+        "response_cache": response_cache.stats() if response_cache is not None else {"enabled": False},
+    }
+
+# === Pydantic Models ===
+class ChatData(BaseModel):
+    message: str
+    userId: Optional[str] = None  # Có thể không có nếu là guest
+    sessionId: Optional[str] = None  # Guest: id phiên do frontend sinh để nhớ ngữ cảnh hội thoại
+
+LLM_BUSY_DETAIL = "⏳ Chatbot đang bận quá, anh/chị hỏi lại sau giây lát nha!"
+
+def busy_error(detail: str = LLM_BUSY_DETAIL):
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": "1"},
+    )
+
+# === Endpoint: Chatbot ===
+@router.post("/chat")
+async def chat(data: ChatData, request: Request):
+    try:
+        token = request.headers.get("Authorization")  # 🎯 Lấy token từ header
+        bind(user_id=data.userId)
+
+        # Gọi đúng hàm với đầy đủ tham số
+        reply = await answer_user_question(
+            user_input=data.message,
+            user_id=data.userId,
+            token=token,
+            session_id=data.sessionId,
+        )
+
+        return {"reply": reply}  # Trả lại response chatbot
+
+    except LLMBusy:
+        raise busy_error()
+    except Exception as e:
+        logger.error(f"Lỗi tại /chat: {e}")
+        raise HTTPException(status_code=500, detail=f"Lỗi xử lý câu hỏi: {str(e)}")
+
+# === Endpoint: Chatbot dạng stream (Server-Sent Events) ===
+# Mỗi đoạn text: `data: {"delta": "..."}`; kết thúc: `event: done` kèm cả câu trả lời.
+@router.post("/chat/stream")
+async def chat_stream(data: ChatData, request: Request):
+    bind(user_id=data.userId)
+    try:
+        reply = await answer_user_question(
+            user_input=data.message,
+            user_id=data.userId,
+            token=request.headers.get("Authorization"),
+            stream=True,
+            session_id=data.sessionId,
+        )
+        if isinstance(reply, str):
+            first, rest = reply, None
+        else:
+            # Lấy đoạn đầu trước khi mở response để lỗi quá tải vẫn trả được 503
+            rest = reply
+            first = await anext(rest, "")
+    except LLMBusy:
+        raise busy_error()
+    except Exception as e:
+        logger.error(f"Lỗi tại /chat/stream: {e}")
+        raise HTTPException(status_code=500, detail=f"Lỗi xử lý câu hỏi: {str(e)}")
+
+    async def events():
+        parts = [first]
+        try:
+            if first:
+                yield sse_event({"delta": first})
+            if rest is not None:
+                try:
+                    async for delta in rest:
+                        parts.append(delta)
+                        yield sse_event({"delta": delta})
+                except Exception as e:
+                    logger.error(f"Lỗi khi stream /chat/stream: {e}")
+                    yield sse_event({"detail": "Có lỗi khi gọi GPT"}, event="error")
+                    return
+            yield sse_event({"reply": "".join(parts)}, event="done")
+        finally:
+            # Client ngắt giữa chừng: đóng ngay stream OpenAI + trả slot llm_client, không đợi GC
+            if rest is not None:
+                await rest.aclose()
+
+    # Starlette không đóng body_iterator khi client ngắt (chỉ huỷ task đang send), còn background
+    # thì vẫn chạy: aclose() tường minh để finally trong events() đóng stream OpenAI
+    stream = events()
+
+    async def close_stream():
+        await stream.aclose()
+
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(close_stream),
+    )
@@ -0,0 +1,353 @@
+# llm_backend/checkin.py
+# Logic check-in bằng khuôn mặt: so khớp với descriptor đã đăng ký rồi ghi sang Node.
+# - verify_and_checkin: một ảnh (/checkin, /checkin/raw)
+# - bulk_checkin: cả lô ảnh chụp offline (/checkin/bulk) — decode song song, ArcFace theo batch,
+#   descriptor lấy bằng một query $in, ghi sang Node theo lô qua POST /checkin/bulk
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from bson import ObjectId
+
+import http_client
+import metrics
+from batching import embed_face
+from database import user_collection
+from descriptor_cache import descriptor_cache
+from descriptor_prefetch import descriptor_prefetcher
+from face_index import normalize
+from image_io import decode_image, decode_base64_image
+from inference import executor, represent_faces, InferenceQueueFull
+from tracing import stage
+
+logger = logging.getLogger(__name__)
+
+# Ngưỡng cosine distance để coi là cùng một người
+FACE_MATCH_THRESHOLD = 0.35
+
+# === Cấu hình check-in theo lô ===
+BULK_CHECKIN_MAX_ITEMS = int(os.getenv("BULK_CHECKIN_MAX_ITEMS", "500"))
+BULK_CHECKIN_BATCH = int(os.getenv("BULK_CHECKIN_BATCH", "16"))  # số ảnh mỗi lượt ArcFace
+BULK_CHECKIN_DECODE_WORKERS = int(os.getenv("BULK_CHECKIN_DECODE_WORKERS", "4"))
+BULK_CHECKIN_BUSY_RETRIES = int(os.getenv("BULK_CHECKIN_BUSY_RETRIES", "40"))  # mỗi lần chờ 0.25s
+# Trần kích thước: body request (zip/JSON) và dung lượng đã giải nén (xem ZipInfo.file_size trước khi đọc)
+BULK_CHECKIN_MAX_BYTES = int(os.getenv("BULK_CHECKIN_MAX_BYTES", str(100 * 1024 * 1024)))
+BULK_CHECKIN_MAX_IMAGE_BYTES = int(os.getenv("BULK_CHECKIN_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+BULK_CHECKIN_MAX_UNZIPPED_BYTES = int(os.getenv("BULK_CHECKIN_MAX_UNZIPPED_BYTES", str(200 * 1024 * 1024)))
+BULK_MANIFEST = "manifest.json"
+MANIFEST_MAX_BYTES = 1024 * 1024
+REQUIRED_FIELDS = ("user_id", "campaignId", "phaseId", "phasedayId")
+
+bulk_items = metrics.counter("bulk_checkin_items_total", "Số ảnh nhận qua /checkin/bulk")
+bulk_saved = metrics.counter("bulk_checkin_saved_total", "Số check-in lưu thành công qua /checkin/bulk")
+bulk_chunk_seconds = metrics.histogram("bulk_checkin_chunk_seconds", "Thời gian xử lý một chunk check-in theo lô")
+
+_decode_pool = ThreadPoolExecutor(max_workers=BULK_CHECKIN_DECODE_WORKERS, thread_name_prefix="bulk-decode")
+_bulk_endpoint = True  # False khi Node chưa có /checkin/bulk → ghi từng cái qua /checkin
+
+
+class BulkCheckinError(ValueError):
+    """Lô check-in không hợp lệ (thiếu manifest, quá nhiều ảnh...) → 422."""
+
+
+def checkin_result(distance: float, status_code: int = None, server_msg: str = None):
+    """Kết quả trả về cho client; status_code là mã Node trả khi ghi check-in (nếu đã khớp)."""
+    if distance >= FACE_MATCH_THRESHOLD:
+        return {
+            "status": f"🚫 Không khớp khuôn mặt! (Khoảng cách: {distance:.4f})",
+            "distance": distance,
+            "saved": False
+        }
+    if status_code == 201:
+        return {
+            "status": "✅ Check-in thành công!",
+            "distance": distance,
+            "saved": True
+        }
+    if status_code == 409:
+        return {
+            "status": "⚠️ Hôm nay checkin rồi á nha!",
+            "distance": distance,
+            "saved": False
+        }
+    return {
+        "status": "✅ Nhận diện ok nhưng lỗi lưu!",
+        "distance": distance,
+        "saved": False,
+        "server_msg": server_msg
+    }
+
+
+def checkin_payload(user_id: str, campaign_id: str, phase_id: str, phaseday_id: str):
+    return {
+        "userId": user_id,
+        "campaignId": campaign_id,
+        "phaseId": phase_id,
+        "phasedayId": phaseday_id,
+        "method": "face"
+    }
+
+
+async def verify_and_checkin(camera_img, user_id: str, campaign_id: str, phase_id: str, phaseday_id: str):
+    """Dùng chung cho /checkin và /checkin/raw; trả None nếu user chưa đăng ký khuôn mặt."""
+    with stage("embed"):
+        embedding_checkin = await embed_face(camera_img)
+
+    # Descriptor đã chuẩn hoá sẵn (block nạp trước theo phaseDay, rồi tới cache) → cosine distance chỉ còn một phép dot
+    with stage("descriptor"):
+        embedding_registered = descriptor_prefetcher.get(phaseday_id, user_id)
+        if embedding_registered is None:
+            embedding_registered = await descriptor_cache.get(user_collection, user_id)
+    if embedding_registered is None:
+        return None
+
+    distance = 1 - float(np.dot(normalize(embedding_checkin), embedding_registered))
+    if distance >= FACE_MATCH_THRESHOLD:
+        return checkin_result(distance)
+
+    with stage("backend"):
+        res = await http_client.post("/checkin", json=checkin_payload(user_id, campaign_id, phase_id, phaseday_id))
+    return checkin_result(distance, res.status_code, res.text)
+
+
+# === Đọc lô check-in ===
+def _record(index: int, item) -> dict:
+    if not isinstance(item, dict):
+        return {"index": index, "error": "Bản ghi không hợp lệ"}
+    record = {"index": index, **{k: str(item.get(k) or "") for k in REQUIRED_FIELDS}}
+    missing = [k for k in REQUIRED_FIELDS if not record[k]]
+    if missing:
+        record["error"] = f"Thiếu tham số: {', '.join(missing)}"
+    elif not ObjectId.is_valid(record["user_id"]):
+        record["error"] = "user_id không hợp lệ"
+    else:
+        record["user_id"] = record["user_id"].lower()  # khớp key str(ObjectId) trong descriptor cache
+    return record
+
+
+def _check_size(items):
+    if not isinstance(items, list) or not items:
+        raise BulkCheckinError("Lô check-in rỗng")
+    if len(items) > BULK_CHECKIN_MAX_ITEMS:
+        raise BulkCheckinError(f"Tối đa {BULK_CHECKIN_MAX_ITEMS} ảnh mỗi lô (nhận {len(items)})")
+
+
+def parse_bulk_items(items):
+    """JSON: [{user_id, image (base64), campaignId, phaseId, phasedayId}, ...]"""
+    _check_size(items)
+    records = []
+    for index, item in enumerate(items):
+        record = _record(index, item)
+        if "error" not in record:
+            if not item.get("image"):
+                record["error"] = "Thiếu tham số: image"
+            else:
+                record["image"] = item["image"]
+        records.append(record)
+    return records
+
+
+def parse_bulk_zip(data: bytes):
+    """Zip: manifest.json là list bản ghi như JSON nhưng thay "image" bằng "file" (đường dẫn ảnh trong zip).
+    Dung lượng giải nén được kiểm tra theo ZipInfo.file_size trước khi đọc (ZipExtFile không đọc quá con số này)."""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        manifest = archive.getinfo(BULK_MANIFEST)
+        if manifest.file_size > MANIFEST_MAX_BYTES:
+            raise BulkCheckinError(f"{BULK_MANIFEST} quá lớn ({manifest.file_size} byte)")
+        items = json.loads(archive.read(manifest))
+    except KeyError:
+        raise BulkCheckinError(f"File zip thiếu {BULK_MANIFEST}")
+    except BulkCheckinError:
+        raise
+    except (zipfile.BadZipFile, ValueError) as e:
+        raise BulkCheckinError(f"File zip không hợp lệ: {e}")
+    _check_size(items)
+
+    # Chọn ảnh cần đọc + cộng dung lượng giải nén trước khi đọc byte nào
+    entries = {info.filename: info for info in archive.infolist()}
+    records, wanted, total = [], [], 0
+    for index, item in enumerate(items):
+        record = _record(index, item)
+        if "error" not in record:
+            info = entries.get(item.get("file"))
+            if info is None:
+                record["error"] = f"Không có ảnh '{item.get('file')}' trong file zip"
+            elif info.file_size > BULK_CHECKIN_MAX_IMAGE_BYTES:
+                record["error"] = f"Ảnh '{info.filename}' vượt {BULK_CHECKIN_MAX_IMAGE_BYTES} byte"
+            else:
+                wanted.append((record, info))
+                total += info.file_size
+        records.append(record)
+    if total > BULK_CHECKIN_MAX_UNZIPPED_BYTES:
+        raise BulkCheckinError(f"Ảnh giải nén vượt {BULK_CHECKIN_MAX_UNZIPPED_BYTES} byte (cần {total})")
+
+    try:
+        for record, info in wanted:
+            record["image_bytes"] = archive.read(info)
+    except (zipfile.BadZipFile, ValueError) as e:
+        raise BulkCheckinError(f"File zip không hợp lệ: {e}")
+    return records
+
+
+# === Xử lý lô ===
+def _decode(record):
+    # Nhả dữ liệu gốc ngay sau khi decode để cả lô không giữ hai bản ảnh trong RAM
+    if "image_bytes" in record:
+        return decode_image(record.pop("image_bytes"))
+    return decode_base64_image(record.pop("image"))
+
+
+async def _represent(images):
+    """ArcFace cho cả chunk; hàng đợi inference đầy thì chờ thay vì bỏ cả lô."""
+    for attempt in range(BULK_CHECKIN_BUSY_RETRIES + 1):
+        try:
+            return await executor.run(represent_faces, images)
+        except InferenceQueueFull:
+            if attempt == BULK_CHECKIN_BUSY_RETRIES:
+                raise
+            await asyncio.sleep(0.25)
+
+
+def _bulk_results(res, count: int):
+    """[(status_code, message)] từ body 200 của Node /checkin/bulk; None nếu body không đúng dạng
+    hoặc số kết quả khác số check-in đã gửi (ghép theo thứ tự sẽ gán nhầm người)."""
+    try:
+        results = res.json().get("results")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(results, list) or len(results) != count or not all(isinstance(r, dict) for r in results):
+        return None
+    return [(r.get("status"), r.get("message")) for r in results]
+
+
+async def post_checkins(payloads):
+    """Ghi nhiều check-in sang Node trong một request; trả về [(status_code, message)] cùng thứ tự."""
+    global _bulk_endpoint
+    if _bulk_endpoint:
+        res = await http_client.post("/checkin/bulk", json={"items": payloads})
+        if res.status_code == 200:
+            results = _bulk_results(res, len(payloads))
+            if results is not None:
+                return results
+            # /checkin trả 409 cho cái đã ghi nên ghi lại từng cái không tạo check-in trùng
+            logger.warning("⚠️ Node /checkin/bulk trả kết quả không khớp lô, ghi từng check-in qua /checkin")
+        elif res.status_code != 404:
+            return [(res.status_code, res.text)] * len(payloads)
+        else:
+            logger.warning("⚠️ Node backend chưa có /checkin/bulk, ghi từng check-in qua /checkin")
+            _bulk_endpoint = False
+    responses = await asyncio.gather(*[http_client.post("/checkin", json=p) for p in payloads])
+    return [(r.status_code, r.text) for r in responses]
+
+
+def _error(record, message: str):
+    return {"index": record["index"], "user_id": record.get("user_id"), "saved": False, "error": message}
+
+
+async def _process_chunk(chunk, descriptors):
+    t0 = time.perf_counter()
+    results = {}
+    loop = asyncio.get_running_loop()
+
+    # User chưa đăng ký khuôn mặt thì không tốn decode / ArcFace
+    pending = []
+    for record in chunk:
+        if record["user_id"] not in descriptors:
+            results[record["index"]] = _error(record, "❌ Không tìm thấy khuôn mặt đã đăng ký.")
+        else:
+            pending.append(record)
+
+    with stage("decode"):
+        images = await asyncio.gather(
+            *[loop.run_in_executor(_decode_pool, _decode, r) for r in pending], return_exceptions=True,
+        )
+    decoded = []
+    for record, image in zip(pending, images):
+        if isinstance(image, Exception):
+            results[record["index"]] = _error(record, f"Lỗi nhận diện: {image}")
+        else:
+            decoded.append((record, image))
+
+    matched = []
+    if decoded:
+        with stage("embed"):
+            embeddings = await _represent([image for _, image in decoded])
+        for (record, _), (embedding, error) in zip(decoded, embeddings):
+            if error is not None:
+                results[record["index"]] = _error(record, f"Lỗi nhận diện: {error}")
+                continue
+            distance = 1 - float(np.dot(normalize(embedding), descriptors[record["user_id"]]))
+            if distance < FACE_MATCH_THRESHOLD:
+                matched.append((record, distance))
+            else:
+                results[record["index"]] = {"index": record["index"], "user_id": record["user_id"],
+                                            **checkin_result(distance)}
+
+    if matched:
+        with stage("backend"):
+            responses = await post_checkins([
+                checkin_payload(r["user_id"], r["campaignId"], r["phaseId"], r["phasedayId"]) for r, _ in matched
+            ])
+        for (record, distance), (status_code, message) in zip(matched, responses):
+            results[record["index"]] = {"index": record["index"], "user_id": record["user_id"],
+                                        **checkin_result(distance, status_code, message)}
+
+    bulk_chunk_seconds.observe(time.perf_counter() - t0)
+    return [results[r["index"]] for r in chunk]
+
+
+async def bulk_checkin(records, batch_size: int = BULK_CHECKIN_BATCH):
+    """Xử lý cả lô; yield kết quả từng ảnh (kèm index trong lô) ngay khi chunk chứa nó xong."""
+    bulk_items.inc(len(records))
+    valid = []
+    for record in records:
+        if "error" in record:
+            yield _error(record, record["error"])
+        else:
+            valid.append(record)
+    if not valid:
+        return
+
+    # Lấy từ block phaseDay nạp sẵn trước, phần còn lại một query $in cho mọi descriptor chưa có trong cache
+    with stage("descriptor"):
+        descriptors, missing = {}, []
+        for r in valid:
+            vector = descriptor_prefetcher.get(r["phasedayId"], r["user_id"])
+            if vector is not None:
+                descriptors[r["user_id"]] = vector
+            else:
+                missing.append(r["user_id"])
+        if missing:
+            descriptors.update(await descriptor_cache.get_many(user_collection, missing))
+
+    chunks = [valid[i:i + batch_size] for i in range(0, len(valid), batch_size)]
+    done = asyncio.Queue()
+    # Thêm một chunk so với số worker để decode chunk sau chạy song song với ArcFace chunk trước
+    slots = asyncio.Semaphore(executor.workers + 1)
+
+    async def run(chunk):
+        async with slots:
+            try:
+                results = await _process_chunk(chunk, descriptors)
+            except Exception as e:
+                logger.error(f"Lỗi khi check-in theo lô: {e}")
+                results = [_error(r, f"Lỗi nhận diện: {e}") for r in chunk]
+        await done.put(results)
+
+    tasks = [asyncio.create_task(run(chunk)) for chunk in chunks]
+    try:
+        for _ in chunks:
+            for result in await done.get():
+                if result.get("saved"):
+                    bulk_saved.inc()
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,204 @@
+# llm_backend/context_budget.py
+# Đếm token và cắt context theo ngân sách cho prompt RAG: đoán loại câu hỏi (ngày, địa điểm, nhiệm vụ,
+# TNV, chứng chỉ) để chỉ gửi phần liên quan, tóm tắt / cắt field dài cho vừa CONTEXT_TOKEN_BUDGET.
+# Đếm bằng tokenizer của OPENAI_MODEL (tiktoken, có trong requirements.txt); chỉ khi thiếu package hoặc
+# không tải được file BPE mới ước lượng theo số ký tự (lệch nhiều với tiếng Việt, có log cảnh báo).
+# Máy không ra được internet: đặt TIKTOKEN_CACHE_DIR trỏ tới thư mục đã có sẵn file BPE.
+import logging
+import os
+import random
+import re
+
+import metrics
+from campaign_index import fold
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_COMPACT = os.getenv("CONTEXT_COMPACT", "1") == "1"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "350"))  # token tối đa cho context gửi GPT
+# Tỉ lệ câu hỏi vẫn gửi context đầy đủ làm đối chứng, để đo được TTFT chênh bao nhiêu (0 = tắt)
+CONTEXT_COMPACT_HOLDOUT = float(os.getenv("CONTEXT_COMPACT_HOLDOUT", "0.05"))
+# Giống llm_client.OPENAI_MODEL (không import để khỏi tạo client OpenAI)
+TOKENIZER_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+CHARS_PER_TOKEN = 3.0  # ước lượng cho tiếng Việt có dấu khi không có tiktoken
+ELLIPSIS = "…"
+MIN_SECTION_TOKENS = 20  # chỗ trống ít hơn thì bỏ hẳn phần đó thay vì cắt còn vài chữ
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+_encoding = None
+_encoding_failed = False
+
+TOKEN_BUCKETS = (50, 100, 200, 350, 500, 750, 1000, 1500, 2500, 4000)
+CONTEXT_MODES = ("compact", "full")
+TTFT_SMOOTHING = 0.1  # trọng số mẫu mới trong TTFT trung bình (EWMA) của mỗi loại context
+
+context_tokens = {
+    mode: metrics.histogram("rag_context_tokens", "Số token context gửi GPT", buckets=TOKEN_BUCKETS,
+                            labels={"context": mode})
+    for mode in CONTEXT_MODES
+}
+context_ttft = {
+    mode: metrics.histogram("rag_time_to_first_token_seconds", "TTFT câu trả lời RAG theo loại context",
+                            labels={"context": mode})
+    for mode in CONTEXT_MODES
+}
+tokens_saved = metrics.counter("rag_context_tokens_saved_total", "Số token context không phải gửi nhờ rút gọn")
+_ttft_average = {}  # mode → TTFT trung bình (giây)
+
+# Từ khoá (đã bỏ dấu, xem campaign_index.fold) → loại câu hỏi; khớp theo ranh giới từ
+QUESTION_TYPES = {
+    "dates": ("khi nao", "bao gio", "ngay nao", "ngay may", "thoi gian", "lich", "giai doan", "bat dau",
+              "ket thuc", "may gio", "thang may", "keo dai", "bao lau"),
+    "location": ("o dau", "dia diem", "dia chi", "cho nao", "noi nao", "tai dau", "duong di", "khu vuc"),
+    "tasks": ("nhiem vu", "cong viec", "lam gi", "lam nhung gi", "task", "phan cong", "hoat dong"),
+    "volunteers": ("tinh nguyen vien", "tnv", "bao nhieu nguoi", "so nguoi", "so luong", "thanh vien",
+                   "phong ban", "ai tham gia", "con slot", "con cho", "du nguoi"),
+    "certificates": ("chung chi", "chung nhan", "giay khen", "certificate"),
+}
+_type_patterns = {
+    name: re.compile(r"\b(" + "|".join(re.escape(k) for k in keywords) + r")\b")
+    for name, keywords in QUESTION_TYPES.items()
+}
+
+
+def _get_encoding(model: str = TOKENIZER_MODEL):
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed and TIKTOKEN_AVAILABLE:
+        try:
+            _encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # Lần đầu tiktoken tải file BPE qua mạng; không tải được thì dùng ước lượng
+            _encoding_failed = True
+            logger.warning(f"⚠️ Không nạp được tokenizer {model}: {e}, đếm token theo số ký tự")
+    return _encoding
+
+
+def load_tokenizer() -> str:
+    """Nạp tokenizer trước (lần đầu tiktoken tải file BPE) để câu hỏi đầu tiên không phải chờ.
+    Trả về cách đang đếm token: "tiktoken" hoặc "estimate"."""
+    if not TIKTOKEN_AVAILABLE:
+        logger.warning("⚠️ Chưa cài tiktoken, số token context chỉ là ước lượng theo số ký tự")
+    return "tiktoken" if _get_encoding() is not None else "estimate"
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    """Cắt text cho vừa limit token, ở ranh giới từ, thêm "…" nếu bị cắt."""
+    if count_tokens(text) <= limit:
+        return text
+    if limit <= 0:
+        return ""
+    # Ước lượng vị trí cắt rồi lùi dần (mỗi lần ~10%) tới khi vừa
+    cut = min(len(text), int(limit * CHARS_PER_TOKEN))
+    while cut > 0:
+        head = text[:cut].rsplit(" ", 1)[0] if " " in text[:cut] else text[:cut]
+        candidate = head.rstrip(" ,;:-") + ELLIPSIS
+        if count_tokens(candidate) <= limit:
+            return candidate
+        cut = int(cut * 0.9)
+    return ""
+
+
+def summarize(text: str, limit: int) -> str:
+    """Tóm tắt kiểu trích: giữ các câu đầu theo thứ tự tới khi hết limit token.
+    Mô tả chiến dịch thường mở đầu bằng mục đích + đối tượng, phần sau là chi tiết phụ."""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if count_tokens(text) <= limit:
+        return text
+    sentences = re.split(r"(?<=[.!?…])\s+", text)
+    kept, used = [], 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence)
+        if used + tokens > limit:
+            break
+        kept.append(sentence)
+        used += tokens
+    if not kept:
+        return truncate_tokens(sentences[0], limit)
+    return " ".join(kept) + " " + ELLIPSIS
+
+
+def detect_question_types(question: str):
+    """Các loại thông tin câu hỏi cần; rỗng = câu hỏi chung (gửi tất cả, đã tóm tắt)."""
+    folded = fold(question)
+    return [name for name, pattern in _type_patterns.items() if pattern.search(folded)]
+
+
+def fit_sections(sections, budget: int):
+    """sections: [(text, tokens)] theo thứ tự ưu tiên. Phần nào không còn đủ chỗ thì bị cắt,
+    hết ngân sách thì bỏ các phần sau. Trả về (text, số token)."""
+    parts, used = [], 0
+    for text, tokens in sections:
+        remaining = budget - used
+        if remaining <= 0:
+            break
+        if tokens > remaining:
+            if remaining < MIN_SECTION_TOKENS:
+                break
+            text = truncate_tokens(text, remaining)
+            if not text:
+                break
+            tokens = count_tokens(text)
+        parts.append(text)
+        used += tokens
+    return "\n".join(parts), used
+
+
+def context_mode() -> str:
+    """"compact", "full" (tắt CONTEXT_COMPACT) hoặc "holdout": câu hỏi đối chứng gửi bản đầy đủ,
+    không dùng cache câu trả lời để TTFT đo được là của GPT."""
+    if not CONTEXT_COMPACT:
+        return "full"
+    if CONTEXT_COMPACT_HOLDOUT > 0 and random.random() < CONTEXT_COMPACT_HOLDOUT:
+        return "holdout"
+    return "compact"
+
+
+class ContextReport:
+    """Số token context của một câu hỏi; ghi metrics + log khi GPT trả token đầu tiên."""
+    __slots__ = ("mode", "question_types", "full_tokens", "tokens")
+
+    def __init__(self, mode: str, question_types, full_tokens: int, tokens: int):
+        self.mode = mode
+        self.question_types = question_types
+        self.full_tokens = full_tokens
+        self.tokens = tokens
+
+    @property
+    def saved(self) -> int:
+        return self.full_tokens - self.tokens
+
+    def record(self, ttft: float):
+        context_tokens[self.mode].observe(self.tokens)
+        context_ttft[self.mode].observe(ttft)
+        if self.saved > 0:
+            tokens_saved.inc(self.saved)
+        average = _ttft_average.get(self.mode)
+        _ttft_average[self.mode] = ttft if average is None else average + TTFT_SMOOTHING * (ttft - average)
+
+        # Chênh lệch so với TTFT trung bình của các câu hỏi đối chứng gửi context đầy đủ
+        baseline = _ttft_average.get("full") if self.mode == "compact" else None
+        delta_ms = round((ttft - baseline) * 1000) if baseline is not None else None
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "🧮 Context %s (%s): %d/%d token, bớt %d, TTFT %dms%s",
+                self.mode, ",".join(self.question_types) or "chung", self.tokens, self.full_tokens, self.saved,
+                ttft * 1000, f" ({delta_ms:+d}ms so với đầy đủ)" if delta_ms is not None else "",
+                extra={"context": self.mode, "context_tokens": self.tokens, "tokens_saved": self.saved,
+                       "ttft_ms": round(ttft * 1000, 1), "ttft_delta_ms": delta_ms},
+            )
@@ -1,21 +1,120 @@
 # llm_backend/database.py
+# Data-access dùng chung: một connection pool (Motor/async) cho cả process.
+import logging
 import os
-from pymongo import MongoClient
+import threading
+import time
+
 from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+import metrics
+from tracing import MongoCommandListener
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 mongo_uri = os.getenv("MONGO_URI")
 if not mongo_uri:
     raise ValueError("MONGO_URI không được thiết lập")
 
-mongo_client = MongoClient(mongo_uri)
-db = mongo_client["VHHT"]
+# === Cấu hình pool qua biến môi trường ===
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "VHHT")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "15000"))
+MONGO_SLOW_POOL_WAIT_MS = float(os.getenv("MONGO_SLOW_POOL_WAIT_MS", "100"))
+
+pool_wait = metrics.histogram("mongo_pool_wait_seconds", "Thời gian chờ lấy connection từ pool")
+pool_checkout_failed = metrics.counter("mongo_pool_checkout_failed_total", "Số lần lấy connection thất bại")
+pool_connections = metrics.gauge("mongo_pool_connections", "Số connection Mongo đang mở")
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Ghi nhận thời gian chờ pool; log cảnh báo khi chờ lâu (pool quá nhỏ / Atlas quá tải).
+
+    Check-out bắt đầu và kết thúc trên cùng một thread của driver nên mốc
+    thời gian được giữ trong thread-local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        if started is None:
+            return
+        self._local.started = None
+        duration = time.perf_counter() - started
+        pool_wait.observe(duration)
+        if duration * 1000 > MONGO_SLOW_POOL_WAIT_MS:
+            logger.warning(f"⚠️ Chờ connection Mongo {duration * 1000:.0f}ms ({event.address})")
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        pool_checkout_failed.inc()
+        logger.warning(f"❌ Không lấy được connection Mongo: {event.reason}")
+
+    def connection_created(self, event):
+        pool_connections.inc()
 
-# Xuất ra các collection
+    def connection_closed(self, event):
+        pool_connections.dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+mongo_client = AsyncIOMotorClient(
+    mongo_uri,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    appname="vhht-llm-backend",
+    event_listeners=[PoolMetricsListener(), MongoCommandListener()],
+)
+db = mongo_client[MONGO_DB_NAME]
+
+# Xuất ra các collection (tên khớp với model mongoose bên Node: PhaseDay → "phasedays")
 campaign_collection = db["campaigns"]
 phase_collection = db["phases"]
-phase_day_collection = db["phaseDays"]
+phase_day_collection = db["phasedays"]
 task_collection = db["tasks"]
 department_collection = db["departments"]
 user_collection = db["users"]
+donation_campaign_collection = db["donationCampaigns"]
+donor_profile_collection = db["donorProfiles"]
+knowledge_collection = db["vhht_knowledge"]
+knowledge_chunk_collection = db["vhht_knowledge_chunks"]
+
+
+def close():
+    mongo_client.close()
@@ -0,0 +1,59 @@
+# llm_backend/descriptor_cache.py
+# Cache faceDescriptor (float32 đã chuẩn hoá) theo user id cho /checkin.
+import os
+
+from bson import ObjectId
+
+from cache import LRUTTLCache
+from face_index import normalize
+
+DESCRIPTOR_CACHE_SIZE = int(os.getenv("DESCRIPTOR_CACHE_SIZE", "10000"))
+DESCRIPTOR_CACHE_TTL = float(os.getenv("DESCRIPTOR_CACHE_TTL", "600"))  # giây
+
+
+class DescriptorCache:
+    def __init__(self, maxsize: int = DESCRIPTOR_CACHE_SIZE, ttl: float = DESCRIPTOR_CACHE_TTL):
+        self._cache = LRUTTLCache("face_descriptor", maxsize=maxsize, ttl=ttl)
+
+    async def get(self, user_collection, user_id: str):
+        """Trả về vector đã chuẩn hoá, hoặc None nếu user chưa đăng ký khuôn mặt."""
+        vector = self._cache.get(user_id)
+        if vector is not None:
+            return vector
+
+        # Chỉ lấy faceDescriptor, không kéo faceImage base64 về
+        user = await user_collection.find_one({"_id": ObjectId(user_id)}, {"faceDescriptor": 1})
+        if not user or not user.get("faceDescriptor"):
+            return None
+        vector = normalize(user["faceDescriptor"])
+        self._cache.set(user_id, vector)
+        return vector
+
+    async def get_many(self, user_collection, user_ids):
+        """Như get() cho nhiều user: {user_id: vector}, phần chưa có trong cache lấy bằng một query $in."""
+        vectors, missing = {}, []
+        for user_id in set(user_ids):
+            vector = self._cache.get(user_id)
+            if vector is not None:
+                vectors[user_id] = vector
+            else:
+                missing.append(ObjectId(user_id))
+        if missing:
+            async for user in user_collection.find({"_id": {"$in": missing}}, {"faceDescriptor": 1}):
+                if user.get("faceDescriptor"):
+                    user_id = str(user["_id"])
+                    vectors[user_id] = normalize(user["faceDescriptor"])
+                    self._cache.set(user_id, vectors[user_id])
+        return vectors
+
+    def put(self, user_id: str, descriptor):
+        self._cache.set(user_id, normalize(descriptor))
+
+    def invalidate(self, user_id: str):
+        self._cache.pop(user_id)
+
+    def stats(self):
+        return self._cache.stats()
+
+
+descriptor_cache = DescriptorCache()
@@ -0,0 +1,240 @@
+# llm_backend/descriptor_prefetch.py
+# Nạp trước descriptor khuôn mặt theo lịch: check-in dồn vào ngày của phaseDay và danh sách TNV được
+# check-in đã biết trước (campaigns.volunteers đã duyệt). Định kỳ tìm các phaseDay sắp diễn ra trong
+# PREFETCH_HORIZON_HOURS giờ tới, lấy descriptor của TNV bằng một query $in (chỉ field faceDescriptor)
+# rồi giữ mỗi phaseDay một ma trận float32 đã chuẩn hoá trong RAM; /checkin, /checkin/bulk và /identify
+# của phaseDay đó không phải hỏi Mongo. Hết ngày (cộng PREFETCH_GRACE_HOURS) thì bỏ block.
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+import metrics
+from face_index import EMBEDDING_DIM, normalize
+from task_resolver import APP_TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+# === Cấu hình qua biến môi trường ===
+DESCRIPTOR_PREFETCH = os.getenv("DESCRIPTOR_PREFETCH", "1") == "1"
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "300"))  # giây giữa hai lần quét lịch
+PREFETCH_HORIZON_HOURS = float(os.getenv("PREFETCH_HORIZON_HOURS", "12"))
+PREFETCH_GRACE_HOURS = float(os.getenv("PREFETCH_GRACE_HOURS", "6"))  # giữ thêm sau khi hết ngày (check-in muộn)
+# Trần tổng số descriptor trong RAM (mỗi cái 2KB → 100000 ≈ 200MB); phaseDay gần nhất được ưu tiên
+PREFETCH_MAX_ROWS = int(os.getenv("PREFETCH_MAX_ROWS", "100000"))
+# Descriptor có thể được đăng ký lại ở process khác: nạp lại từ Mongo khi đã giữ quá khoảng này
+PREFETCH_RELOAD = float(os.getenv("PREFETCH_RELOAD", "3600"))
+
+prefetch_rows = metrics.gauge("descriptor_prefetch_rows", "Số descriptor đang giữ sẵn theo phaseDay")
+prefetch_blocks = metrics.gauge("descriptor_prefetch_blocks", "Số phaseDay đang được giữ sẵn descriptor")
+prefetch_hits = metrics.counter("descriptor_prefetch_hits_total", "Số lần lấy descriptor từ block phaseDay")
+prefetch_misses = metrics.counter("descriptor_prefetch_misses_total", "Số lần phaseDay/user không có trong block")
+prefetch_skipped = metrics.counter("descriptor_prefetch_skipped_total", "Số phaseDay không nạp vì vượt PREFETCH_MAX_ROWS")
+refresh_seconds = metrics.histogram("descriptor_prefetch_refresh_seconds", "Thời gian một lần quét lịch + nạp descriptor")
+
+
+def day_end(date: datetime) -> datetime:
+    """0h hôm sau (giờ APP_TIMEZONE) của ngày chứa date; date naive là UTC như pymongo trả về."""
+    local = date.replace(tzinfo=timezone.utc).astimezone(APP_TIMEZONE)
+    midnight = local.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return midnight.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class PhaseDayBlock:
+    """Descriptor đã chuẩn hoá của các TNV (đã đăng ký khuôn mặt) trong một phaseDay."""
+
+    def __init__(self, phaseday_id: str, campaign_id: str, date: datetime, member_ids, ids, matrix):
+        self.phaseday_id = phaseday_id
+        self.campaign_id = campaign_id
+        self.date = date
+        self.expires_at = day_end(date) + timedelta(hours=PREFETCH_GRACE_HOURS)
+        self.member_ids = frozenset(member_ids)  # TNV đã duyệt, kể cả người chưa có descriptor
+        self.ids = ids
+        self.rows = {uid: i for i, uid in enumerate(ids)}
+        self.matrix = matrix
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, probe, k: int = 5):
+        """Như FaceIndex.search nhưng chỉ trên TNV của phaseDay: [(user_id, cosine_distance)]."""
+        if not self.ids:
+            return []
+        scores = self.matrix @ normalize(probe)
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(1 - scores[i])) for i in top]
+
+
+class DescriptorPrefetcher:
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self._blocks = {}  # phaseday id → PhaseDayBlock (chỉ thay cả dict khi refresh)
+        self._loaded_at = {}  # user id → lúc descriptor được lấy từ Mongo / upsert (time.monotonic)
+        self.refreshed_at = None
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def block(self, phaseday_id: str):
+        block = self._blocks.get(phaseday_id)
+        if block is not None and block.expires_at <= datetime.utcnow():
+            return None
+        return block
+
+    def campaign_block(self, campaign_id: str):
+        """Block phaseDay đang diễn ra (hoặc sớm nhất sắp tới) của chiến dịch, cho /identify."""
+        now = datetime.utcnow()
+        blocks = [b for b in self._blocks.values() if b.campaign_id == campaign_id and b.expires_at > now]
+        current = [b for b in blocks if b.date <= now]
+        pool = current or blocks
+        return max(pool, key=lambda b: b.date) if current else min(pool, key=lambda b: b.date, default=None)
+
+    def get(self, phaseday_id: str, user_id: str):
+        """Vector đã chuẩn hoá nếu phaseDay đã nạp sẵn và có descriptor của user;
+        None thì gọi descriptor_cache như cũ (user ngoài danh sách, vừa đăng ký ở process khác...)."""
+        block = self.block(phaseday_id)
+        row = block.rows.get(user_id) if block is not None else None
+        if row is None:
+            prefetch_misses.inc()
+            return None
+        prefetch_hits.inc()
+        return block.matrix[row]
+
+    def upsert(self, user_id: str, descriptor):
+        """/register trong process này: cập nhật ngay các block có user đó."""
+        vector = normalize(descriptor)
+        self._loaded_at[user_id] = time.monotonic()
+        for block in self._blocks.values():
+            if user_id not in block.member_ids:
+                continue
+            row = block.rows.get(user_id)
+            if row is not None:
+                block.matrix[row] = vector
+            else:
+                block.matrix = np.vstack([block.matrix, vector[np.newaxis]])
+                block.rows[user_id] = len(block.ids)
+                block.ids.append(user_id)
+        self._update_gauges()
+
+    async def refresh(self, phase_day_collection, phase_collection, campaign_collection, user_collection,
+                      now: datetime = None):
+        t0 = time.perf_counter()
+        now = now or datetime.utcnow()
+        horizon = now + timedelta(hours=PREFETCH_HORIZON_HOURS)
+        earliest = now - timedelta(days=1, hours=PREFETCH_GRACE_HOURS)
+
+        # 1. phaseDay trong cửa sổ [đang diễn ra, sắp diễn ra trong horizon]
+        days = [
+            d async for d in phase_day_collection.find(
+                {"date": {"$gte": earliest, "$lt": horizon}, "status": {"$ne": "completed"}},
+                {"phaseId": 1, "date": 1},
+            )
+            if day_end(d["date"]) + timedelta(hours=PREFETCH_GRACE_HOURS) > now
+        ]
+        days.sort(key=lambda d: d["date"])  # gần nhất trước khi phải cắt theo PREFETCH_MAX_ROWS
+
+        # 2. phase → campaign → TNV đã duyệt
+        phase_ids = list({d["phaseId"] for d in days})
+        phase_campaign = {
+            p["_id"]: p["campaignId"]
+            async for p in phase_collection.find({"_id": {"$in": phase_ids}}, {"campaignId": 1})
+        } if phase_ids else {}
+        campaign_ids = list(set(phase_campaign.values()))
+        volunteers = {
+            c["_id"]: [str(v["user"]) for v in c.get("volunteers", []) if v.get("user") and v.get("status") == "approved"]
+            async for c in campaign_collection.find(
+                {"_id": {"$in": campaign_ids}}, {"volunteers.user": 1, "volunteers.status": 1},
+            )
+        } if campaign_ids else {}
+
+        # 3. Chỉ nạp descriptor chưa có trong block hiện tại hoặc đã giữ quá PREFETCH_RELOAD
+        #    (tính theo từng descriptor: block dựng lại mỗi lần refresh nhưng vector thì được chép sang)
+        loaded = time.monotonic()
+        known = {}
+        for block in self._blocks.values():
+            for uid, row in block.rows.items():
+                if loaded - self._loaded_at.get(uid, 0.0) < PREFETCH_RELOAD:
+                    known[uid] = block.matrix[row]
+        plan, rows_total = [], 0
+        for d in days:
+            campaign_id = phase_campaign.get(d["phaseId"])
+            members = volunteers.get(campaign_id, [])
+            if rows_total + len(members) > PREFETCH_MAX_ROWS:
+                prefetch_skipped.inc()
+                continue
+            rows_total += len(members)
+            plan.append((d, campaign_id, members))
+        missing = {uid for _, _, members in plan for uid in members if uid not in known}
+        if missing:
+            async for user in user_collection.find(
+                {"_id": {"$in": [ObjectId(uid) for uid in missing]}, "faceDescriptor": {"$type": "array"}},
+                {"faceDescriptor": 1},
+            ):
+                if len(user["faceDescriptor"]) == self.dim:
+                    uid = str(user["_id"])
+                    known[uid] = normalize(user["faceDescriptor"])
+                    self._loaded_at[uid] = loaded
+
+        # /register trong lúc đang đợi Mongo: upsert đã sửa block cũ, lấy lại vector mới đó
+        for block in self._blocks.values():
+            for uid, row in block.rows.items():
+                if self._loaded_at.get(uid, 0.0) > loaded:
+                    known[uid] = block.matrix[row]
+
+        # 4. Dựng block mới rồi thay cả dict (block hết hạn tự rơi ra)
+        blocks = {}
+        for d, campaign_id, members in plan:
+            ids = [uid for uid in members if uid in known]
+            matrix = np.stack([known[uid] for uid in ids]) if ids else np.zeros((0, self.dim), dtype=np.float32)
+            phaseday_id = str(d["_id"])
+            blocks[phaseday_id] = PhaseDayBlock(phaseday_id, str(campaign_id), d["date"], members, ids, matrix)
+        self._blocks = blocks
+        kept = {uid for b in blocks.values() for uid in b.ids}
+        self._loaded_at = {uid: t for uid, t in self._loaded_at.items() if uid in kept}
+        self.refreshed_at = now
+        self._update_gauges()
+        elapsed = time.perf_counter() - t0
+        refresh_seconds.observe(elapsed)
+        logger.info(
+            "🗓️ Nạp sẵn descriptor cho %d phaseDay (%d khuôn mặt, %d lấy từ Mongo) trong %.0fms",
+            len(blocks), sum(len(b) for b in blocks.values()), len(missing), elapsed * 1000,
+        )
+
+    def _update_gauges(self):
+        prefetch_blocks.set(len(self._blocks))
+        prefetch_rows.set(sum(len(b) for b in self._blocks.values()))
+
+    def stats(self):
+        return {
+            "enabled": DESCRIPTOR_PREFETCH,
+            "phase_days": len(self._blocks),
+            "descriptors": sum(len(b) for b in self._blocks.values()),
+            "max_rows": PREFETCH_MAX_ROWS,
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+        }
+
+
+async def keep_prefetched(phase_day_collection, phase_collection, campaign_collection, user_collection):
+    """Chạy nền trong service khuôn mặt: quét lịch mỗi PREFETCH_INTERVAL giây."""
+    while True:
+        try:
+            await descriptor_prefetcher.refresh(
+                phase_day_collection, phase_collection, campaign_collection, user_collection,
+            )
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Không nạp sẵn được descriptor theo lịch: {e}")
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi nạp sẵn descriptor theo lịch: {e}")
+        await asyncio.sleep(PREFETCH_INTERVAL)
+
+
+descriptor_prefetcher = DescriptorPrefetcher()
@@ -0,0 +1,99 @@
+# llm_backend/export_face_onnx.py
+# Tạo các file model cho FACE_BACKEND=onnx (chạy một lần, ở máy có TensorFlow + tf2onnx):
+# - ArcFace: export đúng model Keras DeepFace đang dùng (cùng trọng số) sang ONNX
+# - --int8: thêm bản lượng tử hoá INT8 (static, QDQ) hiệu chỉnh trên ảnh thật trong --calibration-dir
+# - tải detector YuNet từ opencv_zoo nếu chưa có
+# Sau khi tạo xong: python benchmarks/check_face_parity.py --images <thư mục ảnh> để kiểm tra độ lệch.
+#
+#   pip install tf2onnx onnxruntime
+#   python export_face_onnx.py --int8 --calibration-dir ./calib_faces
+import argparse
+import logging
+import os
+import urllib.request
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+YUNET_URL = (
+    "https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/"
+    "face_detection_yunet_2023mar.onnx"
+)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def export_arcface(output: str):
+    import tensorflow as tf
+    import tf2onnx
+    from inference import MODEL_NAME, _deepface
+
+    model = _deepface().build_model(MODEL_NAME).model
+    signature = (tf.TensorSpec((None, 112, 112, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=output)
+    logger.info(f"✅ Đã export ArcFace → {output}")
+
+
+def calibration_batches(directory: str, limit: int):
+    """Ảnh mặt thật qua đúng bước detect/căn chỉnh của face_onnx."""
+    import face_onnx
+    from image_io import decode_image
+
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            try:
+                yield face_onnx.detect_face(decode_image(f.read()))
+            except ValueError:
+                logger.warning(f"⚠️ Bỏ qua {name}: không thấy khuôn mặt")
+
+
+def quantize_int8(source: str, output: str, calibration_dir: str, limit: int):
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._batches = calibration_batches(calibration_dir, limit)
+
+        def get_next(self):
+            batch = next(self._batches, None)
+            return None if batch is None else {"input": batch.astype(np.float32)}
+
+    quantize_static(
+        source, output, Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    logger.info(f"✅ Đã lượng tử hoá INT8 → {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output-dir", default="models")
+    parser.add_argument("--int8", action="store_true", help="Tạo thêm arcface.int8.onnx")
+    parser.add_argument("--calibration-dir", help="Thư mục ảnh khuôn mặt để hiệu chỉnh INT8")
+    parser.add_argument("--calibration-limit", type=int, default=200)
+    args = parser.parse_args()
+    if args.int8 and not args.calibration_dir:
+        parser.error("--int8 cần --calibration-dir")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    detector_path = os.path.join(args.output_dir, os.path.basename(YUNET_URL))
+    if not os.path.exists(detector_path):
+        urllib.request.urlretrieve(YUNET_URL, detector_path)
+        logger.info(f"✅ Đã tải detector YuNet → {detector_path}")
+    # face_onnx đọc đường dẫn từ biến môi trường lúc import
+    os.environ.setdefault("FACE_ONNX_DETECTOR", detector_path)
+
+    arcface_path = os.path.join(args.output_dir, "arcface.onnx")
+    export_arcface(arcface_path)
+    if args.int8:
+        quantize_int8(arcface_path, os.path.join(args.output_dir, "arcface.int8.onnx"),
+                      args.calibration_dir, args.calibration_limit)
+
+
+if __name__ == "__main__":
+    main()
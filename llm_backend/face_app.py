@@ -0,0 +1,367 @@
+# llm_backend/face_app.py
+# Các endpoint nhận diện khuôn mặt (đăng ký, check-in, 1:N) + vòng đời inference executor.
+# TensorFlow/DeepFace chỉ được import khi warm-up hoặc khi có ảnh đầu tiên (xem inference.py).
+import asyncio
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from inference import executor, InferenceQueueFull
+from batching import batcher, embed_face
+from face_index import FACE_INDEX_RETRY_DELAY, FACE_INDEX_RETRY_MAX, face_index, campaign_volunteer_ids
+from descriptor_cache import descriptor_cache
+from descriptor_prefetch import DESCRIPTOR_PREFETCH, descriptor_prefetcher, keep_prefetched
+from face_storage import FaceImageStore
+from image_io import open_image, decode_image, decode_base64_image
+from checkin import (
+    FACE_MATCH_THRESHOLD, BULK_CHECKIN_MAX_BYTES, BulkCheckinError, verify_and_checkin, parse_bulk_items,
+    parse_bulk_zip, bulk_checkin,
+)
+from database import db, campaign_collection, phase_collection, phase_day_collection, user_collection
+from utils import sse_event
+from auth import STAFF_ROLES, verify_access_token
+from tracing import stage
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# === Lưu ảnh khuôn mặt (MongoDB dùng pool chung trong database.py) ===
+face_store = FaceImageStore(db)
+
+_tasks = []
+
+# === Vòng đời: khởi động / warm-up / tắt inference executor ===
+async def warm_up_models():
+    try:
+        await executor.warm_up()
+    except Exception as e:
+        logger.error(f"❌ Warm-up model thất bại: {e}")
+
+async def load_face_index():
+    # Lỗi thì thử lại với backoff, không để instance kẹt 503 ở /ready tới khi restart
+    delay = FACE_INDEX_RETRY_DELAY
+    while True:
+        try:
+            await face_index.load(user_collection)
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Nạp index khuôn mặt thất bại: {e}, thử lại sau {delay:g}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, FACE_INDEX_RETRY_MAX)
+
+def start():
+    executor.start()
+    if batcher is not None:
+        batcher.start()
+    # Warm-up chạy nền để app vẫn mở port; /ready báo 503 tới khi xong
+    _tasks.append(asyncio.create_task(warm_up_models()))
+    _tasks.append(asyncio.create_task(load_face_index()))
+    if DESCRIPTOR_PREFETCH:
+        _tasks.append(asyncio.create_task(keep_prefetched(
+            phase_day_collection, phase_collection, campaign_collection, user_collection,
+        )))
+
+async def stop():
+    while _tasks:
+        _tasks.pop().cancel()
+    if batcher is not None:
+        await batcher.stop()
+    executor.shutdown()
+
+def not_ready_reason():
+    if not executor.ready:
+        return "⏳ Đang warm-up model, chưa sẵn sàng"
+    if not face_index.loaded:
+        return "⏳ Đang nạp index khuôn mặt, chưa sẵn sàng"
+    return None
+
+def stats():
+    return {
+        "inference": {
+            "mode": executor.mode,
+            "workers": executor.workers,
+            "max_queue": executor.max_queue,
+            "pending": executor.pending,
+            "ready": executor.ready,
+        },
+        "face_index": {"size": len(face_index), "loaded": face_index.loaded},
+        "descriptor_cache": descriptor_cache.stats(),
+        "descriptor_prefetch": descriptor_prefetcher.stats(),
+        "batching": batcher.stats() if batcher is not None else {"enabled": False},
+    }
+
+# === Pydantic Models ===
+class IdentifyData(BaseModel):
+    image: str  # base64 encoded image
+    campaignId: Optional[str] = None  # Giới hạn trong TNV của chiến dịch
+    phasedayId: Optional[str] = None  # Dùng block descriptor nạp sẵn của phaseDay (nếu có)
+    top_k: int = 5
+
+class ImageData(BaseModel):
+    user_id: str
+    image: str  # base64 encoded image
+    campaignId: str
+    phaseId: str
+    phasedayId: str
+    method: str
+
+# === Helper: lỗi 503 khi hàng đợi inference đầy ===
+def busy_error(detail: str = "⏳ Hệ thống nhận diện đang quá tải, thử lại sau giây lát nha!"):
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": "1"},
+    )
+
+# === Endpoint: Đăng ký khuôn mặt ===
+@router.post("/register")
+async def register_face(user_id: str = Form(...), file: UploadFile = File(...)):
+    try:
+        # Đọc ảnh từ file upload
+        image_bytes = await file.read()
+        with stage("decode"):
+            image = open_image(image_bytes)
+            img_array = np.asarray(image)
+
+        # Tính embedding với DeepFace (chạy trên inference executor)
+        with stage("embed"):
+            face_descriptor = await embed_face(img_array)
+
+        # 👉 Lưu ảnh (inline base64 / GridFS / local tuỳ FACE_IMAGE_STORAGE)
+        image_set, image_unset = await face_store.user_update(image)
+
+        # Cập nhật vào MongoDB
+        update = {"$set": {"faceDescriptor": face_descriptor, **image_set}}
+        if image_unset:
+            update["$unset"] = image_unset
+        result = await user_collection.update_one({"_id": ObjectId(user_id)}, update)
+
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="❌ Không tìm thấy người dùng!")
+
+        face_index.upsert(user_id, face_descriptor)
+        descriptor_cache.invalidate(user_id)
+        descriptor_prefetcher.upsert(user_id, face_descriptor)
+
+        return {"status": "✅ Đăng ký khuôn mặt thành công!"}
+
+    except InferenceQueueFull:
+        raise busy_error()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Lỗi tại /register: {e}")
+        raise HTTPException(status_code=500, detail=f"Lỗi xử lý: {str(e)}")
+
+# === Endpoint: Lấy ảnh khuôn mặt đã đăng ký ===
+# Ảnh khuôn mặt là dữ liệu sinh trắc: chỉ chính chủ hoặc admin/manager/organization (access token của Node)
+@router.get("/users/{user_id}/face-image")
+async def get_face_image(user_id: str, request: Request):
+    claims = verify_access_token(request.headers.get("Authorization"))
+    if claims is None:
+        raise HTTPException(status_code=401, detail="❌ Cần đăng nhập để xem ảnh khuôn mặt.")
+    if claims.get("user_id") != user_id and claims.get("role") not in STAFF_ROLES:
+        raise HTTPException(status_code=403, detail="❌ Không có quyền xem ảnh khuôn mặt này.")
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=422, detail="user_id không hợp lệ")
+    user = await user_collection.find_one(
+        {"_id": ObjectId(user_id)},
+        {"faceImageRef": 1, "faceImage": 1},
+    )
+    image_bytes = await face_store.load_user_image(user) if user else None
+    if not image_bytes:
+        raise HTTPException(status_code=404, detail="❌ Không tìm thấy ảnh khuôn mặt.")
+    return Response(content=image_bytes, media_type="image/jpeg")
+
+async def checkin_or_404(camera_img, user_id: str, campaign_id: str, phase_id: str, phaseday_id: str):
+    result = await verify_and_checkin(camera_img, user_id, campaign_id, phase_id, phaseday_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="❌ Không tìm thấy khuôn mặt đã đăng ký.")
+    return result
+
+# === Endpoint: Check-in khuôn mặt ===
+@router.post("/checkin")
+async def checkin_face(data: ImageData):
+    try:
+        with stage("decode"):
+            camera_img = decode_base64_image(data.image)
+        return await checkin_or_404(camera_img, data.user_id, data.campaignId, data.phaseId, data.phasedayId)
+
+    except InferenceQueueFull:
+        raise busy_error()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Lỗi tại /checkin: {e}")
+        raise HTTPException(status_code=500, detail=f"Lỗi nhận diện: {str(e)}")
+
+# === Endpoint: Check-in với ảnh nhị phân (multipart hoặc application/octet-stream) ===
+# Bỏ qua base64: bytes upload được giải mã thẳng vào numpy, thu nhỏ ngay khi decode.
+# - multipart: field "file" + các field user_id, campaignId, phaseId, phasedayId
+# - octet-stream: body là ảnh, metadata nằm trên query string
+@router.post("/checkin/raw")
+async def checkin_face_raw(request: Request):
+    try:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None:
+                raise HTTPException(status_code=422, detail="Thiếu field 'file'")
+            image_bytes = await upload.read()
+            fields = form
+        else:
+            image_bytes = await request.body()
+            fields = request.query_params
+
+        missing = [k for k in ("user_id", "campaignId", "phaseId", "phasedayId") if not fields.get(k)]
+        if missing:
+            raise HTTPException(status_code=422, detail=f"Thiếu tham số: {', '.join(missing)}")
+
+        with stage("decode"):
+            camera_img = decode_image(image_bytes)
+        del image_bytes  # nhả buffer upload trước khi chạy inference
+        return await checkin_or_404(
+            camera_img, fields["user_id"], fields["campaignId"], fields["phaseId"], fields["phasedayId"]
+        )
+
+    except InferenceQueueFull:
+        raise busy_error()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Lỗi tại /checkin/raw: {e}")
+        raise HTTPException(status_code=500, detail=f"Lỗi nhận diện: {str(e)}")
+
+# === Endpoint: Đồng bộ check-in offline theo lô ===
+# - application/json: {"items": [{user_id, image (base64), campaignId, phaseId, phasedayId}, ...]}
+# - multipart (field "file") hoặc application/zip: file zip gồm ảnh + manifest.json
+#   ([{user_id, file, campaignId, phaseId, phasedayId}, ...], "file" là đường dẫn ảnh trong zip)
+# Trả về Server-Sent Events: `event: item` cho từng ảnh (kèm index trong lô) ngay khi xử lý xong,
+# cuối cùng `event: done` kèm tổng kết.
+async def read_bulk_body(request: Request, limit: int = BULK_CHECKIN_MAX_BYTES) -> bytes:
+    """Đọc body nhưng dừng ngay khi vượt limit (kể cả khi client không gửi Content-Length)."""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise BulkCheckinError(f"Lô check-in vượt {limit} byte")
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise BulkCheckinError(f"Lô check-in vượt {limit} byte")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@router.post("/checkin/bulk")
+async def checkin_bulk(request: Request):
+    try:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            data = await read_bulk_body(request)
+            try:
+                body = json.loads(data)
+            except ValueError as e:
+                raise BulkCheckinError(f"JSON không hợp lệ: {e}")
+            records = parse_bulk_items(body.get("items") if isinstance(body, dict) else body)
+        else:
+            if content_type.startswith("multipart/form-data"):
+                declared = request.headers.get("content-length", "")
+                if declared.isdigit() and int(declared) > BULK_CHECKIN_MAX_BYTES:
+                    raise BulkCheckinError(f"Lô check-in vượt {BULK_CHECKIN_MAX_BYTES} byte")
+                form = await request.form()
+                upload = form.get("file")
+                if upload is None:
+                    raise HTTPException(status_code=422, detail="Thiếu field 'file'")
+                # File upload đã được starlette ghi ra đĩa tạm; chỉ đọc vào RAM khi không quá trần
+                data = await upload.read(BULK_CHECKIN_MAX_BYTES + 1)
+                if len(data) > BULK_CHECKIN_MAX_BYTES:
+                    raise BulkCheckinError(f"Lô check-in vượt {BULK_CHECKIN_MAX_BYTES} byte")
+            else:
+                data = await read_bulk_body(request)
+            records = await asyncio.to_thread(parse_bulk_zip, data)
+            del data
+    except BulkCheckinError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Lỗi tại /checkin/bulk: {e}")
+        raise HTTPException(status_code=500, detail=f"Lỗi đọc lô check-in: {str(e)}")
+
+    async def events():
+        summary = {"total": len(records), "saved": 0, "failed": 0}
+        try:
+            async for result in bulk_checkin(records):
+                summary["saved" if result.get("saved") else "failed"] += 1
+                yield sse_event(result, event="item")
+        except Exception as e:
+            logger.error(f"Lỗi khi stream /checkin/bulk: {e}")
+            yield sse_event({"detail": f"Lỗi nhận diện: {str(e)}"}, event="error")
+            return
+        yield sse_event(summary, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# === Endpoint: Nhận diện 1:N (kiosk) ===
+@router.post("/identify")
+async def identify_face(data: IdentifyData):
+    # Kiểm tra id trước khi tốn công decode + ArcFace
+    invalid = [k for k in ("campaignId", "phasedayId") if getattr(data, k) and not ObjectId.is_valid(getattr(data, k))]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Id không hợp lệ: {', '.join(invalid)}")
+    try:
+        with stage("decode"):
+            camera_img = decode_base64_image(data.image)
+        with stage("embed"):
+            probe = await embed_face(camera_img)
+
+        top_k = max(1, min(data.top_k, 50))
+        # Ngày diễn ra: TNV của phaseDay đã nằm sẵn trong RAM, không cần đọc campaign
+        if data.phasedayId:
+            block = descriptor_prefetcher.block(data.phasedayId)
+        elif data.campaignId:
+            block = descriptor_prefetcher.campaign_block(data.campaignId)
+        else:
+            block = None
+
+        if block is not None:
+            with stage("search"):
+                matches = block.search(probe, k=top_k)
+        else:
+            candidate_ids = None
+            if data.campaignId:
+                candidate_ids = await campaign_volunteer_ids(campaign_collection, ObjectId(data.campaignId))
+                if candidate_ids is None:
+                    raise HTTPException(status_code=404, detail="❌ Không tìm thấy chiến dịch.")
+            with stage("search"):
+                matches = face_index.search(probe, k=top_k, candidate_ids=candidate_ids)
+        best = matches[0] if matches and matches[0][1] < FACE_MATCH_THRESHOLD else None
+
+        return {
+            "matched": best is not None,
+            "user_id": best[0] if best else None,
+            "distance": best[1] if best else None,
+            "candidates": [{"user_id": uid, "distance": d} for uid, d in matches],
+        }
+
+    except InferenceQueueFull:
+        raise busy_error()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Lỗi tại /identify: {e}")
+        raise HTTPException(status_code=500, detail=f"Lỗi nhận diện: {str(e)}")
@@ -0,0 +1,175 @@
+# llm_backend/face_index.py
+# Index embedding khuôn mặt trong RAM để nhận diện 1:N ("đây là ai?").
+import logging
+import os
+import threading
+
+import numpy as np
+
+try:  # ANN là tuỳ chọn, chỉ dùng khi đã cài faiss
+    import faiss
+except ImportError:
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+FACE_INDEX_ANN = os.getenv("FACE_INDEX_ANN", "0") == "1"
+FACE_INDEX_ANN_MIN_SIZE = int(os.getenv("FACE_INDEX_ANN_MIN_SIZE", "50000"))
+# Nạp index lúc khởi động lỗi (Mongo chập chờn...) thì thử lại, chờ gấp đôi mỗi lần tới tối đa RETRY_MAX giây
+FACE_INDEX_RETRY_DELAY = float(os.getenv("FACE_INDEX_RETRY_DELAY", "2"))
+FACE_INDEX_RETRY_MAX = float(os.getenv("FACE_INDEX_RETRY_MAX", "60"))
+
+
+def normalize(vector):
+    v = np.asarray(vector, dtype=np.float32).reshape(-1)
+    n = np.linalg.norm(v)
+    return v / n if n > 0 else v
+
+
+class FaceIndex:
+    """Ma trận float32 đã chuẩn hoá L2: cosine distance = 1 - (M @ probe)."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._ids = []
+        self._rows = {}
+        self._count = 0
+        self._lock = threading.RLock()
+        self._ann = None
+        self._ann_dirty = True
+        self._loading = False
+        self._backlog = {}
+        self.loaded = False
+
+    def __len__(self):
+        return self._count
+
+    async def load(self, user_collection):
+        """Nạp toàn bộ descriptor đã đăng ký (chỉ lấy field cần thiết)."""
+        with self._lock:
+            self._loading = True
+            self._backlog = {}
+        cursor = user_collection.find(
+            {"faceDescriptor": {"$type": "array"}},
+            {"faceDescriptor": 1},
+        )
+        ids, vectors = [], []
+        async for doc in cursor:
+            descriptor = doc.get("faceDescriptor")
+            if not descriptor or len(descriptor) != self.dim:
+                continue
+            ids.append(str(doc["_id"]))
+            vectors.append(descriptor)
+
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        matrix /= norms
+
+        with self._lock:
+            self._matrix = matrix
+            self._ids = ids
+            self._rows = {uid: i for i, uid in enumerate(ids)}
+            self._count = len(ids)
+            self._ann_dirty = True
+            self._loading = False
+            self.loaded = True
+            # Áp lại các lần /register xảy ra trong lúc đang nạp
+            backlog, self._backlog = self._backlog, {}
+            for uid, vector in backlog.items():
+                self.upsert(uid, vector)
+        logger.info(f"✅ Đã nạp {len(ids)} khuôn mặt vào index")
+
+    def upsert(self, user_id: str, descriptor):
+        vector = normalize(descriptor)
+        with self._lock:
+            if self._loading:
+                self._backlog[user_id] = vector
+            row = self._rows.get(user_id)
+            if row is not None:
+                self._matrix[row] = vector
+                self._ann_dirty = True  # HNSW không cập nhật tại chỗ được
+                return
+            if self._count == len(self._matrix):
+                # Tăng dung lượng gấp đôi để append có chi phí khấu hao O(1)
+                grown = np.zeros((max(16, 2 * len(self._matrix)), self.dim), dtype=np.float32)
+                grown[:self._count] = self._matrix[:self._count]
+                self._matrix = grown
+            self._matrix[self._count] = vector
+            self._ids.append(user_id)
+            self._rows[user_id] = self._count
+            self._count += 1
+            if self._ann is not None and not self._ann_dirty:
+                self._ann.add(vector.reshape(1, -1))
+
+    def get(self, user_id: str):
+        with self._lock:
+            row = self._rows.get(user_id)
+            return None if row is None else self._matrix[row].copy()
+
+    def _use_ann(self):
+        return FACE_INDEX_ANN and faiss is not None and self._count >= FACE_INDEX_ANN_MIN_SIZE
+
+    def _ann_index(self):
+        if self._ann is None or self._ann_dirty:
+            index = faiss.IndexHNSWFlat(self.dim, 32, faiss.METRIC_INNER_PRODUCT)
+            index.add(self._matrix[:self._count])
+            self._ann = index
+            self._ann_dirty = False
+        return self._ann
+
+    def search(self, probe, k: int = 5, candidate_ids=None):
+        """Trả về top-k [(user_id, cosine_distance)] tăng dần theo khoảng cách.
+
+        candidate_ids: giới hạn tìm trong một tập user (vd. TNV của một chiến dịch).
+        """
+        q = normalize(probe)
+        with self._lock:
+            if candidate_ids is not None:
+                rows = np.fromiter(
+                    (self._rows[uid] for uid in candidate_ids if uid in self._rows),
+                    dtype=np.int64,
+                )
+                if rows.size == 0:
+                    return []
+                scores = self._matrix[rows] @ q
+                row_ids = rows
+            elif self._count == 0:
+                return []
+            elif self._use_ann():
+                sims, idx = self._ann_index().search(q.reshape(1, -1), k)
+                return [
+                    (self._ids[i], float(1 - s))
+                    for s, i in zip(sims[0], idx[0]) if i >= 0
+                ]
+            else:
+                scores = self._matrix[:self._count] @ q
+                row_ids = None
+
+            k = min(k, scores.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (self._ids[row_ids[i] if row_ids is not None else i], float(1 - scores[i]))
+                for i in top
+            ]
+
+
+async def campaign_volunteer_ids(campaign_collection, campaign_id, status: str = "approved"):
+    """Lấy user id các TNV của chiến dịch (mặc định chỉ người đã được duyệt)."""
+    campaign = await campaign_collection.find_one(
+        {"_id": campaign_id},
+        {"volunteers.user": 1, "volunteers.status": 1},
+    )
+    if not campaign:
+        return None
+    return [
+        str(v["user"]) for v in campaign.get("volunteers", [])
+        if v.get("user") and (status is None or v.get("status") == status)
+    ]
+
+
+# Index dùng chung cho cả app
+face_index = FaceIndex()
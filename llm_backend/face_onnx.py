@@ -0,0 +1,166 @@
+# llm_backend/face_onnx.py
+# Backend nhận diện khuôn mặt không cần TensorFlow (FACE_BACKEND=onnx):
+# - detector YuNet (ONNX, chạy qua OpenCV DNN) thay cho detector của DeepFace
+# - ArcFace export từ đúng model Keras của DeepFace sang ONNX, chạy bằng ONNX Runtime (tuỳ chọn bản INT8)
+# Căn chỉnh (xoay theo hai mắt), resize có padding và chuẩn hoá làm giống hệt DeepFace để descriptor
+# đã lưu + ngưỡng 0.35 vẫn dùng được; kiểm tra bằng benchmarks/check_face_parity.py trước khi bật.
+# Tạo file model: python export_face_onnx.py --int8
+import os
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# === Cấu hình qua biến môi trường ===
+FACE_ONNX_MODEL = os.getenv("FACE_ONNX_MODEL", "models/arcface.onnx")  # hoặc models/arcface.int8.onnx
+FACE_ONNX_DETECTOR = os.getenv("FACE_ONNX_DETECTOR", "models/face_detection_yunet_2023mar.onnx")
+FACE_ONNX_THREADS = int(os.getenv("FACE_ONNX_THREADS", "0"))  # intra-op thread mỗi worker, 0 = số core
+FACE_DETECT_SCORE = float(os.getenv("FACE_DETECT_SCORE", "0.8"))
+FACE_DETECT_MAX_SIDE = 640  # ảnh lớn hơn được thu nhỏ trước khi detect (toạ độ nhân ngược lại)
+
+INPUT_SIZE = (112, 112)  # input ArcFace của DeepFace
+
+_lock = threading.Lock()
+_session = None
+_input_name = None
+_detectors = {}  # thread id → detector (cv2.FaceDetectorYN không an toàn khi dùng chung giữa thread)
+
+
+def _load_session():
+    global _session, _input_name
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import onnxruntime as ort
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+                options.intra_op_num_threads = FACE_ONNX_THREADS
+                options.inter_op_num_threads = 1
+                session = ort.InferenceSession(FACE_ONNX_MODEL, options, providers=["CPUExecutionProvider"])
+                _input_name = session.get_inputs()[0].name
+                _session = session
+    return _session
+
+
+def _detector():
+    detector = _detectors.get(threading.get_ident())
+    if detector is None:
+        detector = cv2.FaceDetectorYN.create(FACE_ONNX_DETECTOR, "", (320, 320), FACE_DETECT_SCORE)
+        _detectors[threading.get_ident()] = detector
+    return detector
+
+
+def warm_up():
+    _load_session()
+    _detector().setInputSize((320, 320))
+    _detector().detect(np.zeros((320, 320, 3), dtype=np.uint8))
+    _session.run(None, {_input_name: np.zeros((1, *INPUT_SIZE, 3), dtype=np.float32)})
+    return os.getpid()
+
+
+# === Detection + căn chỉnh (theo deepface.modules.detection) ===
+def _detect(img):
+    """Trả về khuôn mặt có điểm cao nhất: (x, y, w, h, left_eye, right_eye) theo toạ độ ảnh gốc."""
+    height, width = img.shape[:2]
+    scale = min(1.0, FACE_DETECT_MAX_SIDE / max(height, width))
+    resized = cv2.resize(img, (int(width * scale), int(height * scale))) if scale < 1.0 else img
+    detector = _detector()
+    detector.setInputSize((resized.shape[1], resized.shape[0]))
+    _, faces = detector.detect(resized)
+    if faces is None or len(faces) == 0:
+        raise ValueError(
+            "Face could not be detected. Please confirm that the picture is a face photo "
+            "or consider to set enforce_detection param to False."
+        )
+    face = faces[np.argmax(faces[:, -1])] / scale
+    x, y, w, h = (int(v) for v in face[:4])
+    x, y = max(x, 0), max(y, 0)
+    eye_a, eye_b = (int(face[4]), int(face[5])), (int(face[6]), int(face[7]))
+    # Mắt trái của người nằm bên phải ảnh, như quy ước left_eye/right_eye của DeepFace
+    left_eye, right_eye = (eye_a, eye_b) if eye_a[0] > eye_b[0] else (eye_b, eye_a)
+    return x, y, w, h, left_eye, right_eye
+
+
+def _project_facial_area(area, angle: float, size):
+    """Vị trí khung mặt sau khi xoay ảnh quanh tâm (deepface detection.project_facial_area)."""
+    direction = 1 if angle >= 0 else -1
+    angle = abs(angle) % 360
+    if angle == 0:
+        return area
+    angle = angle * np.pi / 180
+    height, width = size
+    x = (area[0] + area[2]) / 2 - width / 2
+    y = (area[1] + area[3]) / 2 - height / 2
+    x_new = x * np.cos(angle) + y * direction * np.sin(angle) + width / 2
+    y_new = -x * direction * np.sin(angle) + y * np.cos(angle) + height / 2
+    x1 = max(int(x_new - (area[2] - area[0]) / 2), 0)
+    y1 = max(int(y_new - (area[3] - area[1]) / 2), 0)
+    x2 = min(int(x_new + (area[2] - area[0]) / 2), width)
+    y2 = min(int(y_new + (area[3] - area[1]) / 2), height)
+    return x1, y1, x2, y2
+
+
+def _resize_pad(img):
+    """Giữ tỉ lệ, thu về INPUT_SIZE rồi pad đen (deepface preprocessing.resize_image)."""
+    factor = min(INPUT_SIZE[0] / img.shape[0], INPUT_SIZE[1] / img.shape[1])
+    img = cv2.resize(img, (int(img.shape[1] * factor), int(img.shape[0] * factor)))
+    diff_0 = INPUT_SIZE[0] - img.shape[0]
+    diff_1 = INPUT_SIZE[1] - img.shape[1]
+    img = np.pad(
+        img, ((diff_0 // 2, diff_0 - diff_0 // 2), (diff_1 // 2, diff_1 - diff_1 // 2), (0, 0)), "constant",
+    )
+    if img.shape[:2] != INPUT_SIZE:
+        img = cv2.resize(img, INPUT_SIZE)
+    return img
+
+
+def detect_face(img_array):
+    """Ảnh từ image_io → tensor (1, 112, 112, 3) [0, 1] cho ArcFace.
+    DeepFace coi mảng numpy là BGR nên ảnh RGB của image_io vẫn được đưa vào nguyên thứ tự kênh;
+    giữ y như vậy để khớp descriptor đã đăng ký."""
+    img = np.ascontiguousarray(img_array)
+    x, y, w, h, left_eye, right_eye = _detect(img)
+
+    # DeepFace thêm viền 50% để xoay không mất góc mặt, rồi cắt theo khung đã xoay
+    border_h, border_w = int(0.5 * img.shape[0]), int(0.5 * img.shape[1])
+    img = cv2.copyMakeBorder(img, border_h, border_h, border_w, border_w, cv2.BORDER_CONSTANT, value=[0, 0, 0])
+    x, y = x + border_w, y + border_h
+    left_eye = (left_eye[0] + border_w, left_eye[1] + border_h)
+    right_eye = (right_eye[0] + border_w, right_eye[1] + border_h)
+
+    angle = float(np.degrees(np.arctan2(left_eye[1] - right_eye[1], left_eye[0] - right_eye[0])))
+    rotated = np.array(Image.fromarray(img).rotate(angle, resample=Image.BICUBIC))
+    x1, y1, x2, y2 = _project_facial_area((x, y, x + w, y + h), angle, rotated.shape[:2])
+    face = rotated[y1:y2, x1:x2]
+    if face.size == 0:
+        raise ValueError("Face could not be detected.")
+    return (_resize_pad(face).astype(np.float32) / 255.0)[np.newaxis]
+
+
+# === ArcFace ===
+def _embed(batch):
+    session = _load_session()
+    return session.run(None, {_input_name: batch})[0]
+
+
+def represent_face(img_array):
+    return _embed(detect_face(img_array))[0].tolist()
+
+
+def represent_faces(img_arrays):
+    """Như inference.represent_faces: (embedding, None) hoặc (None, lỗi) theo thứ tự input."""
+    results = [None] * len(img_arrays)
+    faces, positions = [], []
+    for i, img in enumerate(img_arrays):
+        try:
+            faces.append(detect_face(img))
+            positions.append(i)
+        except Exception as e:
+            results[i] = (None, str(e))
+    if faces:
+        embeddings = _embed(np.concatenate(faces, axis=0))
+        for i, emb in zip(positions, embeddings):
+            results[i] = (emb.tolist(), None)
+    return results
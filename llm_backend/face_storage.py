@@ -0,0 +1,114 @@
+# llm_backend/face_storage.py
+# Lưu ảnh khuôn mặt ngoài document user: GridFS hoặc thư mục local, định danh bằng hash nội dung.
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import os
+
+import gridfs
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# === Cấu hình qua biến môi trường ===
+FACE_IMAGE_STORAGE = os.getenv("FACE_IMAGE_STORAGE", "inline")  # "inline" | "gridfs" | "local"
+FACE_IMAGE_DIR = os.getenv("FACE_IMAGE_DIR", "face_images")
+FACE_IMAGE_BUCKET = os.getenv("FACE_IMAGE_BUCKET", "faceImages")
+FACE_IMAGE_MAX_SIDE = int(os.getenv("FACE_IMAGE_MAX_SIDE", "640"))
+FACE_IMAGE_QUALITY = int(os.getenv("FACE_IMAGE_QUALITY", "85"))
+
+
+def encode_jpeg(image: Image.Image, max_side: int = FACE_IMAGE_MAX_SIDE, quality: int = FACE_IMAGE_QUALITY) -> bytes:
+    """Thu nhỏ (giữ tỉ lệ) rồi nén JPEG."""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if max_side and max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side))
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=quality, optimize=True)
+    return buffered.getvalue()
+
+
+def decode_data_url(data_url: str) -> bytes:
+    if "," in data_url:
+        data_url = data_url.split(",", 1)[1]
+    return base64.b64decode(data_url)
+
+
+class FaceImageStore:
+    def __init__(self, db, mode: str = FACE_IMAGE_STORAGE):
+        if mode not in ("inline", "gridfs", "local"):
+            raise ValueError(f"FACE_IMAGE_STORAGE không hợp lệ: {mode}")
+        self.mode = mode
+        self._db = db
+        self._bucket = None
+        self._files = db[f"{FACE_IMAGE_BUCKET}.files"]
+
+    def _gridfs(self):
+        # Tạo lazily: ref "gridfs:..." vẫn đọc được dù mode hiện tại là local/inline
+        if self._bucket is None:
+            self._bucket = AsyncIOMotorGridFSBucket(self._db, bucket_name=FACE_IMAGE_BUCKET)
+        return self._bucket
+
+    def _local_path(self, digest: str) -> str:
+        return os.path.join(FACE_IMAGE_DIR, digest[:2], f"{digest}.jpg")
+
+    def _write_local(self, path: str, jpeg_bytes: bytes):
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(jpeg_bytes)
+        os.replace(tmp_path, path)  # ghi nguyên tử
+
+    def _read_local(self, path: str):
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def put_bytes(self, jpeg_bytes: bytes) -> str:
+        """Lưu nội dung JPEG, trả về ref dạng "<mode>:<sha256>". Nội dung trùng chỉ lưu một lần."""
+        digest = hashlib.sha256(jpeg_bytes).hexdigest()
+        if self.mode == "gridfs":
+            if not await self._files.find_one({"filename": digest}, {"_id": 1}):
+                await self._gridfs().upload_from_stream(
+                    digest, jpeg_bytes, metadata={"contentType": "image/jpeg"}
+                )
+        else:
+            await asyncio.to_thread(self._write_local, self._local_path(digest), jpeg_bytes)
+        return f"{self.mode}:{digest}"
+
+    async def get_bytes(self, ref: str):
+        mode, _, digest = ref.partition(":")
+        if mode == "gridfs":
+            try:
+                grid_out = await self._gridfs().open_download_stream_by_name(digest)
+                return await grid_out.read()
+            except gridfs.errors.NoFile:
+                return None
+        if mode == "local":
+            return await asyncio.to_thread(self._read_local, self._local_path(digest))
+        return None
+
+    async def user_update(self, image: Image.Image):
+        """Trả về (set_fields, unset_fields) cho update_one trên document user."""
+        jpeg_bytes = await asyncio.to_thread(encode_jpeg, image)
+        if self.mode == "inline":
+            # Chế độ cũ: base64 data URL ngay trong document user
+            data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg_bytes).decode()
+            return {"faceImage": data_url}, {}
+        return {"faceImageRef": await self.put_bytes(jpeg_bytes)}, {"faceImage": ""}
+
+    async def load_user_image(self, user: dict):
+        """Lấy bytes JPEG của user, hỗ trợ cả ref mới lẫn faceImage inline cũ."""
+        if user.get("faceImageRef"):
+            return await self.get_bytes(user["faceImageRef"])
+        if user.get("faceImage"):
+            return decode_data_url(user["faceImage"])
+        return None
@@ -0,0 +1,125 @@
+# llm_backend/http_client.py
+# Một AsyncClient dùng chung cho mọi call sang Node backend: keep-alive, HTTP/2, timeout, retry.
+import asyncio
+import logging
+import os
+import random
+
+import httpx
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# === Cấu hình qua biến môi trường ===
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:4000")
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.2"))  # giây, nhân đôi sau mỗi lần
+
+try:  # HTTP/2 cần package h2 (httpx[http2])
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Lỗi xảy ra trước khi request kịp gửi đi → retry an toàn cả với POST
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# 502/503/504 có thể đến sau khi Node đã ghi xong (proxy timeout) → chỉ retry theo status với method idempotent,
+# POST /checkin, /campaigns/{id}/register... phát lại sẽ thành "đã check-in / đã đăng ký"
+RETRYABLE_STATUS = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+requests_total = metrics.counter("backend_http_requests_total", "Số request gửi sang Node backend")
+new_connections = metrics.counter("backend_http_new_connections_total", "Số kết nối TCP mới tới Node backend")
+retries_total = metrics.counter("backend_http_retries_total", "Số lần retry request sang Node backend")
+request_seconds = metrics.histogram("backend_http_request_seconds", "Thời gian request sang Node backend")
+
+_client = None
+
+
+async def _trace(event_name, info):
+    # httpcore báo mỗi lần mở kết nối mới; còn lại là request chạy trên kết nối keep-alive
+    if event_name == "connection.connect_tcp.complete":
+        new_connections.inc()
+
+
+def start():
+    global _client
+    if _client is not None:
+        return _client
+    _client = httpx.AsyncClient(
+        base_url=BACKEND_URL,
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        ),
+    )
+    logger.info(f"✅ HTTP client tới {BACKEND_URL} sẵn sàng (http2={HTTP2_AVAILABLE})")
+    return _client
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    return _client if _client is not None else start()
+
+
+async def request(method: str, url: str, retries: int = HTTP_RETRIES, idempotent: bool = None,
+                  **kwargs) -> httpx.Response:
+    """Gửi request qua client dùng chung, retry với exponential backoff + full jitter.
+    Lỗi kết nối luôn được retry; status 502/503/504 chỉ retry khi request idempotent
+    (mặc định theo method, POST an toàn để phát lại thì truyền idempotent=True)."""
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    client = get_client()
+    extensions = {**kwargs.pop("extensions", {}), "trace": _trace}
+    attempt = 0
+    while True:
+        requests_total.inc()
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        try:
+            response = await client.request(method, url, extensions=extensions, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            if attempt >= retries:
+                raise
+            logger.warning(f"⚠️ {method} {url} lỗi kết nối ({e!r}), thử lại lần {attempt + 1}")
+        else:
+            request_seconds.observe(loop.time() - t0)
+            if not idempotent or response.status_code not in RETRYABLE_STATUS or attempt >= retries:
+                return response
+            logger.warning(f"⚠️ {method} {url} trả {response.status_code}, thử lại lần {attempt + 1}")
+            await response.aclose()
+
+        retries_total.inc()
+        await asyncio.sleep(random.uniform(0, HTTP_RETRY_BACKOFF * (2 ** attempt)))
+        attempt += 1
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
+
+
+def stats():
+    sent, opened = requests_total.value, new_connections.value
+    return {
+        "http2": HTTP2_AVAILABLE,
+        "requests": sent,
+        "new_connections": opened,
+        "connection_reuse_ratio": round(1 - opened / sent, 4) if sent else 0.0,
+        "retries": retries_total.value,
+    }
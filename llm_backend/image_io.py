@@ -0,0 +1,46 @@
+# llm_backend/image_io.py
+# Giải mã ảnh upload thẳng về numpy, thu nhỏ sớm bằng draft mode của JPEG.
+import base64
+import binascii
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+# Cạnh dài tối đa đưa vào detector; ảnh điện thoại 4–8MP được thu nhỏ ngay khi decode
+FACE_INPUT_MAX_SIDE = int(os.getenv("FACE_INPUT_MAX_SIDE", "1024"))
+
+
+def open_image(data, max_side: int = FACE_INPUT_MAX_SIDE) -> Image.Image:
+    """bytes/memoryview → PIL Image RGB, cạnh dài không quá max_side.
+
+    Với JPEG, draft() để libjpeg giải mã luôn ở tỉ lệ 1/2, 1/4 hoặc 1/8
+    nên không bao giờ phải cấp phát bitmap full-size.
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        if max_side:
+            img.draft("RGB", (max_side, max_side))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if max_side and max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), reducing_gap=2.0)
+        return img
+    except Exception as e:
+        raise ValueError(f"Lỗi giải mã ảnh: {e}")
+
+
+def decode_image(data, max_side: int = FACE_INPUT_MAX_SIDE) -> np.ndarray:
+    return np.asarray(open_image(data, max_side))
+
+
+def decode_base64_image(base64_str: str, max_side: int = FACE_INPUT_MAX_SIDE) -> np.ndarray:
+    try:
+        comma = base64_str.find(",", 0, 100)  # tiền tố "data:image/...;base64,"
+        if comma != -1:
+            base64_str = base64_str[comma + 1:]
+        data = base64.b64decode(base64_str)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Lỗi giải mã ảnh base64: {e}")
+    return decode_image(data, max_side)
@@ -0,0 +1,222 @@
+# llm_backend/inference.py
+# Chạy ArcFace ngoài event loop: thread pool hoặc process pool có preload model.
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+import metrics
+from tracing import add_stage
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "ArcFace"
+DETECTOR_BACKEND = os.getenv("FACE_DETECTOR_BACKEND", "opencv")
+
+# === Cấu hình qua biến môi trường ===
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")  # "thread" | "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))  # số job được phép chờ
+# "deepface": TensorFlow/Keras như trước | "onnx": YuNet + ArcFace qua ONNX Runtime (xem face_onnx.py)
+FACE_BACKEND = os.getenv("FACE_BACKEND", "deepface")
+
+queue_depth = metrics.gauge("inference_queue_depth", "Số job inference đang chờ hoặc đang chạy")
+queue_wait = metrics.histogram("inference_queue_wait_seconds", "Thời gian job chờ worker rảnh")
+inference_time = metrics.histogram("inference_seconds", "Thời gian chạy inference trong worker")
+rejected = metrics.counter("inference_rejected_total", "Số job bị từ chối do hàng đợi đầy")
+warm_up_time = metrics.gauge("inference_warm_up_seconds", "Thời gian warm-up model lúc khởi động")
+
+
+def _deepface():
+    # Import lười: TensorFlow + DeepFace tốn vài giây và vài trăm MB RSS, chỉ nạp khi
+    # warm-up hoặc khi có ảnh đầu tiên (trong worker) chứ không phải lúc import module.
+    from deepface import DeepFace
+    return DeepFace
+
+
+class InferenceQueueFull(Exception):
+    """Hàng đợi inference đã đầy → endpoint trả 503 ngay thay vì xếp hàng."""
+
+
+def warm_up():
+    # Build model nhận diện + detector và chạy một lượt inference giả
+    # để TensorFlow compile graph trước khi có request thật.
+    # Chạy một lần trong mỗi worker process (initializer) hoặc một lần với thread pool.
+    if FACE_BACKEND == "onnx":
+        import face_onnx
+        return face_onnx.warm_up()
+    DeepFace = _deepface()
+    DeepFace.build_model(MODEL_NAME)
+    DeepFace.build_model(DETECTOR_BACKEND, task="face_detector")
+    dummy = np.zeros((224, 224, 3), dtype=np.uint8)
+    DeepFace.represent(
+        img_path=dummy,
+        model_name=MODEL_NAME,
+        detector_backend=DETECTOR_BACKEND,
+        enforce_detection=False,
+    )
+    return os.getpid()
+
+
+def represent_face(img_array):
+    if FACE_BACKEND == "onnx":
+        import face_onnx
+        return face_onnx.represent_face(img_array)
+    embedding_info = _deepface().represent(
+        img_path=img_array,
+        model_name=MODEL_NAME,
+        detector_backend=DETECTOR_BACKEND,
+        enforce_detection=True,
+    )
+    return embedding_info[0]["embedding"]
+
+
+def detect_face(img_array):
+    """Detection + alignment + chuẩn hoá, giống hệt các bước trong DeepFace.represent."""
+    from deepface.modules import detection, preprocessing
+    model = _deepface().build_model(MODEL_NAME)
+    target_size = model.input_shape
+    img_objs = detection.extract_faces(
+        img_path=img_array,
+        detector_backend=DETECTOR_BACKEND,
+        grayscale=False,
+        enforce_detection=True,
+        align=True,
+    )
+    face = img_objs[0]["face"][:, :, ::-1]  # rgb → bgr như DeepFace
+    face = preprocessing.resize_image(img=face, target_size=(target_size[1], target_size[0]))
+    return preprocessing.normalize_input(img=face, normalization="base")
+
+
+def represent_faces(img_arrays):
+    """Detect từng ảnh rồi chạy ArcFace một lượt cho cả batch.
+
+    Trả về list cùng thứ tự input, mỗi phần tử là (embedding, None) hoặc (None, lỗi).
+    """
+    if FACE_BACKEND == "onnx":
+        import face_onnx
+        return face_onnx.represent_faces(img_arrays)
+    results = [None] * len(img_arrays)
+    faces, positions = [], []
+    for i, img in enumerate(img_arrays):
+        try:
+            faces.append(detect_face(img))
+            positions.append(i)
+        except Exception as e:
+            results[i] = (None, str(e))
+
+    if faces:
+        model = _deepface().build_model(MODEL_NAME)
+        embeddings = model.model(np.concatenate(faces, axis=0), training=False).numpy()
+        for i, emb in zip(positions, embeddings):
+            results[i] = (emb.tolist(), None)
+    return results
+
+
+def _timed_call(fn, args):
+    # Chạy trong worker: trả về kèm mốc bắt đầu (wall clock) và thời gian chạy
+    started_at = time.time()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, started_at, time.perf_counter() - t0
+
+
+class InferenceExecutor:
+    def __init__(self, mode: str = INFERENCE_MODE, workers: int = INFERENCE_WORKERS,
+                 max_queue: int = INFERENCE_MAX_QUEUE):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"INFERENCE_MODE không hợp lệ: {mode}")
+        if FACE_BACKEND not in ("deepface", "onnx"):
+            raise ValueError(f"FACE_BACKEND không hợp lệ: {FACE_BACKEND}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = None
+        self._pending = 0
+        self.ready = False
+
+    def start(self):
+        if self._pool is not None:
+            return
+        if self.mode == "process":
+            # spawn thay vì fork: TensorFlow không an toàn khi fork
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up,
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="inference",
+            )
+        logger.info(
+            f"✅ Inference executor sẵn sàng ({FACE_BACKEND}, {self.mode}, {self.workers} worker, "
+            f"hàng đợi {self.max_queue})"
+        )
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self.ready = False
+
+    async def warm_up(self):
+        """Nạp model trên mọi worker; chỉ sau khi xong mới đánh dấu ready."""
+        if self._pool is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        if self.mode == "process":
+            # Mỗi worker đã warm-up trong initializer; gửi đủ job để spawn hết worker
+            pids = await asyncio.gather(*[
+                loop.run_in_executor(self._pool, os.getpid) for _ in range(self.workers)
+            ])
+            logger.info(f"🔥 Đã warm-up {len(set(pids))} worker process")
+        else:
+            await loop.run_in_executor(self._pool, warm_up)
+        elapsed = time.perf_counter() - t0
+        warm_up_time.set(round(elapsed, 3))
+        self.ready = True
+        logger.info(f"✅ Warm-up model xong sau {elapsed:.2f}s")
+
+    @property
+    def capacity(self):
+        return self.workers + self.max_queue
+
+    @property
+    def pending(self):
+        return self._pending
+
+    async def run(self, fn, *args):
+        """Chạy fn(*args) trên pool; raise InferenceQueueFull nếu đã quá tải."""
+        if self._pool is None:
+            self.start()
+        if self._pending >= self.capacity:
+            rejected.inc()
+            raise InferenceQueueFull()
+
+        self._pending += 1
+        queue_depth.inc()
+        submitted_at = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started_at, elapsed = await loop.run_in_executor(self._pool, _timed_call, fn, args)
+        finally:
+            self._pending -= 1
+            queue_depth.dec()
+
+        waited = max(0.0, started_at - submitted_at)
+        queue_wait.observe(waited)
+        inference_time.observe(elapsed)
+        add_stage("inference_queue", waited)
+        add_stage("inference", elapsed)
+        return result
+
+
+# Executor dùng chung cho cả app
+executor = InferenceExecutor()
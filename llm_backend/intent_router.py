@@ -0,0 +1,131 @@
+# llm_backend/intent_router.py
+# Bộ định tuyến intent cho chatbot: khai báo intent + từ khoá kích hoạt, gộp tất cả thành một regex
+# biên dịch sẵn và quét câu hỏi một lượt; chỉ intent có từ khoá xuất hiện mới phải kiểm tra tiếp.
+# Regex gộp cố ý không dùng group: có group thì sre bỏ bước lọc ký tự đầu và chậm hơn ~5 lần,
+# nên đoạn khớp được map ngược về intent qua một dict (tính một lần cho mỗi chuỗi khớp).
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+
+import metrics
+from log_setup import bind
+
+logger = logging.getLogger(__name__)
+
+routing_seconds = metrics.histogram("intent_routing_seconds", "Thời gian chọn intent cho một câu hỏi")
+
+
+@dataclass
+class ChatTurn:
+    """Thông tin một lượt hỏi truyền cho handler."""
+    text: str  # câu hỏi gốc
+    lower: str  # câu hỏi đã chuẩn hoá (chữ thường)
+    user_id: str = None
+    token: str = None
+    stream: bool = False
+    session_key: str = None
+    session: dict = field(default_factory=dict)
+
+
+@dataclass
+class Intent:
+    name: str
+    handler: object  # async fn(turn, match) -> reply | None (None: nhường cho intent sau)
+    triggers: tuple = ()  # mảnh regex; rỗng = intent dự phòng, luôn được xét
+    pattern: re.Pattern = None  # kiểm tra thêm sau khi đã kích hoạt (tuỳ chọn)
+    hits: object = None
+    seconds: object = None
+
+
+class IntentRouter:
+    def __init__(self):
+        self._intents = []
+        self._fragments = []  # [(regex từng mảnh, {tên intent})]
+        self._owners = {}  # đoạn văn bản đã khớp → {tên intent}
+        self._scanner = None
+
+    @property
+    def intents(self):
+        return list(self._intents)
+
+    def intent(self, name: str, triggers=(), pattern: str = None):
+        """Decorator đăng ký handler; thứ tự khai báo = thứ tự ưu tiên."""
+        def register(handler):
+            self.add(name, handler, triggers, pattern)
+            return handler
+        return register
+
+    def add(self, name: str, handler, triggers=(), pattern: str = None):
+        if any(i.name == name for i in self._intents):
+            raise ValueError(f"Intent '{name}' đã được đăng ký")
+        self._intents.append(Intent(
+            name=name,
+            handler=handler,
+            triggers=tuple(triggers),
+            pattern=re.compile(pattern) if pattern else None,
+            hits=metrics.counter(f"intent_{name}_hits_total", f"Số câu hỏi được intent {name} trả lời"),
+            seconds=metrics.histogram(f"intent_{name}_seconds", f"Thời gian xử lý của intent {name}"),
+        ))
+        self._scanner = None
+
+    def _compile(self):
+        by_fragment = {}
+        for intent in self._intents:
+            for fragment in intent.triggers:
+                by_fragment.setdefault(fragment, set()).add(intent.name)
+        self._fragments = [(re.compile(f), names) for f, names in by_fragment.items()]
+        self._owners = {}
+        self._scanner = re.compile("|".join(f"(?:{f})" for f in by_fragment)) if by_fragment else None
+
+    def _owners_of(self, matched: str):
+        owners = self._owners.get(matched)
+        if owners is None:
+            owners = set()
+            for regex, names in self._fragments:
+                if regex.fullmatch(matched):
+                    owners |= names
+            if len(self._owners) < 1024:
+                self._owners[matched] = owners
+        return owners
+
+    def route(self, text_lower: str):
+        """Các intent ứng viên theo thứ tự ưu tiên (một lượt quét regex gộp)."""
+        if self._scanner is None:
+            self._compile()
+        t0 = time.perf_counter()
+        triggered = set()
+        if self._scanner is not None:
+            for matched in self._scanner.findall(text_lower):
+                triggered |= self._owners_of(matched)
+        candidates = []
+        for intent in self._intents:
+            if intent.triggers and intent.name not in triggered:
+                continue
+            match = None
+            if intent.pattern is not None:
+                match = intent.pattern.search(text_lower)
+                if match is None:
+                    continue
+            candidates.append((intent, match))
+        routing_seconds.observe(time.perf_counter() - t0)
+        return candidates
+
+    async def dispatch(self, turn: ChatTurn):
+        """Chạy handler của các intent ứng viên tới khi có một handler trả lời."""
+        for intent, match in self.route(turn.lower):
+            t0 = time.perf_counter()
+            reply = await intent.handler(turn, match)
+            if reply is not None:
+                elapsed = time.perf_counter() - t0
+                intent.seconds.observe(elapsed)
+                intent.hits.inc()
+                bind(intent=intent.name)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("🧭 Intent %s (%.1fms)", intent.name, elapsed * 1000,
+                                 extra={"latency_ms": round(elapsed * 1000, 1)})
+                return reply
+        return None
+
+    def stats(self):
+        return {i.name: i.hits.value for i in self._intents}
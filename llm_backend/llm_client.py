@@ -0,0 +1,146 @@
+# llm_backend/llm_client.py
+# Client OpenAI async dùng chung: timeout, giới hạn số call đồng thời, streaming, đo TTFT.
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+import metrics
+from tracing import add_stage
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# === Cấu hình qua biến môi trường ===
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))  # giây, thời gian chờ đọc response
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_QUEUE_TIMEOUT = float(os.getenv("OPENAI_QUEUE_TIMEOUT", "10"))  # giây chờ slot trước khi báo bận
+
+api_key = os.getenv("OPENAI_API_KEY")
+if not api_key:
+    raise ValueError("OPENAI_API_KEY không được thiết lập")
+
+client = AsyncOpenAI(
+    api_key=api_key,
+    timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+    max_retries=OPENAI_MAX_RETRIES,
+)
+
+llm_in_flight = metrics.gauge("llm_in_flight", "Số call OpenAI đang chạy")
+llm_rejected = metrics.counter("llm_rejected_total", "Số call OpenAI bị từ chối vì quá tải")
+llm_errors = metrics.counter("llm_errors_total", "Số call OpenAI lỗi")
+llm_queue_wait = metrics.histogram("llm_queue_wait_seconds", "Thời gian chờ slot gọi OpenAI")
+llm_ttft = metrics.histogram("llm_time_to_first_token_seconds", "Thời gian tới token đầu tiên")
+llm_total = metrics.histogram("llm_total_seconds", "Tổng thời gian một call OpenAI")
+llm_embedding_seconds = metrics.histogram("llm_embedding_seconds", "Thời gian một call embedding")
+
+_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+_token_counters = {}  # (loại, model) → counter
+
+
+def count_tokens(kind: str, model: str, tokens):
+    """Cộng token OpenAI báo về (usage) vào llm_<kind>_tokens_total{model}."""
+    if not tokens:
+        return
+    counter = _token_counters.get((kind, model))
+    if counter is None:
+        counter = _token_counters[(kind, model)] = metrics.counter(
+            f"llm_{kind}_tokens_total", f"Số token {kind} OpenAI tính phí", labels={"model": model},
+        )
+    counter.inc(tokens)
+
+
+class LLMBusy(Exception):
+    """Đã đủ OPENAI_MAX_CONCURRENCY call đang chạy và chờ quá OPENAI_QUEUE_TIMEOUT."""
+
+
+async def _acquire():
+    t0 = time.perf_counter()
+    try:
+        await asyncio.wait_for(_semaphore.acquire(), OPENAI_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        llm_rejected.inc()
+        raise LLMBusy(f"Quá {OPENAI_MAX_CONCURRENCY} call OpenAI đồng thời")
+    waited = time.perf_counter() - t0
+    llm_queue_wait.observe(waited)
+    add_stage("llm_queue", waited)
+    llm_in_flight.inc()
+
+
+def _release():
+    llm_in_flight.dec()
+    _semaphore.release()
+
+
+async def stream_chat(messages, model: str = OPENAI_MODEL, on_first_token=None):
+    """Async generator trả từng đoạn text ngay khi OpenAI gửi về.
+    on_first_token(ttft): TTFT tính từ lúc có slot (không gồm thời gian chờ hàng đợi)."""
+    await _acquire()
+    t0 = time.perf_counter()
+    ttft = None
+    try:
+        # include_usage: chunk cuối (choices rỗng) mang số token prompt/completion
+        stream = await client.chat.completions.create(
+            model=model, messages=messages, stream=True, stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None)
+            if usage is not None:
+                count_tokens("prompt", model, usage.prompt_tokens)
+                count_tokens("completion", model, usage.completion_tokens)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - t0
+                llm_ttft.observe(ttft)
+                if on_first_token is not None:
+                    on_first_token(ttft)
+            yield delta
+    except Exception:
+        llm_errors.inc()
+        raise
+    finally:
+        total = time.perf_counter() - t0
+        llm_total.observe(total)
+        add_stage("openai", total)
+        _release()
+        if logger.isEnabledFor(logging.INFO):
+            ttft_ms = round(ttft * 1000) if ttft is not None else -1
+            logger.info("🤖 %s: TTFT %dms, tổng %dms", model, ttft_ms, total * 1000,
+                        extra={"model": model, "ttft_ms": ttft_ms, "latency_ms": round(total * 1000, 1)})
+
+
+async def embed_texts(texts, model: str = OPENAI_EMBEDDING_MODEL):
+    """Embedding cho nhiều đoạn text trong một request, trả về list vector theo đúng thứ tự."""
+    await _acquire()
+    t0 = time.perf_counter()
+    try:
+        response = await client.embeddings.create(model=model, input=list(texts))
+    except Exception:
+        llm_errors.inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        llm_embedding_seconds.observe(elapsed)
+        add_stage("openai_embedding", elapsed)
+        _release()
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        count_tokens("embedding", model, usage.prompt_tokens)
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+async def close():
+    await client.close()
@@ -0,0 +1,188 @@
+# llm_backend/log_setup.py
+# Cấu hình logging cho cả process: ghi log qua hàng đợi (thread riêng lo format + I/O),
+# file xoay vòng, log dạng text hoặc JSON kèm các trường theo request (request id, user id, intent, latency).
+#
+# Trong code: dùng format lười `logger.debug("... %s", x)` thay vì f-string, để khi level bị tắt
+# thì chuỗi không bị format; trường có cấu trúc truyền qua `extra={"latency_ms": ...}` hoặc bind().
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+import metrics
+
+# === Cấu hình qua biến môi trường ===
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Level riêng từng module, vd "ai_logic=DEBUG,intent_router=DEBUG"; httpx log mỗi request ở INFO nên mặc định hạ xuống
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" | "json"
+LOG_FILE = os.getenv("LOG_FILE", "chatbot.log")  # rỗng = chỉ ghi ra stderr
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_FILE_BACKUPS = int(os.getenv("LOG_FILE_BACKUPS", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # đầy thì bỏ bản ghi thay vì chặn event loop
+LOG_ACCESS = os.getenv("LOG_ACCESS", "1") == "1"
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# Các trường gắn theo request; dict dùng chung giữa middleware và handler của cùng request
+_context = ContextVar("log_context", default=None)
+_CONTEXT_FIELDS = ("request_id", "user_id", "intent")
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", *_CONTEXT_FIELDS}
+
+_listener = None
+
+dropped = metrics.counter("log_dropped_total", "Số bản ghi log bị bỏ vì hàng đợi ghi log đầy")
+
+
+def bind(**fields):
+    """Gắn thêm trường cho mọi log còn lại của request hiện tại (vd user_id, intent)."""
+    context = _context.get()
+    if context is None:
+        context = {}
+        _context.set(context)
+    context.update({k: v for k, v in fields.items() if v is not None})
+
+
+class ContextFilter(logging.Filter):
+    """Chạy trên thread gọi log (nơi contextvar còn giá trị) để chép các trường request vào record."""
+
+    def filter(self, record):
+        context = _context.get() or {}
+        for field in _CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field, "-"))
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler mặc định format message ngay trên thread gọi log; ở đây đẩy nguyên record
+    để thread của QueueListener làm hết phần format + ghi file."""
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in _CONTEXT_FIELDS:
+            value = getattr(record, field, "-")
+            if value != "-":
+                entry[field] = value
+        # Trường truyền qua extra={...}
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _parse_levels(spec: str):
+    levels = {}
+    for part in spec.split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, fmt: str = LOG_FORMAT, log_file: str = LOG_FILE):
+    """Gọi một lần khi khởi động process (gọi lại không có tác dụng)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8",
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+    for name, module_level in _parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Xả hết log còn trong hàng đợi rồi dừng thread ghi log."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+access_logger = logging.getLogger("access")
+
+
+class RequestLogMiddleware:
+    """ASGI middleware: gán request id (nhận từ header X-Request-ID nếu có), trả lại trong response
+    và ghi một dòng access log có latency + các trường handler đã bind (user_id, intent)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        context = {"request_id": request_id}
+        token = _context.set(context)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if LOG_ACCESS and access_logger.isEnabledFor(logging.INFO):
+                latency_ms = round((time.perf_counter() - t0) * 1000, 1)
+                access_logger.info(
+                    "%s %s %s %.1fms", scope["method"], scope["path"], status, latency_ms,
+                    extra={"method": scope["method"], "path": scope["path"], "status": status, "latency_ms": latency_ms},
+                )
+            _context.reset(token)
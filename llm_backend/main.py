@@ -1,222 +1,105 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from deepface import DeepFace
-import numpy as np
-from PIL import Image
-import io
+from contextlib import asynccontextmanager
+import importlib
 import os
-import base64
-import pymongo
-from bson import ObjectId
 from dotenv import load_dotenv
 import logging
-from base64 import b64encode
-from ai_logic import answer_user_question  # Logic chatbot
-from typing import Optional
-
-# === Logger setup ===
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+import database
+import http_client
+import metrics
+from log_setup import setup_logging, RequestLogMiddleware
+import tracing
+from tracing import TraceMiddleware
 
 # === Load biến môi trường ===
 load_dotenv()
 
-# === Tạo app FastAPI ===
-app = FastAPI()
-
-# === CORS ===
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Cho tất cả frontend
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# === Kết nối MongoDB ===
-mongo_uri = os.getenv("MONGO_URI")
-if not mongo_uri:
-    logger.error("❌ MONGO_URI không được thiết lập trong .env")
-    raise ValueError("MONGO_URI không được thiết lập")
-
-try:
-    mongo_client = pymongo.MongoClient(mongo_uri)
-    db = mongo_client["VHHT"]
-    campaign_collection = db["campaigns"]
-    donation_campaign_collection = db["donationCampaigns"]
-    donor_profile_collection = db["donorProfiles"]
-    user_collection = db["users"]
-    logger.info("✅ Kết nối MongoDB thành công")
-except Exception as e:
-    logger.error(f"❌ Lỗi kết nối MongoDB: {str(e)}")
-    raise
-
-# === Pydantic Models ===
-class ChatData(BaseModel):
-    message: str
-
-class ImageData(BaseModel):
-    user_id: str
-    image: str  # base64 encoded image
-    campaignId: str
-    phaseId: str
-    phasedayId: str
-    method: str
-
-# === Helper: base64 → numpy image array ===
-def base64_to_image(base64_str):
-    try:
-        if "," in base64_str:
-            base64_str = base64_str.split(",")[1]
-        img_data = base64.b64decode(base64_str)
-        img = Image.open(io.BytesIO(img_data)).convert("RGB")
-        return np.array(img)
-    except Exception as e:
-        raise ValueError(f"Lỗi giải mã ảnh base64: {e}")
-
-# === Endpoint: Đăng ký khuôn mặt ===
-@app.post("/register")
-async def register_face(user_id: str = Form(...), file: UploadFile = File(...)):
-    try:
-        # Đọc ảnh từ file upload
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img_array = np.array(image)
-
-        # 👉 Convert ảnh sang base64 để lưu vào MongoDB
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        image_base64 = "data:image/jpeg;base64," + b64encode(buffered.getvalue()).decode()
-
-        # Tính embedding với DeepFace
-        embedding_info = DeepFace.represent(
-            img_path=img_array,
-            model_name="ArcFace",
-            enforce_detection=True
-        )
-        face_descriptor = embedding_info[0]["embedding"]
-
-        # Cập nhật vào MongoDB
-        result = user_collection.update_one(
-            {"_id": ObjectId(user_id)},
-            {
-                "$set": {
-                    "faceDescriptor": face_descriptor,
-                    "faceImage": image_base64  # 🆕 Lưu ảnh thật
-                }
-            }
-        )
-
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="❌ Không tìm thấy người dùng!")
-
-        return {"status": "✅ Đăng ký khuôn mặt thành công!"}
-
-    except Exception as e:
-        logger.error(f"Lỗi tại /register: {e}")
-        raise HTTPException(status_code=500, detail=f"Lỗi xử lý: {str(e)}")
-    
-# === Endpoint: Check-in khuôn mặt ===
-@app.post("/checkin")
-async def checkin_face(data: ImageData):
-    try:
-        camera_img = base64_to_image(data.image)
-
-        embedding_info = DeepFace.represent(
-            img_path=camera_img,
-            model_name="ArcFace",
-            enforce_detection=True,
-        )
-        embedding_checkin = embedding_info[0]["embedding"]
-
-        user = user_collection.find_one({"_id": ObjectId(data.user_id)})
-        if not user or "faceDescriptor" not in user:
-            raise HTTPException(status_code=404, detail="❌ Không tìm thấy khuôn mặt đã đăng ký.")
-
-        embedding_registered = user["faceDescriptor"]
-
-        from numpy.linalg import norm
-        def cosine_distance(a, b):
-            a = np.array(a)
-            b = np.array(b)
-            return 1 - np.dot(a, b) / (norm(a) * norm(b))
-
-        distance = cosine_distance(embedding_checkin, embedding_registered)
-
-        if distance < 0.35:
-            import httpx
-            async with httpx.AsyncClient() as client:
-                payload = {
-                    "userId": data.user_id,
-                    "campaignId": data.campaignId,  
-                    "phaseId": data.phaseId,        
-                    "phasedayId": data.phasedayId,  
-                    "method": "face"
-                }
-
-                backend_url = os.getenv("BACKEND_URL", "http://localhost:4000")
-                res = await client.post(f"{backend_url}/checkin", json=payload)
-
-                if res.status_code == 201:
-                    return {
-                        "status": "✅ Check-in thành công!",
-                        "distance": distance,
-                        "saved": True
-                    }
-                elif res.status_code == 409:
-                    return {
-                        "status": "⚠️ Hôm nay checkin rồi á nha!",
-                        "distance": distance,
-                        "saved": False
-                    }
-                else:
-                    return {
-                        "status": "✅ Nhận diện ok nhưng lỗi lưu!",
-                        "distance": distance,
-                        "saved": False,
-                        "server_msg": res.text
-                    }
-
-        else:
-            return {
-                "status": f"🚫 Không khớp khuôn mặt! (Khoảng cách: {distance:.4f})",
-                "distance": distance,
-                "saved": False
-            }
-
-    except Exception as e:
-        logger.error(f"Lỗi tại /checkin: {e}")
-        raise HTTPException(status_code=500, detail=f"Lỗi nhận diện: {str(e)}")
-    
-# === Pydantic Models ===
-class ChatData(BaseModel):
-    message: str
-    userId: Optional[str] = None  # Có thể không có nếu là guest
-
-# === Endpoint: Chatbot ===
-@app.post("/chat")
-async def chat(data: ChatData, request: Request):
-    try:
-        token = request.headers.get("Authorization")  # 🎯 Lấy token từ header
-        
-        # Gọi đúng hàm với đầy đủ tham số
-        reply = answer_user_question(
-            user_input=data.message,
-            user_id=data.userId,
-            token=token 
-        )
-        
-        return {"reply": reply}  # Trả lại response chatbot
-        
-    except Exception as e:
-        logger.error(f"Lỗi tại /chat: {e}")
-        raise HTTPException(status_code=500, detail=f"Lỗi xử lý câu hỏi: {str(e)}")
-    
+# === Logger setup (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_FILE) ===
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# === Chọn service chạy trong process này ===
+# "chat,face" (mặc định) giữ nguyên một app như trước; "chat" hoặc "face" để deploy tách riêng
+# (xem Procfile). Module của service không được chọn không bị import: process chỉ chạy chatbot
+# không nạp stack khuôn mặt (DeepFace/TensorFlow, PIL, GridFS), process khuôn mặt không nạp
+# OpenAI client / index của chatbot.
+SERVICE_MODULES = {"chat": "chat_app", "face": "face_app"}
+LLM_SERVICES = os.getenv("LLM_SERVICES", "chat,face")
+
+def load_services(names: str):
+    selected = [n.strip() for n in names.split(",") if n.strip()]
+    unknown = [n for n in selected if n not in SERVICE_MODULES]
+    if unknown or not selected:
+        raise ValueError(f"LLM_SERVICES không hợp lệ: {names!r} (chọn trong {', '.join(SERVICE_MODULES)})")
+    return [importlib.import_module(SERVICE_MODULES[n]) for n in selected]
+
+def create_app(names: str = LLM_SERVICES) -> FastAPI:
+    services = load_services(names)
+
+    # === Vòng đời app: khởi động / tắt các service ===
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        http_client.start()
+        await tracing.check_mongo_context()
+        for service in services:
+            service.start()
+        yield
+        for service in services:
+            await service.stop()
+        await http_client.close()
+        database.close()
+
+    # === Tạo app FastAPI ===
+    app = FastAPI(lifespan=lifespan)
+
+    # === CORS ===
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Cho tất cả frontend
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Request id + access log (latency, user id, intent) cho mọi request
+    app.add_middleware(RequestLogMiddleware)
+    # Thời gian từng giai đoạn + số query Mongo theo endpoint (xem /metrics)
+    app.add_middleware(TraceMiddleware)
+
+    for service in services:
+        app.include_router(service.router)
+
+    # === Endpoint: Readiness cho load balancer ===
+    @app.get("/ready")
+    async def ready():
+        for service in services:
+            reason = service.not_ready_reason()
+            if reason:
+                raise HTTPException(status_code=503, detail=reason)
+        return {"status": "ready"}
+
+    # === Endpoint: Thống kê hiệu năng (hàng đợi, thời gian inference) ===
+    @app.get("/stats")
+    async def stats():
+        result = {"services": [s.__name__ for s in services], "backend_http": http_client.stats()}
+        for service in services:
+            result.update(service.stats())
+        result["metrics"] = metrics.snapshot()
+        return result
+
+    # === Endpoint: Metrics dạng Prometheus text để scrape ===
+    @app.get("/metrics")
+    async def prometheus_metrics():
+        return Response(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return app
+
+app = create_app()
+
 # === Khởi chạy ===
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))  # Đọc PORT từ env của Render
     uvicorn.run(app, host="0.0.0.0", port=port)
-
-    
\ No newline at end of file
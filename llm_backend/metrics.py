@@ -0,0 +1,207 @@
+# llm_backend/metrics.py
+# Bộ đếm / histogram in-process, đủ nhẹ để bật thường trực trên production.
+import threading
+from collections import deque
+
+# Biên bucket mặc định (giây) cho các phép đo độ trễ
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Số mẫu gần nhất giữ lại để ước lượng p50/p95/p99
+_RECENT_SAMPLES = 1024
+
+
+class Counter:
+    def __init__(self, name: str, description: str = "", labels=None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Gauge:
+    def __init__(self, name: str, description: str = "", labels=None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Histogram:
+    def __init__(self, name: str, description: str = "", buckets=DEFAULT_BUCKETS, labels=None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        self._bucket_counts = [0] * len(self.buckets)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._recent = deque(maxlen=_RECENT_SAMPLES)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+            self._recent.append(value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._bucket_counts[i] += 1
+                    break
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def sum(self):
+        return self._sum
+
+    def cumulative_buckets(self):
+        """Trả về [(biên, số mẫu <= biên)] theo kiểu Prometheus (không gồm +Inf)."""
+        with self._lock:
+            counts = list(self._bucket_counts)
+        result, running = [], 0
+        for bound, c in zip(self.buckets, counts):
+            running += c
+            result.append((bound, running))
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._recent)
+            count, total, peak = self._count, self._sum, self._max
+
+        def pct(q):
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "avg": round(total / count, 6) if count else 0.0,
+            "p50": round(pct(0.50), 6),
+            "p95": round(pct(0.95), 6),
+            "p99": round(pct(0.99), 6),
+            "max": round(peak, 6),
+        }
+
+
+# === Registry dùng chung cho cả process ===
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _label_text(labels, le=None) -> str:
+    # Label sắp theo tên để cùng một bộ label luôn ra cùng key; "le" của bucket đứng cuối
+    items = sorted(labels.items()) if labels else []
+    if le is not None:
+        items.append(("le", le))
+    if not items:
+        return ""
+    escaped = ((k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def metric_key(metric) -> str:
+    """Tên kèm label, vd request_seconds{endpoint="/chat"}; dùng làm key trong snapshot()."""
+    return metric.name + _label_text(metric.labels)
+
+
+def _get_or_create(cls, name, description, labels=None, **kwargs):
+    key = name + _label_text(labels)
+    with _registry_lock:
+        metric = _registry.get(key)
+        if metric is None:
+            metric = cls(name, description, labels=labels, **kwargs)
+            _registry[key] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric '{key}' đã được đăng ký với kiểu khác")
+        return metric
+
+
+def counter(name: str, description: str = "", labels=None) -> Counter:
+    return _get_or_create(Counter, name, description, labels)
+
+
+def gauge(name: str, description: str = "", labels=None) -> Gauge:
+    return _get_or_create(Gauge, name, description, labels)
+
+
+def histogram(name: str, description: str = "", buckets=DEFAULT_BUCKETS, labels=None) -> Histogram:
+    return _get_or_create(Histogram, name, description, labels, buckets=buckets)
+
+
+def all_metrics():
+    with _registry_lock:
+        return list(_registry.values())
+
+
+def snapshot():
+    return {metric_key(m): m.snapshot() for m in all_metrics()}
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """Toàn bộ registry theo text exposition format của Prometheus (cho GET /metrics)."""
+    types = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+    families = {}
+    for metric in all_metrics():
+        families.setdefault(metric.name, []).append(metric)
+
+    lines = []
+    for name in sorted(families):
+        members = families[name]
+        first = members[0]
+        if first.description:
+            lines.append(f"# HELP {name} {first.description}")
+        lines.append(f"# TYPE {name} {types[type(first)]}")
+        for metric in members:
+            if isinstance(metric, Histogram):
+                for bound, count in metric.cumulative_buckets():
+                    lines.append(f"{name}_bucket{_label_text(metric.labels, le=bound)} {count}")
+                labels = _label_text(metric.labels)
+                lines.append(f"{name}_bucket{_label_text(metric.labels, le='+Inf')} {metric.count}")
+                lines.append(f"{name}_sum{labels} {_number(metric.sum)}")
+                lines.append(f"{name}_count{labels} {metric.count}")
+            else:
+                lines.append(f"{name}{_label_text(metric.labels)} {_number(metric.value)}")
+    return "\n".join(lines) + "\n"
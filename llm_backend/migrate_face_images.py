@@ -0,0 +1,79 @@
+# llm_backend/migrate_face_images.py
+# Chuyển faceImage (base64 inline) trong users sang GridFS / thư mục local theo lô.
+#
+#   python migrate_face_images.py --mode gridfs --batch-size 200
+#   python migrate_face_images.py --mode local --dry-run
+import argparse
+import asyncio
+import io
+import logging
+import time
+
+from PIL import Image
+from pymongo import UpdateOne
+
+from face_storage import FaceImageStore, decode_data_url, encode_jpeg
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def migrate(user_collection, store: FaceImageStore, batch_size: int = 100, dry_run: bool = False):
+    query = {"faceImage": {"$type": "string"}}
+    cursor = user_collection.find(query, {"faceImage": 1}).batch_size(batch_size)
+
+    migrated, failed, bytes_before, bytes_after = 0, 0, 0, 0
+    ops = []
+    started = time.perf_counter()
+
+    async def flush():
+        if ops and not dry_run:
+            await user_collection.bulk_write(ops, ordered=False)
+        ops.clear()
+
+    async for user in cursor:
+        try:
+            raw = decode_data_url(user["faceImage"])
+            jpeg_bytes = encode_jpeg(Image.open(io.BytesIO(raw)))
+            ref = f"{store.mode}:dry-run" if dry_run else await store.put_bytes(jpeg_bytes)
+            bytes_before += len(user["faceImage"])
+            bytes_after += len(jpeg_bytes)
+            ops.append(UpdateOne(
+                {"_id": user["_id"], "faceImage": user["faceImage"]},  # bỏ qua nếu vừa bị /register ghi đè
+                {"$set": {"faceImageRef": ref}, "$unset": {"faceImage": ""}},
+            ))
+            migrated += 1
+        except Exception as e:
+            failed += 1
+            logger.warning(f"⚠️ Không chuyển được ảnh của user {user['_id']}: {e}")
+
+        if len(ops) >= batch_size:
+            await flush()
+            logger.info(f"… đã chuyển {migrated} ảnh")
+
+    await flush()
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"✅ Xong: {migrated} ảnh, {failed} lỗi, "
+        f"{bytes_before / 1e6:.1f}MB inline → {bytes_after / 1e6:.1f}MB blob trong {elapsed:.1f}s"
+        + (" (dry-run, chưa ghi gì)" if dry_run else "")
+    )
+    return {"migrated": migrated, "failed": failed, "bytes_before": bytes_before, "bytes_after": bytes_after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chuyển faceImage inline sang blob storage")
+    parser.add_argument("--mode", choices=["gridfs", "local"], default="gridfs")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from database import db, user_collection
+    asyncio.run(migrate(
+        user_collection, FaceImageStore(db, mode=args.mode),
+        batch_size=args.batch_size, dry_run=args.dry_run,
+    ))
+
+
+if __name__ == "__main__":
+    main()
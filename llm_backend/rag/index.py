@@ -0,0 +1,163 @@
+# rag/index.py
+# Index các chunk kiến thức trong RAM (ma trận float32 đã chuẩn hoá) để lấy top-k đoạn liên quan.
+# Vài nghìn chunk × 1536 chiều → một phép nhân ma trận, cỡ mili-giây, chưa cần ANN.
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from pymongo.errors import PyMongoError
+
+import metrics
+from cache import LRUTTLCache
+from campaign_index import fold
+
+logger = logging.getLogger(__name__)
+
+RAG_RETRIEVAL = os.getenv("RAG_RETRIEVAL", "1") == "1"
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+RAG_MIN_SCORE = float(os.getenv("RAG_MIN_SCORE", "0.35"))  # cosine similarity tối thiểu
+RAG_REFRESH_INTERVAL = float(os.getenv("RAG_REFRESH_INTERVAL", "300"))  # giây
+RAG_AUTO_INGEST = os.getenv("RAG_AUTO_INGEST", "0") == "1"
+# Tin nhắn ngắn hơn số từ này mà không có từ để hỏi ("ok", "chào em"...) thì không tốn call embedding
+RAG_MIN_QUERY_WORDS = int(os.getenv("RAG_MIN_QUERY_WORDS", "3"))
+RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1000"))
+RAG_QUERY_CACHE_TTL = float(os.getenv("RAG_QUERY_CACHE_TTL", "3600"))  # giây
+
+# Từ để hỏi (đã bỏ dấu, xem campaign_index.fold); khớp theo ranh giới từ
+QUESTION_WORDS = ("gi", "sao", "nao", "dau", "ai", "bao nhieu", "bao gio", "khong", "chua", "the nao", "lam sao")
+_question_pattern = re.compile(r"\b(" + "|".join(QUESTION_WORDS) + r")\b")
+
+GENERAL = "general"  # scope: chỉ kiến thức chung (không gắn chiến dịch)
+
+search_seconds = metrics.histogram("rag_search_seconds", "Thời gian tìm top-k chunk trong index kiến thức")
+skipped_queries = metrics.counter("rag_skipped_queries_total", "Số tin nhắn quá ngắn, không đem đi tìm kiến thức")
+# Embedding theo câu hỏi đã chuẩn hoá: hỏi lại cùng câu thì không gọi OpenAI lần nữa
+query_vectors = LRUTTLCache("rag_query_embeddings", maxsize=RAG_QUERY_CACHE_SIZE, ttl=RAG_QUERY_CACHE_TTL)
+
+
+class KnowledgeIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chunks = {}  # _id → {"text", "title", "campaignId", "vector"}
+        self._rows = []  # chunk theo thứ tự dòng của ma trận (snapshot, không đổi khi refresh chạy)
+        self._matrix = None
+        self._general = None  # mask các dòng là kiến thức chung
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _rebuild(self):
+        rows = list(self._chunks.values())
+        if rows:
+            matrix = np.stack([c["vector"] for c in rows])
+            general = np.array([c["campaignId"] is None for c in rows])
+        else:
+            matrix, general = None, None
+        with self._lock:
+            self._rows, self._matrix, self._general = rows, matrix, general
+
+    async def refresh(self, chunk_collection):
+        """Đồng bộ tăng dần: chỉ tải chunk mới, bỏ chunk đã bị xoá khỏi Mongo."""
+        current = {doc["_id"] async for doc in chunk_collection.find({}, {"_id": 1})}
+        removed = [i for i in self._chunks if i not in current]
+        new_ids = [i for i in current if i not in self._chunks]
+        for i in removed:
+            del self._chunks[i]
+        for start in range(0, len(new_ids), 500):
+            cursor = chunk_collection.find(
+                {"_id": {"$in": new_ids[start:start + 500]}},
+                {"text": 1, "title": 1, "campaignId": 1, "embedding": 1},
+            )
+            async for doc in cursor:
+                vector = np.frombuffer(doc["embedding"], dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                if norm == 0:
+                    continue
+                self._chunks[doc["_id"]] = {
+                    "text": doc.get("text", ""),
+                    "title": doc.get("title", ""),
+                    "campaignId": doc.get("campaignId"),
+                    "vector": vector / norm,
+                }
+        if removed or new_ids or not self.loaded:
+            self._rebuild()
+            logger.info(f"✅ Index kiến thức: {len(self)} chunk (+{len(new_ids)} / -{len(removed)})")
+        self.loaded = True
+
+    def search(self, probe, k: int = RAG_TOP_K, scope: str = None, min_score: float = RAG_MIN_SCORE):
+        """Trả về [(score, chunk)] giảm dần; scope=GENERAL để bỏ các chunk mô tả chiến dịch."""
+        with self._lock:
+            rows, matrix, general = self._rows, self._matrix, self._general
+        if matrix is None:
+            return []
+        q = np.asarray(probe, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1)
+        if q.size != matrix.shape[1]:
+            return []
+        scores = matrix @ q
+        if scope == GENERAL:
+            scores = np.where(general, scores, -1.0)
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), rows[i]) for i in top if scores[i] >= min_score]
+
+
+def worth_retrieving(question: str) -> bool:
+    """Đủ dài hoặc có từ để hỏi; chào hỏi, "ok", gõ nhầm... thì không đem đi tìm."""
+    folded = fold(question)
+    if len(folded.split()) >= RAG_MIN_QUERY_WORDS or _question_pattern.search(folded):
+        return True
+    skipped_queries.inc()
+    return False
+
+
+async def retrieve(question: str, embed, k: int = RAG_TOP_K, scope: str = None):
+    """Embed câu hỏi rồi lấy top-k chunk; index rỗng hoặc câu đã embed gần đây thì không tốn call embedding."""
+    if not RAG_RETRIEVAL or len(knowledge_index) == 0:
+        return []
+    key = " ".join(question.lower().split())
+    vector = query_vectors.get(key)
+    if vector is None:
+        try:
+            vector = (await embed([question]))[0]
+        except Exception as e:
+            logger.warning(f"⚠️ Không embed được câu hỏi để tìm kiến thức: {e}")
+            return []
+        query_vectors.set(key, vector)
+    t0 = time.perf_counter()
+    results = knowledge_index.search(vector, k, scope)
+    search_seconds.observe(time.perf_counter() - t0)
+    return results
+
+
+def render_chunks(results):
+    return "\n\n".join(
+        f"[{i + 1}] {chunk['title']}\n{chunk['text']}" if chunk["title"] and not chunk["text"].startswith(chunk["title"])
+        else f"[{i + 1}] {chunk['text']}"
+        for i, (_, chunk) in enumerate(results)
+    )
+
+
+async def keep_fresh(chunk_collection, ingest_fn=None):
+    """Chạy nền: định kỳ (tuỳ chọn) ingest rồi đồng bộ index."""
+    while True:
+        try:
+            if ingest_fn is not None:
+                await ingest_fn()
+            await knowledge_index.refresh(chunk_collection)
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Không đồng bộ được index kiến thức: {e}")
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi cập nhật index kiến thức: {e}")
+        await asyncio.sleep(RAG_REFRESH_INTERVAL)
+
+
+knowledge_index = KnowledgeIndex()
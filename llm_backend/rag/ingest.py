@@ -0,0 +1,169 @@
+# rag/ingest.py
+# Cắt tài liệu kiến thức + mô tả chiến dịch thành đoạn, embed theo lô và lưu vào vhht_knowledge_chunks.
+# Chạy tăng dần: nguồn nào không đổi nội dung (cùng hash) thì bỏ qua, nguồn đã xoá thì xoá chunk.
+#
+#   python -m rag.ingest
+#   python -m rag.ingest --batch-size 32 --dry-run
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from bson import Binary
+
+logger = logging.getLogger(__name__)
+
+RAG_CHUNK_CHARS = int(os.getenv("RAG_CHUNK_CHARS", "800"))
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "100"))
+RAG_EMBED_BATCH = int(os.getenv("RAG_EMBED_BATCH", "64"))
+
+
+def _tail_words(text: str, limit: int) -> str:
+    """Các từ cuối có tổng độ dài ≤ limit, dùng làm phần chồng lấn giữa hai chunk."""
+    tail, length = [], 0
+    for word in reversed(text.split()):
+        if length + len(word) + 1 > limit:
+            break
+        tail.append(word)
+        length += len(word) + 1
+    return " ".join(reversed(tail))
+
+
+def chunk_text(text: str, size: int = RAG_CHUNK_CHARS, overlap: int = RAG_CHUNK_OVERLAP):
+    """Gộp các đoạn văn thành chunk ~size ký tự; đoạn quá dài thì cắt theo từ, có chồng lấn."""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text or "") if p.strip()]
+    chunks, current = [], ""
+    for para in paragraphs:
+        if len(para) > size:
+            if current:
+                chunks.append(current)
+                current = ""
+            words = para.split()
+            window = ""
+            for word in words:
+                if window and len(window) + 1 + len(word) > size:
+                    chunks.append(window)
+                    window = _tail_words(window, overlap)
+                window = f"{window} {word}".strip()
+            current = window
+        elif current and len(current) + 2 + len(para) > size:
+            chunks.append(current)
+            current = para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+async def iter_sources(knowledge_collection, campaign_collection):
+    """Yield (source, campaignId, title, text) cho mọi tài liệu cần index."""
+    async for doc in knowledge_collection.find({}, {"title": 1, "content": 1}):
+        title = doc.get("title") or ""
+        yield f"knowledge:{doc['_id']}", None, title, f"{title}\n\n{doc.get('content') or ''}".strip()
+    async for doc in campaign_collection.find({"acceptStatus": "approved"}, {"name": 1, "description": 1}):
+        name = doc.get("name") or ""
+        yield f"campaign:{doc['_id']}", doc["_id"], name, f"Chiến dịch {name}\n\n{doc.get('description') or ''}"
+
+
+async def ingest(chunk_collection, knowledge_collection, campaign_collection, embed,
+                 batch_size: int = RAG_EMBED_BATCH, dry_run: bool = False):
+    started = time.perf_counter()
+    existing = {}
+    async for doc in chunk_collection.find({}, {"source": 1, "sourceHash": 1}):
+        existing[doc["source"]] = doc.get("sourceHash")
+
+    seen, pending = set(), []
+    async for source, campaign_id, title, text in iter_sources(knowledge_collection, campaign_collection):
+        seen.add(source)
+        digest = _hash(text)
+        if existing.get(source) != digest:
+            pending.append((source, campaign_id, title, digest, chunk_text(text)))
+
+    stale = [s for s in existing if s not in seen]
+    if stale and not dry_run:
+        await chunk_collection.delete_many({"source": {"$in": stale}})
+
+    embedded = 0
+    # Gom chunk của nhiều nguồn vào cùng một lô embedding để giảm số request
+    group, group_texts = [], []
+
+    async def flush():
+        nonlocal embedded
+        if not group:
+            return
+        vectors = [] if dry_run else await embed(group_texts)
+        offset = 0
+        for source, campaign_id, title, digest, chunks in group:
+            docs = []
+            for i, text in enumerate(chunks):
+                if not dry_run:
+                    vector = np.asarray(vectors[offset + i], dtype=np.float32)
+                    docs.append({
+                        "source": source, "sourceHash": digest, "campaignId": campaign_id,
+                        "title": title, "text": text, "seq": i,
+                        "embedding": Binary(vector.tobytes()), "dim": int(vector.size),
+                        "updatedAt": datetime.now(timezone.utc),
+                    })
+            offset += len(chunks)
+            if not dry_run:
+                # Thay toàn bộ chunk cũ của nguồn này bằng bản mới
+                await chunk_collection.delete_many({"source": source})
+                if docs:
+                    await chunk_collection.insert_many(docs, ordered=False)
+        embedded += len(group_texts)
+        group.clear()
+        group_texts.clear()
+
+    for item in pending:
+        group.append(item)
+        group_texts.extend(item[4])
+        if len(group_texts) >= batch_size:
+            await flush()
+    await flush()
+
+    result = {
+        "sources": len(seen),
+        "updated": len(pending),
+        "removed": len(stale),
+        "chunks_embedded": embedded,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info(f"✅ Ingest kiến thức: {result}" + (" (dry-run, chưa ghi gì)" if dry_run else ""))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed vhht_knowledge + mô tả chiến dịch cho RAG")
+    parser.add_argument("--batch-size", type=int, default=RAG_EMBED_BATCH)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    import database
+    from llm_client import embed_texts
+
+    async def run():
+        try:
+            await ingest(
+                database.knowledge_chunk_collection, database.knowledge_collection,
+                database.campaign_collection, embed_texts,
+                batch_size=args.batch_size, dry_run=args.dry_run,
+            )
+        finally:
+            database.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # rag/schema.py
-from pymongo import MongoClient
-import os
-
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["VHHT"]
-knowledge = db["vhht_knowledge"]
+# vhht_knowledge: tài liệu kiến thức chung {title, content} (FAQ, quy định, hướng dẫn...).
+# vhht_knowledge_chunks: các đoạn đã cắt + embedding float32 (Binary), do rag/ingest.py sinh ra:
+#   {source: "knowledge:<id>" | "campaign:<id>", sourceHash, campaignId (None nếu là kiến thức chung),
+#    title, text, embedding, dim, updatedAt}
+from database import knowledge_collection as knowledge
+from database import knowledge_chunk_collection as knowledge_chunks
@@ -0,0 +1,185 @@
+# llm_backend/response_cache.py
+# Cache câu trả lời GPT theo (campaign, phiên bản context, câu hỏi đã chuẩn hoá).
+# Tầng 1: LRU/TTL trong RAM; tầng 2 (tuỳ chọn): collection Mongo có TTL index.
+# Tuỳ chọn so khớp ngữ nghĩa: câu hỏi khác chữ nhưng embedding đủ gần thì dùng lại câu trả lời.
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+from datetime import datetime, timezone
+
+import numpy as np
+from pymongo.errors import PyMongoError
+
+import metrics
+from cache import LRUTTLCache
+
+logger = logging.getLogger(__name__)
+
+# === Cấu hình qua biến môi trường ===
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # giây
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "0") == "1"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))  # cosine similarity tối thiểu
+RESPONSE_CACHE_SEMANTIC_PER_SCOPE = int(os.getenv("RESPONSE_CACHE_SEMANTIC_PER_SCOPE", "200"))
+RESPONSE_CACHE_MONGO = os.getenv("RESPONSE_CACHE_MONGO", "0") == "1"
+RESPONSE_CACHE_COLLECTION = os.getenv("RESPONSE_CACHE_COLLECTION", "chatResponseCache")
+
+# Không cache các câu trả lời báo lỗi
+UNCACHEABLE_REPLIES = {"Có lỗi khi gọi GPT"}
+
+semantic_hits = metrics.counter("response_cache_semantic_hits_total", "Số lần trúng cache câu trả lời theo embedding")
+mongo_hits = metrics.counter("response_cache_mongo_hits_total", "Số lần trúng cache câu trả lời ở tầng Mongo")
+lookups_total = metrics.counter("response_cache_lookups_total", "Số lần tra cache câu trả lời")
+misses_total = metrics.counter("response_cache_misses_total", "Số lần tra cache câu trả lời mà không trúng tầng nào")
+
+
+def normalize_question(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.…")
+
+
+def context_version(context: str) -> str:
+    return hashlib.sha1(context.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    def __init__(self, collection=None, embed=None,
+                 maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 semantic: bool = RESPONSE_CACHE_SEMANTIC, threshold: float = RESPONSE_CACHE_SIMILARITY):
+        self._memory = LRUTTLCache("chat_response", maxsize=maxsize, ttl=ttl)
+        self._collection = collection
+        self._embed = embed  # async fn(list[str]) -> list[vector]
+        self.ttl = ttl
+        self.semantic = semantic and embed is not None
+        self.threshold = threshold
+        # scope "<campaign>:<context version>" → [(key, vector đã chuẩn hoá)]
+        self._vectors = {}
+        self._lock = threading.Lock()
+        self._index_ready = False
+
+    @staticmethod
+    def _scope(campaign_id, context: str) -> str:
+        return f"{campaign_id}:{context_version(context)}"
+
+    async def _ensure_index(self):
+        if self._index_ready:
+            return
+        self._index_ready = True
+        try:
+            await self._collection.create_index("createdAt", expireAfterSeconds=int(self.ttl))
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Không tạo được TTL index cho {RESPONSE_CACHE_COLLECTION}: {e}")
+
+    async def _embed_one(self, question: str):
+        try:
+            vector = np.asarray((await self._embed([question]))[0], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"⚠️ Không lấy được embedding câu hỏi, bỏ qua so khớp ngữ nghĩa: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _nearest(self, scope: str, probe):
+        with self._lock:
+            entries = list(self._vectors.get(scope, ()))
+        if not entries:
+            return None
+        matrix = np.stack([v for _, v in entries])
+        scores = matrix @ probe
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return entries[best][0]
+
+    def _remember_vector(self, scope: str, key: str, vector):
+        with self._lock:
+            entries = self._vectors.setdefault(scope, [])
+            entries[:] = [(k, v) for k, v in entries if k != key and k in self._memory]
+            entries.append((key, vector))
+            del entries[:-RESPONSE_CACHE_SEMANTIC_PER_SCOPE]
+
+    async def lookup(self, campaign_id, context: str, question: str):
+        """Trả về (câu trả lời hoặc None, token) — token truyền lại cho store() khi trượt."""
+        lookups_total.inc()
+        scope = self._scope(campaign_id, context)
+        key = f"{scope}:{normalize_question(question)}"
+        token = {"scope": scope, "key": key, "vector": None}
+
+        answer = self._memory.get(key)
+        if answer is not None:
+            return answer, token
+
+        if self._collection is not None:
+            try:
+                doc = await self._collection.find_one({"_id": key}, {"answer": 1})
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Lỗi đọc cache câu trả lời từ Mongo: {e}")
+                doc = None
+            if doc:
+                mongo_hits.inc()
+                self._memory.set(key, doc["answer"])
+                return doc["answer"], token
+
+        if self.semantic:
+            token["vector"] = await self._embed_one(normalize_question(question))
+            if token["vector"] is not None:
+                similar_key = self._nearest(scope, token["vector"])
+                answer = self._memory.get(similar_key, count=False) if similar_key else None
+                if answer is not None:
+                    semantic_hits.inc()
+                    return answer, token
+
+        misses_total.inc()
+        return None, token
+
+    async def store(self, token: dict, answer: str):
+        if not answer or answer in UNCACHEABLE_REPLIES:
+            return
+        key = token["key"]
+        self._memory.set(key, answer)
+        if token.get("vector") is not None:
+            self._remember_vector(token["scope"], key, token["vector"])
+        if self._collection is not None:
+            await self._ensure_index()
+            try:
+                await self._collection.update_one(
+                    {"_id": key},
+                    {"$set": {"answer": answer, "createdAt": datetime.now(timezone.utc)}},
+                    upsert=True,
+                )
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Lỗi ghi cache câu trả lời vào Mongo: {e}")
+
+    def stats(self):
+        lookups, misses = lookups_total.value, misses_total.value
+        return {
+            **self._memory.stats(),
+            "lookups": lookups,
+            "semantic_hits": semantic_hits.value,
+            "mongo_hits": mongo_hits.value,
+            "overall_hit_rate": round(1 - misses / lookups, 4) if lookups else 0.0,
+            "semantic": self.semantic,
+            "mongo": self._collection is not None,
+        }
+
+
+def _build():
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    collection = None
+    if RESPONSE_CACHE_MONGO:
+        from database import db
+        collection = db[RESPONSE_CACHE_COLLECTION]
+    embed = None
+    if RESPONSE_CACHE_SEMANTIC:
+        from llm_client import embed_texts
+        embed = embed_texts
+    return ResponseCache(collection=collection, embed=embed)
+
+
+response_cache = _build()
@@ -0,0 +1,113 @@
+# llm_backend/session_store.py
+# Trạng thái hội thoại theo phiên (user id trong access token / token / session id) thay cho biến toàn cục
+# last_campaign. Chỉ giữ campaign id đang nói tới.
+# Backend "memory": LRU/TTL trong process; "mongo": collection có TTL index, dùng chung giữa các worker.
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from auth import verify_access_token
+from cache import LRUTTLCache
+
+logger = logging.getLogger(__name__)
+
+# === Cấu hình qua biến môi trường ===
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "memory" | "mongo"
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))  # giây không hoạt động thì bỏ phiên
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_COLLECTION = os.getenv("SESSION_COLLECTION", "chatSessions")
+
+_UNSET = object()
+
+
+def session_key(token: str = None, session_id: str = None):
+    """Khoá phiên: ưu tiên user id trong access token đã xác thực, rồi token (chỉ lưu hash), rồi session id
+    của guest. Không dùng userId client tự gửi, để không ai đọc/ghi được phiên của người khác."""
+    claims = verify_access_token(token)
+    if claims and claims.get("user_id"):
+        return f"user:{claims['user_id']}"
+    if token:
+        return "token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+    if session_id:
+        return f"sid:{session_id}"
+    return None
+
+
+class SessionStore:
+    def __init__(self, collection=None, maxsize: int = SESSION_MAX, ttl: float = SESSION_TTL):
+        self._collection = collection
+        self._memory = LRUTTLCache("chat_session", maxsize=maxsize, ttl=ttl) if collection is None else None
+        self.ttl = ttl
+        self._index_ready = False
+
+    async def _ensure_index(self):
+        if self._index_ready:
+            return
+        self._index_ready = True
+        try:
+            await self._collection.create_index("updatedAt", expireAfterSeconds=int(self.ttl))
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Không tạo được TTL index cho {SESSION_COLLECTION}: {e}")
+
+    async def touch(self, key: str) -> dict:
+        """Đọc phiên và gia hạn TTL (còn hỏi tiếp thì phiên chưa hết hạn) trong một lượt:
+        Mongo chỉ tốn một find_one_and_update. Trả về {"campaignId": ...}; phiên mới/hết hạn thì dict rỗng."""
+        if key is None:
+            return {}
+        if self._memory is not None:
+            session = self._memory.get(key)
+            if session is None:
+                return {}
+            self._memory.set(key, session)
+            return dict(session)
+        try:
+            doc = await self._collection.find_one_and_update(
+                {"_id": key}, {"$set": {"updatedAt": datetime.now(timezone.utc)}},
+                projection={"campaignId": 1}, return_document=ReturnDocument.BEFORE,
+            )
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Lỗi đọc phiên chat từ Mongo: {e}")
+            return {}
+        return doc or {}
+
+    async def update(self, key: str, campaign_id=_UNSET):
+        """Cập nhật campaign đang nói tới (không truyền thì chỉ gia hạn TTL của phiên)."""
+        if key is None:
+            return
+
+        if self._memory is not None:
+            session = dict(self._memory.get(key, count=False) or {})
+            if campaign_id is not _UNSET:
+                session["campaignId"] = campaign_id
+            self._memory.set(key, session)
+            return
+
+        update = {"$set": {"updatedAt": datetime.now(timezone.utc)}}
+        if campaign_id is not _UNSET:
+            update["$set"]["campaignId"] = campaign_id
+        await self._ensure_index()
+        try:
+            await self._collection.update_one({"_id": key}, update, upsert=True)
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Lỗi ghi phiên chat vào Mongo: {e}")
+
+    def stats(self):
+        if self._memory is not None:
+            return {"backend": "memory", **self._memory.stats()}
+        return {"backend": "mongo", "collection": SESSION_COLLECTION}
+
+
+def _build():
+    if SESSION_BACKEND == "mongo":
+        from database import db
+        return SessionStore(collection=db[SESSION_COLLECTION])
+    if SESSION_BACKEND != "memory":
+        raise ValueError(f"SESSION_BACKEND không hợp lệ: {SESSION_BACKEND}")
+    return SessionStore()
+
+
+session_store = _build()
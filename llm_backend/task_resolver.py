@@ -0,0 +1,110 @@
+# llm_backend/task_resolver.py
+# Lấy nhiệm vụ của một user kèm ngày/giai đoạn/chiến dịch trong một aggregation duy nhất.
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from database import task_collection
+
+# Múi giờ để tính "hôm nay" / "tuần này" (phaseDay.date lưu dạng Date UTC)
+APP_TIMEZONE = ZoneInfo(os.getenv("APP_TIMEZONE", "Asia/Ho_Chi_Minh"))
+
+
+def _local_midnight(now: datetime) -> datetime:
+    return now.astimezone(APP_TIMEZONE).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _to_utc(d: datetime) -> datetime:
+    # pymongo hiểu datetime naive là UTC
+    return d.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def today_range(now: datetime = None):
+    start = _local_midnight(now or datetime.now(timezone.utc))
+    return _to_utc(start), _to_utc(start + timedelta(days=1))
+
+
+def week_range(now: datetime = None):
+    """Từ 0h thứ 2 đến hết chủ nhật của tuần hiện tại."""
+    start = _local_midnight(now or datetime.now(timezone.utc))
+    start -= timedelta(days=start.weekday())
+    return _to_utc(start), _to_utc(start + timedelta(days=7))
+
+
+def format_local_date(d):
+    if not isinstance(d, datetime):
+        return "Không rõ ngày"
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=timezone.utc)
+    return d.astimezone(APP_TIMEZONE).strftime("%d/%m/%Y")
+
+
+def _task_pipeline(user_id, date_range=None, limit=5):
+    pipeline = [
+        {"$match": {"assignedUsers.userId": user_id}},
+        {"$project": {"title": 1, "phaseDayId": 1}},
+        {"$lookup": {
+            "from": "phasedays",
+            "localField": "phaseDayId",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"date": 1, "phaseId": 1}}],
+            "as": "phaseDay",
+        }},
+        # Không lọc theo ngày thì vẫn giữ task thiếu phaseDay (hiển thị "Không rõ ngày")
+        {"$unwind": {"path": "$phaseDay", "preserveNullAndEmptyArrays": date_range is None}},
+    ]
+    if date_range is not None:
+        start, end = date_range
+        pipeline.append({"$match": {"phaseDay.date": {"$gte": start, "$lt": end}}})
+
+    # Chỉ join phase/campaign cho số task sẽ hiển thị; phần còn lại chỉ cần đếm
+    pipeline.append({"$facet": {
+        "total": [{"$count": "n"}],
+        "items": [
+            {"$limit": limit},
+            {"$lookup": {
+                "from": "phases",
+                "localField": "phaseDay.phaseId",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"name": 1, "campaignId": 1}}],
+                "as": "phase",
+            }},
+            {"$unwind": {"path": "$phase", "preserveNullAndEmptyArrays": True}},
+            {"$lookup": {
+                "from": "campaigns",
+                "localField": "phase.campaignId",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"name": 1}}],
+                "as": "campaign",
+            }},
+            {"$unwind": {"path": "$campaign", "preserveNullAndEmptyArrays": True}},
+            {"$project": {
+                "_id": 0,
+                "title": 1,
+                "date": "$phaseDay.date",
+                "phaseName": "$phase.name",
+                "campaignName": "$campaign.name",
+            }},
+        ],
+    }})
+    return pipeline
+
+
+async def resolve_user_tasks(user_id, date_range=None, limit=5):
+    """Trả về (tổng số task, danh sách tối đa `limit` task đã kèm tên).
+
+    Mỗi phần tử là (title, ngày, tên giai đoạn, tên chiến dịch).
+    """
+    docs = await task_collection.aggregate(_task_pipeline(user_id, date_range, limit)).to_list(1)
+    result = docs[0] if docs else {}
+    total = (result.get("total") or [{"n": 0}])[0]["n"]
+    items = [
+        (
+            t.get("title", "(Không tên nhiệm vụ)"),
+            format_local_date(t.get("date")),
+            t.get("phaseName", "Không rõ giai đoạn"),
+            t.get("campaignName", "Không rõ chiến dịch"),
+        )
+        for t in result.get("items", [])
+    ]
+    return total, items
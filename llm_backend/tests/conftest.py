@@ -0,0 +1,11 @@
+# llm_backend/tests/conftest.py
+# Test chạy offline: Mongo / OpenAI chỉ cần URI + key giả để import module (client kết nối lười),
+# thư mục llm_backend nằm trên sys.path như khi chạy `uvicorn main:app` trong đó.
+import os
+import sys
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("JWT_SECRET_ACCESS_TOKEN", "test-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+# llm_backend/tests/test_cache.py
+import itertools
+import threading
+
+import pytest
+
+import cache
+from cache import LRUTTLCache
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic giả để kiểm tra TTL mà không phải sleep."""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make(maxsize=3, ttl=60):
+    # Counter metrics dùng chung theo tên: mỗi test một tên riêng
+    return LRUTTLCache(f"test_{next(_names)}", maxsize=maxsize, ttl=ttl)
+
+
+def test_evicts_least_recently_used():
+    c = make(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1  # "a" thành mới dùng nhất
+    c.set("c", 3)
+    assert "b" not in c
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.evictions.value == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    c = make(ttl=10)
+    c.set("a", 1)
+    c.set("b", 2, ttl=30)
+    clock[0] += 11
+    assert c.get("a") is None
+    assert c.get("b") == 2
+    assert [k for k, _ in c.items()] == ["b"]
+    assert len(c) == 1  # entry hết hạn bị xoá khi đọc tới
+
+
+def test_ttl_none_never_expires(clock):
+    c = make(ttl=None)
+    c.set("a", 1)
+    clock[0] += 10 ** 9
+    assert c.get("a") == 1
+
+
+def test_stats_count_hits_and_misses():
+    c = make()
+    c.set("a", 1)
+    c.get("a")
+    c.get("a")
+    c.get("missing")
+    assert "a" in c  # __contains__ không tính vào hit/miss
+    stats = c.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 1, 0.6667)
+
+
+def test_pop_and_clear():
+    c = make()
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.pop("a") == 1 and c.pop("a", "gone") == "gone"
+    c.clear()
+    assert len(c) == 0
+
+
+def test_concurrent_writers_keep_size_bounded():
+    c = make(maxsize=50)
+
+    def writer(offset):
+        for i in range(500):
+            c.set(offset + i, i)
+            c.get(offset + i // 2)
+
+    threads = [threading.Thread(target=writer, args=(n * 1000,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(c) == 50
@@ -0,0 +1,175 @@
+# llm_backend/tests/test_checkin_bulk.py
+import asyncio
+import io
+import json
+import zipfile
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+import checkin
+from checkin import BulkCheckinError, _bulk_results, parse_bulk_items, parse_bulk_zip
+from face_app import read_bulk_body
+
+USER = "65f1c2a4b1e2c3d4e5f60718"
+IDS = {"campaignId": "c1", "phaseId": "p1", "phasedayId": "d1"}
+
+
+def _zip(manifest, files=None):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        if manifest is not None:
+            archive.writestr(checkin.BULK_MANIFEST, json.dumps(manifest))
+        for name, data in (files or {}).items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_parse_items_reports_per_item_errors():
+    records = parse_bulk_items([
+        {"user_id": USER.upper(), "image": "b64", **IDS},
+        {"user_id": USER, **IDS},
+        {"user_id": "abc", "image": "b64", **IDS},
+        {"user_id": USER, "image": "b64", "campaignId": "c1"},
+        "không phải object",
+    ])
+    assert records[0] == {"index": 0, "user_id": USER, "image": "b64", **IDS}
+    assert records[1]["error"] == "Thiếu tham số: image"
+    assert records[2]["error"] == "user_id không hợp lệ"
+    assert records[3]["error"] == "Thiếu tham số: phaseId, phasedayId"
+    assert records[4] == {"index": 4, "error": "Bản ghi không hợp lệ"}
+
+
+@pytest.mark.parametrize("items", [[], None, {"user_id": USER}])
+def test_parse_items_rejects_empty_batches(items):
+    with pytest.raises(BulkCheckinError, match="rỗng"):
+        parse_bulk_items(items)
+
+
+def test_parse_items_caps_batch_size(monkeypatch):
+    monkeypatch.setattr(checkin, "BULK_CHECKIN_MAX_ITEMS", 2)
+    with pytest.raises(BulkCheckinError, match="Tối đa 2"):
+        parse_bulk_items([{"user_id": USER, "image": "b64", **IDS}] * 3)
+
+
+def test_parse_zip_reads_images():
+    data = _zip(
+        [{"user_id": USER, "file": "a.jpg", **IDS}, {"user_id": USER, "file": "missing.jpg", **IDS}],
+        {"a.jpg": b"jpeg"},
+    )
+    records = parse_bulk_zip(data)
+    assert records[0]["image_bytes"] == b"jpeg"
+    assert records[1]["error"] == "Không có ảnh 'missing.jpg' trong file zip"
+
+
+@pytest.mark.parametrize("data,message", [
+    (_zip(None, {"a.jpg": b"jpeg"}), "thiếu manifest.json"),
+    (b"not a zip", "File zip không hợp lệ"),
+    (_zip(None, {checkin.BULK_MANIFEST: b"{"}), "File zip không hợp lệ"),
+    (_zip([]), "rỗng"),
+])
+def test_parse_zip_rejects_bad_archives(data, message):
+    with pytest.raises(BulkCheckinError, match=message):
+        parse_bulk_zip(data)
+
+
+def test_parse_zip_caps_manifest_size(monkeypatch):
+    monkeypatch.setattr(checkin, "MANIFEST_MAX_BYTES", 10)
+    with pytest.raises(BulkCheckinError, match="quá lớn"):
+        parse_bulk_zip(_zip([{"user_id": USER, "file": "a.jpg", **IDS}]))
+
+
+def test_parse_zip_oversize_image_is_item_error(monkeypatch):
+    monkeypatch.setattr(checkin, "BULK_CHECKIN_MAX_IMAGE_BYTES", 4)
+    records = parse_bulk_zip(_zip(
+        [{"user_id": USER, "file": "big.jpg", **IDS}, {"user_id": USER, "file": "ok.jpg", **IDS}],
+        {"big.jpg": b"x" * 5, "ok.jpg": b"x" * 4},
+    ))
+    assert records[0]["error"] == "Ảnh 'big.jpg' vượt 4 byte"
+    assert "image_bytes" not in records[0]
+    assert records[1]["image_bytes"] == b"x" * 4
+
+
+def test_parse_zip_caps_total_unzipped_size(monkeypatch):
+    monkeypatch.setattr(checkin, "BULK_CHECKIN_MAX_UNZIPPED_BYTES", 7)
+    data = _zip(
+        [{"user_id": USER, "file": "a.jpg", **IDS}, {"user_id": USER, "file": "b.jpg", **IDS}],
+        {"a.jpg": b"x" * 4, "b.jpg": b"x" * 4},
+    )
+    with pytest.raises(BulkCheckinError, match="cần 8"):
+        parse_bulk_zip(data)
+
+
+def _request(chunks, headers=()):
+    messages = [{"type": "http.request", "body": c, "more_body": True} for c in chunks]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return messages.pop(0)
+
+    return Request({"type": "http", "method": "POST", "headers": list(headers)}, receive)
+
+
+def test_read_bulk_body_stops_at_limit():
+    assert asyncio.run(read_bulk_body(_request([b"abc", b"de"]), limit=5)) == b"abcde"
+    # Không có Content-Length: đọc tới đâu đếm tới đó
+    with pytest.raises(BulkCheckinError, match="vượt 5 byte"):
+        asyncio.run(read_bulk_body(_request([b"abc", b"def"]), limit=5))
+    with pytest.raises(BulkCheckinError, match="vượt 5 byte"):
+        asyncio.run(read_bulk_body(_request([], [(b"content-length", b"6")]), limit=5))
+
+
+@pytest.mark.parametrize("body,expected", [
+    ({"results": [{"status": 201, "message": "ok"}, {"status": 409}]}, [(201, "ok"), (409, None)]),
+    ({"results": [{"status": 201}]}, None),  # thiếu kết quả
+    ({"results": [{"status": 201}, "lỗi"]}, None),
+    ({"results": None}, None),
+    ([1, 2], None),
+])
+def test_bulk_results_shape(body, expected):
+    assert _bulk_results(httpx.Response(200, json=body), 2) == expected
+
+
+def test_bulk_results_rejects_non_json():
+    assert _bulk_results(httpx.Response(200, text="<html>"), 1) is None
+
+
+@pytest.fixture
+def node(monkeypatch):
+    """Node backend giả: /checkin/bulk trả `bulk` (status, body), /checkin trả 201."""
+    state = {"bulk": (200, {"results": []}), "paths": []}
+
+    def handler(request):
+        state["paths"].append(request.url.path)
+        if request.url.path == "/checkin/bulk":
+            status, body = state["bulk"]
+            return httpx.Response(status, json=body)
+        return httpx.Response(201, text="ok")
+
+    client = httpx.AsyncClient(base_url="http://node", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(checkin.http_client, "_client", client)
+    monkeypatch.setattr(checkin, "_bulk_endpoint", True)
+    yield state
+    asyncio.run(client.aclose())
+
+
+def test_post_checkins_uses_bulk_results(node):
+    node["bulk"] = (200, {"results": [{"status": 201, "message": "ok"}, {"status": 409, "message": "trùng"}]})
+    assert asyncio.run(checkin.post_checkins([{}, {}])) == [(201, "ok"), (409, "trùng")]
+    assert node["paths"] == ["/checkin/bulk"]
+
+
+def test_post_checkins_falls_back_on_mismatched_results(node):
+    node["bulk"] = (200, {"results": [{"status": 201}]})
+    assert asyncio.run(checkin.post_checkins([{}, {}])) == [(201, "ok"), (201, "ok")]
+    assert node["paths"] == ["/checkin/bulk", "/checkin", "/checkin"]
+    assert checkin._bulk_endpoint is True
+
+
+def test_post_checkins_remembers_missing_bulk_endpoint(node):
+    node["bulk"] = (404, {})
+    asyncio.run(checkin.post_checkins([{}]))
+    asyncio.run(checkin.post_checkins([{}]))
+    assert node["paths"] == ["/checkin/bulk", "/checkin", "/checkin"]
+    assert checkin._bulk_endpoint is False
@@ -0,0 +1,139 @@
+# llm_backend/tests/test_context_budget.py
+from datetime import datetime
+
+import pytest
+
+import context_budget
+from campaign_context import CampaignContext
+from context_budget import (ELLIPSIS, MIN_SECTION_TOKENS, ContextReport, context_mode, count_tokens,
+                            detect_question_types, fit_sections, summarize, truncate_tokens)
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Đếm theo số ký tự (len / 3 + 1) để kết quả không phụ thuộc tiktoken có tải được BPE hay không
+    monkeypatch.setattr(context_budget, "_get_encoding", lambda model=None: None)
+
+
+def _words(n):
+    return " ".join(f"từ{i}" for i in range(n))
+
+
+def test_count_tokens_estimate():
+    assert count_tokens("") == 0
+    assert count_tokens("a" * 30) == 11
+
+
+def test_truncate_tokens_cuts_at_word_boundary():
+    text = _words(100)
+    short = truncate_tokens(text, 20)
+    assert short.endswith(ELLIPSIS)
+    assert count_tokens(short) <= 20
+    assert text.startswith(short[:-1]) and text[len(short) - 1] == " "
+    assert truncate_tokens("ngắn", 20) == "ngắn"
+    assert truncate_tokens(text, 0) == ""
+
+
+def test_summarize_keeps_leading_sentences():
+    text = "Câu mở đầu ngắn. " + "Câu phụ rất dài " + _words(60) + ". Câu cuối."
+    summary = summarize(text, 15)
+    assert summary == "Câu mở đầu ngắn. " + ELLIPSIS
+    assert summarize("  Một   câu.  ", 15) == "Một câu."
+    # Câu đầu đã quá dài thì cắt chính câu đó
+    assert summarize(_words(60) + ". Câu sau.", 15).endswith(ELLIPSIS)
+
+
+def test_fit_sections_within_budget():
+    sections = [("a" * 30, 11), ("b" * 30, 11)]
+    assert fit_sections(sections, 50) == ("a" * 30 + "\n" + "b" * 30, 22)
+
+
+def test_fit_sections_truncates_section_that_overflows():
+    text, used = fit_sections([("a" * 30, 11), (_words(100), 170)], 11 + MIN_SECTION_TOKENS + 5)
+    first, second = text.split("\n")
+    assert first == "a" * 30
+    assert second.endswith(ELLIPSIS)
+    assert used == 11 + count_tokens(second) <= 11 + MIN_SECTION_TOKENS + 5
+
+
+def test_fit_sections_drops_section_with_too_little_room():
+    sections = [("a" * 30, 11), (_words(100), 170), ("c", 1)]
+    assert fit_sections(sections, 11 + MIN_SECTION_TOKENS - 1) == ("a" * 30, 11)
+
+
+def test_fit_sections_stops_when_budget_spent():
+    sections = [("a" * 30, 11), ("b", 1)]
+    assert fit_sections(sections, 11) == ("a" * 30, 11)
+    assert fit_sections(sections, 0) == ("", 0)
+
+
+@pytest.mark.parametrize("question,types", [
+    ("Chiến dịch bắt đầu khi nào và tổ chức ở đâu?", ["dates", "location"]),
+    ("Có cấp giấy chứng nhận không", ["certificates"]),
+    ("Còn bao nhiêu người đăng ký được?", ["volunteers"]),
+    ("Giới thiệu chiến dịch", []),
+])
+def test_detect_question_types(question, types):
+    assert detect_question_types(question) == types
+
+
+def test_context_mode(monkeypatch):
+    monkeypatch.setattr(context_budget, "CONTEXT_COMPACT", False)
+    assert context_mode() == "full"
+    monkeypatch.setattr(context_budget, "CONTEXT_COMPACT", True)
+    monkeypatch.setattr(context_budget, "CONTEXT_COMPACT_HOLDOUT", 0)
+    assert context_mode() == "compact"
+    monkeypatch.setattr(context_budget, "CONTEXT_COMPACT_HOLDOUT", 1.0)
+    assert context_mode() == "holdout"
+
+
+def test_report_tracks_saved_tokens_and_ttft(monkeypatch):
+    monkeypatch.setattr(context_budget, "_ttft_average", {})
+    full = ContextReport("full", [], 300, 300)
+    full.record(1.0)
+    compact = ContextReport("compact", ["dates"], 300, 120)
+    compact.record(0.5)
+    compact.record(1.5)
+    assert compact.saved == 180
+    assert context_budget._ttft_average == {"full": 1.0, "compact": pytest.approx(0.6)}
+
+
+# === Context chiến dịch: bản rút gọn theo loại câu hỏi ===
+
+def _campaign_doc(**overrides):
+    doc = {
+        "_id": "c1",
+        "name": "Mùa hè xanh",
+        "startDate": datetime(2026, 7, 1),
+        "endDate": datetime(2026, 8, 1),
+        "location": {"address": "Quận 1, TP.HCM"},
+        "description": "Dọn rác bờ biển. " + _words(200),
+        "volunteers": [{"status": "approved"}, {"status": "pending"}],
+        "certificatesIssued": False,
+    }
+    doc.update(overrides)
+    return doc
+
+
+def test_version_follows_rendered_context():
+    assert CampaignContext(_campaign_doc()).version == CampaignContext(_campaign_doc()).version
+    assert CampaignContext(_campaign_doc()).version != CampaignContext(_campaign_doc(name="Xuân tình nguyện")).version
+
+
+def test_compact_selects_sections_by_question_type():
+    context = CampaignContext(_campaign_doc())
+    text, tokens = context.compact(["location"], budget=1000)
+    assert "Mùa hè xanh" in text and "Quận 1" in text
+    assert "Mô tả" not in text and "Tình nguyện viên" not in text
+    assert tokens < context.full_tokens
+
+
+def test_compact_general_question_uses_summary_within_budget():
+    context = CampaignContext(_campaign_doc())
+    text, tokens = context.compact([], budget=1000)
+    assert "Dọn rác bờ biển." in text and ELLIPSIS in text  # mô tả đã tóm tắt
+    assert tokens < context.full_tokens
+
+    text, tokens = context.compact([], budget=40)
+    assert tokens <= 40
+    assert text.startswith("📌 Tên chiến dịch: Mùa hè xanh")
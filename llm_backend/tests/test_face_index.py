@@ -0,0 +1,109 @@
+# llm_backend/tests/test_face_index.py
+import asyncio
+
+import numpy as np
+from bson import ObjectId
+
+from face_index import FaceIndex, normalize
+
+DIM = 8
+
+
+def vec(seed: int):
+    return np.random.default_rng(seed).normal(size=DIM).astype(np.float32)
+
+
+class FakeUsers:
+    """Collection users giả: cursor trả docs, gọi during_load() giữa chừng (như /register chạy song song)."""
+
+    def __init__(self, docs, during_load=None):
+        self.docs = docs
+        self.during_load = during_load
+
+    def find(self, query, projection):
+        async def cursor():
+            for i, doc in enumerate(self.docs):
+                if i == 1 and self.during_load is not None:
+                    self.during_load()
+                await asyncio.sleep(0)
+                yield doc
+        return cursor()
+
+
+def test_search_returns_nearest_first():
+    index = FaceIndex(dim=DIM)
+    for i in range(20):
+        index.upsert(f"u{i}", vec(i))
+    matches = index.search(vec(7), k=3)
+    assert matches[0][0] == "u7"
+    assert abs(matches[0][1]) < 1e-5
+    assert [d for _, d in matches] == sorted(d for _, d in matches)
+
+
+def test_search_limited_to_candidates():
+    index = FaceIndex(dim=DIM)
+    for i in range(10):
+        index.upsert(f"u{i}", vec(i))
+    matches = index.search(vec(3), k=5, candidate_ids=["u1", "u2", "missing"])
+    assert {uid for uid, _ in matches} == {"u1", "u2"}
+    assert index.search(vec(3), candidate_ids=["missing"]) == []
+
+
+def test_upsert_replaces_existing_vector_and_grows():
+    index = FaceIndex(dim=DIM)
+    for i in range(40):  # vượt dung lượng ban đầu (16) vài lần
+        index.upsert(f"u{i}", vec(i))
+    index.upsert("u5", vec(100))
+    assert len(index) == 40
+    assert np.allclose(index.get("u5"), normalize(vec(100)))
+    assert index.search(vec(100), k=1)[0][0] == "u5"
+
+
+def test_load_skips_malformed_descriptors():
+    good, short = ObjectId(), ObjectId()
+    docs = [
+        {"_id": good, "faceDescriptor": vec(1).tolist()},
+        {"_id": short, "faceDescriptor": [0.1, 0.2]},
+        {"_id": ObjectId(), "faceDescriptor": []},
+    ]
+    index = FaceIndex(dim=DIM)
+    asyncio.run(index.load(FakeUsers(docs)))
+    assert index.loaded and len(index) == 1
+    assert index.get(str(good)) is not None and index.get(str(short)) is None
+
+
+def test_register_during_load_is_not_lost():
+    existing, changed = ObjectId(), ObjectId()
+    docs = [
+        {"_id": existing, "faceDescriptor": vec(1).tolist()},
+        # Snapshot đọc từ Mongo vẫn là descriptor cũ của `changed`
+        {"_id": changed, "faceDescriptor": vec(2).tolist()},
+    ]
+    index = FaceIndex(dim=DIM)
+
+    def register_while_loading():
+        index.upsert("new-user", vec(3))
+        index.upsert(str(changed), vec(4))
+
+    asyncio.run(index.load(FakeUsers(docs, during_load=register_while_loading)))
+    assert len(index) == 3
+    assert np.allclose(index.get("new-user"), normalize(vec(3)))
+    # Lần /register trong lúc nạp thắng bản snapshot cũ
+    assert np.allclose(index.get(str(changed)), normalize(vec(4)))
+    assert index.search(vec(4), k=1)[0][0] == str(changed)
+
+
+def test_startup_load_retries_after_failure(monkeypatch):
+    import face_app
+
+    attempts = []
+
+    async def flaky_load(collection):
+        attempts.append(collection)
+        if len(attempts) < 3:
+            raise RuntimeError("mongo down")
+
+    monkeypatch.setattr(face_app.face_index, "load", flaky_load)
+    monkeypatch.setattr(face_app, "FACE_INDEX_RETRY_DELAY", 0)
+    asyncio.run(asyncio.wait_for(face_app.load_face_index(), 5))
+    assert len(attempts) == 3
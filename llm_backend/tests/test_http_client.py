@@ -0,0 +1,69 @@
+# llm_backend/tests/test_http_client.py
+import asyncio
+
+import httpx
+import pytest
+
+import http_client
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Node backend giả: trả lần lượt các phản hồi trong `replies` (status hoặc exception), đếm số lần gọi."""
+    state = {"replies": [], "calls": []}
+
+    def handler(request):
+        state["calls"].append(request.method)
+        reply = state["replies"].pop(0) if state["replies"] else 200
+        if isinstance(reply, Exception):
+            raise reply
+        return httpx.Response(reply, json={"ok": reply == 200})
+
+    client = httpx.AsyncClient(base_url="http://node", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_client, "_client", client)
+    monkeypatch.setattr(http_client, "HTTP_RETRY_BACKOFF", 0)
+    yield state
+    asyncio.run(client.aclose())
+
+
+def test_get_retries_on_gateway_errors(backend):
+    backend["replies"] = [503, 502, 200]
+    response = asyncio.run(http_client.request("GET", "/campaigns"))
+    assert response.status_code == 200
+    assert backend["calls"] == ["GET"] * 3
+
+
+def test_gives_up_after_retries(backend):
+    backend["replies"] = [504, 504, 504, 200]
+    response = asyncio.run(http_client.request("GET", "/campaigns", retries=2))
+    assert response.status_code == 504
+    assert len(backend["calls"]) == 3
+
+
+def test_post_is_not_replayed_on_gateway_errors(backend):
+    # Node có thể đã ghi check-in trước khi proxy trả 502
+    backend["replies"] = [502, 200]
+    response = asyncio.run(http_client.post("/checkin", json={}))
+    assert response.status_code == 502
+    assert backend["calls"] == ["POST"]
+
+
+def test_post_marked_idempotent_is_retried(backend):
+    backend["replies"] = [503, 200]
+    response = asyncio.run(http_client.post("/checkin/bulk", json={}, idempotent=True))
+    assert response.status_code == 200
+    assert len(backend["calls"]) == 2
+
+
+def test_post_retries_connect_errors(backend):
+    backend["replies"] = [httpx.ConnectError("refused"), 201]
+    response = asyncio.run(http_client.post("/checkin", json={}))
+    assert response.status_code == 201
+    assert len(backend["calls"]) == 2
+
+
+def test_client_errors_are_not_retried(backend):
+    backend["replies"] = [409, 200]
+    response = asyncio.run(http_client.request("GET", "/checkin"))
+    assert response.status_code == 409
+    assert len(backend["calls"]) == 1
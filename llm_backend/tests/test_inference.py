@@ -0,0 +1,82 @@
+# llm_backend/tests/test_inference.py
+import asyncio
+import threading
+
+import pytest
+
+import inference
+from inference import InferenceExecutor, InferenceQueueFull
+
+
+def test_run_rejects_when_workers_and_queue_are_full():
+    release = threading.Event()
+
+    async def scenario():
+        executor = InferenceExecutor("thread", workers=1, max_queue=1)
+        try:
+            running = [asyncio.create_task(executor.run(release.wait, 5)) for _ in range(executor.capacity)]
+            await asyncio.sleep(0.05)
+            assert executor.pending == 2
+            with pytest.raises(InferenceQueueFull):
+                await executor.run(release.wait, 5)
+            release.set()
+            assert await asyncio.gather(*running) == [True, True]
+            assert executor.pending == 0
+            # Hết tải thì nhận job lại bình thường
+            assert await executor.run(sum, [1, 2]) == 3
+        finally:
+            release.set()
+            executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_pending_is_released_when_job_raises():
+    def boom():
+        raise RuntimeError("no face")
+
+    async def scenario():
+        executor = InferenceExecutor("thread", workers=1, max_queue=0)
+        try:
+            with pytest.raises(RuntimeError):
+                await executor.run(boom)
+            assert executor.pending == 0
+            assert await executor.run(len, "abc") == 3
+        finally:
+            executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_ready_only_after_warm_up(monkeypatch):
+    calls = []
+    monkeypatch.setattr(inference, "warm_up", lambda: calls.append("warm") or 0)
+
+    async def scenario():
+        executor = InferenceExecutor("thread", workers=1, max_queue=0)
+        try:
+            assert not executor.ready
+            await executor.warm_up()
+            assert executor.ready and calls == ["warm"]
+        finally:
+            executor.shutdown()
+        assert not executor.ready
+
+    asyncio.run(scenario())
+
+
+def test_invalid_mode_is_rejected():
+    with pytest.raises(ValueError):
+        InferenceExecutor("gpu")
+
+
+def test_not_ready_until_warm_up_and_face_index(monkeypatch):
+    import face_app
+
+    monkeypatch.setattr(face_app.executor, "ready", False)
+    monkeypatch.setattr(face_app.face_index, "loaded", False)
+    assert "warm-up" in face_app.not_ready_reason()
+    monkeypatch.setattr(face_app.executor, "ready", True)
+    assert "index" in face_app.not_ready_reason()
+    monkeypatch.setattr(face_app.face_index, "loaded", True)
+    assert face_app.not_ready_reason() is None
@@ -0,0 +1,116 @@
+# llm_backend/tests/test_rag_index.py
+import asyncio
+
+import numpy as np
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import rag.index as rag_index
+from cache import LRUTTLCache
+from rag.index import GENERAL, KnowledgeIndex, retrieve, worth_retrieving
+
+
+def _chunk(_id, vector, campaign_id=None, text=None):
+    return {
+        "_id": _id,
+        "text": text or f"nội dung {_id}",
+        "title": "",
+        "campaignId": campaign_id,
+        "embedding": np.asarray(vector, dtype=np.float32).tobytes(),
+    }
+
+
+@pytest.mark.parametrize("question,expected", [
+    ("ok", False),
+    ("cảm ơn", False),
+    ("hihi", False),
+    ("Ở đâu?", True),
+    ("Tại sao", True),
+    ("bao nhiêu", True),
+    ("quy định về đồng phục tình nguyện viên", True),
+])
+def test_worth_retrieving(question, expected):
+    assert worth_retrieving(question) is expected
+
+
+def test_refresh_is_incremental_and_search_respects_scope():
+    async def scenario():
+        collection = AsyncMongoMockClient()["test"]["knowledgeChunks"]
+        await collection.insert_many([
+            _chunk("a", [1, 0]),
+            _chunk("b", [0.9, 0.1], campaign_id="c1"),
+            _chunk("zero", [0, 0]),  # vector 0 bị bỏ qua
+        ])
+        index = KnowledgeIndex()
+        await index.refresh(collection)
+        loaded = len(index)
+
+        all_scopes = [c["text"] for _, c in index.search([1, 0], k=2)]
+        general = [c["text"] for _, c in index.search([1, 0], k=2, scope=GENERAL)]
+
+        await collection.delete_one({"_id": "a"})
+        await collection.insert_one(_chunk("c", [0, 1]))
+        await index.refresh(collection)
+        after = [c["text"] for _, c in index.search([0, 1], k=5, min_score=0.5)]
+        return loaded, all_scopes, general, after, len(index)
+
+    loaded, all_scopes, general, after, size = asyncio.run(scenario())
+    assert loaded == 2
+    assert all_scopes == ["nội dung a", "nội dung b"]
+    assert general == ["nội dung a"]
+    assert after == ["nội dung c"]
+    assert size == 2
+
+
+def test_search_ignores_mismatched_dimensions():
+    index = KnowledgeIndex()
+    assert index.search([1, 0]) == []
+    index._chunks["a"] = {"text": "", "title": "", "campaignId": None, "vector": np.array([1, 0], dtype=np.float32)}
+    index._rebuild()
+    assert index.search([1, 0, 0]) == []
+
+
+@pytest.fixture
+def loaded_index(monkeypatch):
+    index = KnowledgeIndex()
+    index._chunks["a"] = {"text": "đồng phục", "title": "", "campaignId": None,
+                          "vector": np.array([1, 0], dtype=np.float32)}
+    index._rebuild()
+    monkeypatch.setattr(rag_index, "knowledge_index", index)
+    monkeypatch.setattr(rag_index, "query_vectors", LRUTTLCache("test_rag_query_embeddings", maxsize=10, ttl=60))
+    return index
+
+
+def test_retrieve_reuses_query_embedding(loaded_index):
+    calls = []
+
+    async def embed(texts):
+        calls.append(texts)
+        return [[1.0, 0.0]]
+
+    async def scenario():
+        first = await retrieve("Quy định  đồng phục?", embed)
+        second = await retrieve("quy định đồng phục?", embed)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert [c["text"] for _, c in first] == ["đồng phục"]
+    assert first == second
+    assert len(calls) == 1
+
+
+def test_retrieve_survives_embedding_errors(loaded_index):
+    async def embed(texts):
+        raise RuntimeError("rate limited")
+
+    assert asyncio.run(retrieve("quy định đồng phục", embed)) == []
+    assert len(rag_index.query_vectors) == 0
+
+
+def test_retrieve_skips_embedding_when_index_empty(monkeypatch):
+    monkeypatch.setattr(rag_index, "knowledge_index", KnowledgeIndex())
+
+    async def embed(texts):
+        raise AssertionError("không được gọi embedding")
+
+    assert asyncio.run(retrieve("quy định đồng phục", embed)) == []
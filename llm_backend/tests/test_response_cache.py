@@ -0,0 +1,126 @@
+# llm_backend/tests/test_response_cache.py
+import asyncio
+import unicodedata
+from datetime import datetime
+
+import pytest
+
+import ai_logic
+from campaign_context import CampaignContext
+from response_cache import ResponseCache, context_version, normalize_question
+
+
+def test_normalize_question():
+    assert normalize_question("  Chiến dịch   bắt đầu KHI NÀO ?? ") == "chiến dịch bắt đầu khi nào"
+    # NFD (gõ dấu tách rời) và NFC cho cùng một key
+    assert normalize_question(unicodedata.normalize("NFD", "Ở đâu?")) == normalize_question("ở đâu")
+
+
+def test_context_version_tracks_content():
+    assert context_version("abc") == context_version("abc")
+    assert context_version("abc") != context_version("abd")
+    assert len(context_version("abc")) == 16
+
+
+def test_round_trip_is_scoped_by_campaign_and_context():
+    async def scenario():
+        cache = ResponseCache(maxsize=10, ttl=60)
+        answer, token = await cache.lookup("c1", "ctx v1", "Ở đâu?")
+        assert answer is None
+        await cache.store(token, "Quận 1")
+
+        assert (await cache.lookup("c1", "ctx v1", "ở đâu"))[0] == "Quận 1"
+        assert (await cache.lookup("c2", "ctx v1", "Ở đâu?"))[0] is None
+        assert (await cache.lookup("c1", "ctx v2", "Ở đâu?"))[0] is None
+
+    asyncio.run(scenario())
+
+
+def test_error_replies_are_not_cached():
+    async def scenario():
+        cache = ResponseCache(maxsize=10, ttl=60)
+        _, token = await cache.lookup("c1", "ctx", "Ở đâu?")
+        await cache.store(token, "Có lỗi khi gọi GPT")
+        await cache.store(token, "")
+        return await cache.lookup("c1", "ctx", "Ở đâu?")
+
+    assert asyncio.run(scenario())[0] is None
+
+
+def test_semantic_match_within_scope_only():
+    vectors = {"ở đâu": [1.0, 0.0], "tổ chức ở đâu": [0.99, 0.05], "khi nào": [0.0, 1.0]}
+
+    async def embed(texts):
+        return [vectors[t] for t in texts]
+
+    async def scenario():
+        cache = ResponseCache(embed=embed, maxsize=10, ttl=60, semantic=True, threshold=0.9)
+        _, token = await cache.lookup("c1", "ctx", "Ở đâu?")
+        await cache.store(token, "Quận 1")
+        return (
+            (await cache.lookup("c1", "ctx", "Tổ chức ở đâu?"))[0],
+            (await cache.lookup("c1", "ctx", "Khi nào?"))[0],
+            (await cache.lookup("c2", "ctx", "Tổ chức ở đâu?"))[0],
+        )
+
+    assert asyncio.run(scenario()) == ("Quận 1", None, None)
+
+
+# === Key cache trong answer_campaign_question: phiên bản context + loại câu hỏi ===
+
+def _campaign_doc(description="Dọn rác bờ biển."):
+    return {
+        "_id": "c1",
+        "name": "Mùa hè xanh",
+        "startDate": datetime(2026, 7, 1),
+        "endDate": datetime(2026, 8, 1),
+        "location": {"address": "Quận 1"},
+        "description": description,
+    }
+
+
+@pytest.fixture
+def campaign_chat(monkeypatch):
+    state = {"doc": _campaign_doc(), "mode": "compact", "gpt_calls": []}
+
+    async def build_campaign_context(campaign):
+        return CampaignContext(state["doc"])
+
+    async def call_openai_rag(context, user_input, intro=None, report=None):
+        state["gpt_calls"].append(context)
+        return f"trả lời {len(state['gpt_calls'])}"
+
+    async def retrieve(question, embed, scope=None):
+        return []
+
+    monkeypatch.setattr(ai_logic, "response_cache", ResponseCache(maxsize=10, ttl=60))
+    monkeypatch.setattr(ai_logic, "build_campaign_context", build_campaign_context)
+    monkeypatch.setattr(ai_logic, "call_openai_rag", call_openai_rag)
+    monkeypatch.setattr(ai_logic, "retrieve", retrieve)
+    monkeypatch.setattr(ai_logic, "context_mode", lambda: state["mode"])
+    return state
+
+
+def _ask(question):
+    return asyncio.run(ai_logic.answer_campaign_question(_campaign_doc(), question))
+
+
+def test_compact_and_full_share_cache(campaign_chat):
+    assert _ask("Chiến dịch ở đâu?") == "trả lời 1"
+    campaign_chat["mode"] = "full"
+    assert _ask("chiến dịch ở đâu") == "trả lời 1"
+    assert len(campaign_chat["gpt_calls"]) == 1
+
+
+def test_context_change_invalidates_cache(campaign_chat):
+    _ask("Chiến dịch ở đâu?")
+    campaign_chat["doc"] = _campaign_doc("Trồng cây.")
+    assert _ask("Chiến dịch ở đâu?") == "trả lời 2"
+
+
+def test_holdout_bypasses_cache(campaign_chat):
+    _ask("Chiến dịch ở đâu?")
+    campaign_chat["mode"] = "holdout"
+    assert _ask("Chiến dịch ở đâu?") == "trả lời 2"
+    campaign_chat["mode"] = "compact"
+    assert _ask("Chiến dịch ở đâu?") == "trả lời 1"
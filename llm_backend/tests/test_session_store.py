@@ -0,0 +1,78 @@
+# llm_backend/tests/test_session_store.py
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+import pytest
+
+from session_store import SessionStore, session_key
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _bearer(payload, secret=None, alg="HS256"):
+    """Access token ký giống Node backend (jsonwebtoken, HS256)."""
+    secret = secret or os.environ["JWT_SECRET_ACCESS_TOKEN"]
+    signing_input = f"{_b64(json.dumps({'alg': alg, 'typ': 'JWT'}).encode())}.{_b64(json.dumps(payload).encode())}"
+    signature = hmac.new(secret.encode("utf-8"), signing_input.encode("ascii"), hashlib.sha256).digest()
+    return f"Bearer {signing_input}.{_b64(signature)}"
+
+
+def test_verified_token_keys_on_user_id():
+    token = _bearer({"user_id": "u1", "token_type": 0, "exp": time.time() + 60})
+    assert session_key(token) == "user:u1"
+    # Token khác (đăng nhập lại) của cùng user vẫn cùng phiên
+    assert session_key(_bearer({"user_id": "u1", "token_type": 0})) == "user:u1"
+
+
+@pytest.mark.parametrize("payload,secret", [
+    ({"user_id": "u1", "token_type": 0}, "sai-secret"),
+    ({"user_id": "u1", "token_type": 1}, None),  # refresh token
+    ({"user_id": "u1", "token_type": 0, "exp": time.time() - 1}, None),
+])
+def test_unverified_token_keys_on_hash(payload, secret):
+    token = _bearer(payload, secret)
+    key = session_key(token, session_id="s1")
+    assert key == "token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+    assert "u1" not in key
+
+
+def test_guest_keys_on_session_id():
+    assert session_key(None, "s1") == "sid:s1"
+    assert session_key(None, None) is None
+
+
+def test_memory_touch_and_update():
+    async def scenario():
+        store = SessionStore(maxsize=10, ttl=60)
+        assert await store.touch("user:u1") == {}
+        await store.update("user:u1", campaign_id="c1")
+        session = await store.touch("user:u1")
+        session["campaignId"] = "khác"  # bản sao, không sửa phiên đang lưu
+        return await store.touch("user:u1"), await store.touch(None)
+
+    assert asyncio.run(scenario()) == ({"campaignId": "c1"}, {})
+
+
+def test_mongo_touch_refreshes_updated_at():
+    from mongomock_motor import AsyncMongoMockClient
+
+    async def scenario():
+        collection = AsyncMongoMockClient()["test"]["chatSessions"]
+        store = SessionStore(collection=collection, ttl=60)
+        assert await store.touch("sid:s1") == {}
+        await store.update("sid:s1", campaign_id="c1")
+        before = (await collection.find_one({"_id": "sid:s1"}))["updatedAt"]
+        session = await store.touch("sid:s1")
+        after = (await collection.find_one({"_id": "sid:s1"}))["updatedAt"]
+        return session, after >= before
+
+    session, refreshed = asyncio.run(scenario())
+    assert session["campaignId"] == "c1"
+    assert refreshed
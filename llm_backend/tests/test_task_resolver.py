@@ -0,0 +1,75 @@
+# llm_backend/tests/test_task_resolver.py
+import asyncio
+from datetime import datetime, timezone
+
+import task_resolver
+
+
+def test_today_range_uses_local_midnight():
+    # 20h UTC ngày 17 = 3h sáng ngày 18 giờ Việt Nam
+    start, end = task_resolver.today_range(datetime(2026, 10, 17, 20, tzinfo=timezone.utc))
+    assert start == datetime(2026, 10, 17, 17)
+    assert end == datetime(2026, 10, 18, 17)
+
+
+def test_week_range_starts_on_monday():
+    # 18/10/2026 là chủ nhật
+    start, end = task_resolver.week_range(datetime(2026, 10, 18, 5, tzinfo=timezone.utc))
+    assert start == datetime(2026, 10, 11, 17)
+    assert end == datetime(2026, 10, 18, 17)
+
+
+def test_format_local_date():
+    assert task_resolver.format_local_date(datetime(2026, 10, 17, 20)) == "18/10/2026"
+    assert task_resolver.format_local_date(None) == "Không rõ ngày"
+
+
+def test_pipeline_filters_by_date_only_when_given():
+    unfiltered = task_resolver._task_pipeline("u1")
+    assert unfiltered[3]["$unwind"]["preserveNullAndEmptyArrays"] is True
+    assert not any("phaseDay.date" in s.get("$match", {}) for s in unfiltered)
+
+    date_range = task_resolver.today_range()
+    filtered = task_resolver._task_pipeline("u1", date_range, limit=3)
+    assert filtered[3]["$unwind"]["preserveNullAndEmptyArrays"] is False
+    assert filtered[4] == {"$match": {"phaseDay.date": {"$gte": date_range[0], "$lt": date_range[1]}}}
+    assert filtered[-1]["$facet"]["items"][0] == {"$limit": 3}
+
+
+class FakeTasks:
+    """mongomock chưa hỗ trợ $lookup kèm pipeline → trả sẵn kết quả $facet."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return self
+
+    async def to_list(self, length):
+        return self.docs
+
+
+def test_resolve_user_tasks_fills_defaults(monkeypatch):
+    tasks = FakeTasks([{
+        "total": [{"n": 7}],
+        "items": [
+            {"title": "Phát quà", "date": datetime(2026, 10, 17, 20), "phaseName": "GĐ 1", "campaignName": "Mùa hè"},
+            {},
+        ],
+    }])
+    monkeypatch.setattr(task_resolver, "task_collection", tasks)
+
+    total, items = asyncio.run(task_resolver.resolve_user_tasks("u1", limit=2))
+    assert total == 7
+    assert items == [
+        ("Phát quà", "18/10/2026", "GĐ 1", "Mùa hè"),
+        ("(Không tên nhiệm vụ)", "Không rõ ngày", "Không rõ giai đoạn", "Không rõ chiến dịch"),
+    ]
+    assert len(tasks.pipelines) == 1
+
+
+def test_resolve_user_tasks_without_matches(monkeypatch):
+    monkeypatch.setattr(task_resolver, "task_collection", FakeTasks([{"total": [], "items": []}]))
+    assert asyncio.run(task_resolver.resolve_user_tasks("u1")) == (0, [])
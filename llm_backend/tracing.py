@@ -0,0 +1,179 @@
+# llm_backend/tracing.py
+# Đo thời gian từng giai đoạn trong một request (decode, ArcFace, Mongo, OpenAI...) và số query Mongo.
+# Giai đoạn chỉ được cộng vào RequestTrace của request hiện tại (contextvar); cuối request middleware
+# mới ghi vào histogram có label endpoint + stage, nên mỗi stage() chỉ tốn cỡ 1µs.
+# OpenTelemetry là tuỳ chọn: OTEL_TRACING=1 và có package opentelemetry-api thì mỗi stage là một span
+# (exporter do TracerProvider của process quyết định, vd chạy qua `opentelemetry-instrument`).
+import asyncio
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+OTEL_TRACING = os.getenv("OTEL_TRACING", "0") == "1"
+
+try:
+    from opentelemetry import trace as otel_trace
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+_tracer = otel_trace.get_tracer("vhht-llm-backend") if OTEL_TRACING and OTEL_AVAILABLE else None
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+mongo_commands = metrics.counter("mongo_commands_total", "Số lệnh gửi tới MongoDB")
+mongo_failed = metrics.counter("mongo_commands_failed_total", "Số lệnh MongoDB bị lỗi")
+
+_current = ContextVar("request_trace", default=None)
+# False khi Motor không copy contextvar sang thread pool (xem check_mongo_context): listener không biết
+# lệnh thuộc request nào, nên bỏ số query / thời gian Mongo theo request thay vì ghi số sai (toàn 0)
+_per_request_mongo = True
+_histograms = {}  # (tên, endpoint, stage) → histogram, tránh tra registry (có lock) mỗi request
+
+
+class RequestTrace:
+    __slots__ = ("stages", "mongo_queries", "mongo_seconds")
+
+    def __init__(self):
+        self.stages = {}  # stage → tổng giây (stage lặp lại trong request được cộng dồn)
+        self.mongo_queries = 0
+        self.mongo_seconds = 0.0
+
+
+def add_stage(name: str, seconds: float):
+    """Cộng thời gian vào stage của request hiện tại; ngoài request thì bỏ qua."""
+    trace = _current.get()
+    if trace is not None:
+        trace.stages[name] = trace.stages.get(name, 0.0) + seconds
+
+
+class stage:
+    """with stage("decode"): ...  — đo một giai đoạn của request hiện tại.
+    Viết thành class thay vì @contextmanager: rẻ hơn vài lần vì không phải tạo generator."""
+
+    __slots__ = ("name", "_t0", "_span")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._span = None
+
+    def __enter__(self):
+        if _tracer is not None:
+            self._span = _tracer.start_as_current_span(self.name)
+            self._span.__enter__()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        add_stage(self.name, time.perf_counter() - self._t0)
+        if self._span is not None:
+            self._span.__exit__(exc_type, exc, tb)
+        return False
+
+
+def _histogram(name: str, description: str, endpoint: str, stage_name: str = None, buckets=metrics.DEFAULT_BUCKETS):
+    key = (name, endpoint, stage_name)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        labels = {"endpoint": endpoint} if stage_name is None else {"endpoint": endpoint, "stage": stage_name}
+        histogram = _histograms[key] = metrics.histogram(name, description, buckets=buckets, labels=labels)
+    return histogram
+
+
+def _record(endpoint: str, trace: RequestTrace, elapsed: float):
+    _histogram("request_seconds", "Tổng thời gian xử lý request", endpoint).observe(elapsed)
+    for stage_name, seconds in trace.stages.items():
+        _histogram("request_stage_seconds", "Thời gian từng giai đoạn trong request", endpoint, stage_name).observe(seconds)
+    if not _per_request_mongo:
+        return
+    if trace.mongo_queries:
+        _histogram("request_stage_seconds", "Thời gian từng giai đoạn trong request", endpoint, "mongo").observe(
+            trace.mongo_seconds
+        )
+    _histogram("request_mongo_queries", "Số lệnh MongoDB mỗi request", endpoint,
+               buckets=QUERY_BUCKETS).observe(trace.mongo_queries)
+
+
+def count_mongo_query():
+    """Một lệnh Mongo của request hiện tại (gọi từ listener, hoặc từ Mongo giả trong benchmark)."""
+    mongo_commands.inc()
+    trace = _current.get()
+    if trace is not None:
+        trace.mongo_queries += 1
+
+
+async def check_mongo_context():
+    """Gọi lúc khởi động: listener chạy trên thread pool của Motor, chỉ thấy RequestTrace nếu
+    motor.frameworks.asyncio.run_on_executor copy contextvar (Motor 3.x có copy_context()).
+    Kiểm tra thật bằng chính hàm đó thay vì tin vào phiên bản."""
+    global _per_request_mongo
+    try:
+        from motor.frameworks import asyncio as motor_asyncio
+        probe = ContextVar("motor_context_probe", default=False)
+        token = probe.set(True)
+        try:
+            copied = await motor_asyncio.run_on_executor(asyncio.get_running_loop(), probe.get)
+        finally:
+            probe.reset(token)
+    except Exception as e:
+        copied = False
+        logger.warning(f"⚠️ Không kiểm tra được Motor có copy contextvar không: {e}")
+    _per_request_mongo = copied is True
+    if not _per_request_mongo:
+        logger.warning("⚠️ Motor không copy contextvar sang thread pool, bỏ số query Mongo theo request")
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Đếm lệnh Mongo theo request. Listener chạy trên thread pool của Motor và chỉ thấy RequestTrace
+    của request đã gửi lệnh nhờ Motor copy contextvar (check_mongo_context kiểm tra lúc khởi động)."""
+
+    def started(self, event):
+        count_mongo_query()
+
+    def succeeded(self, event):
+        trace = _current.get()
+        if trace is not None:
+            trace.mongo_seconds += event.duration_micros / 1e6
+
+    def failed(self, event):
+        mongo_failed.inc()
+        trace = _current.get()
+        if trace is not None:
+            trace.mongo_seconds += event.duration_micros / 1e6
+
+
+class TraceMiddleware:
+    """ASGI middleware: mở RequestTrace cho mỗi request HTTP, cuối request ghi histogram theo
+    route (path template như /users/{user_id}/face-image, không phải path thật)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trace = RequestTrace()
+        token = _current.set(trace)
+        span = None
+        if _tracer is not None:
+            span = _tracer.start_as_current_span(f"{scope['method']} {scope['path']}")
+            span.__enter__()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - t0
+            route = scope.get("route")
+            # Không khớp route nào (404) thì gom chung để không sinh label theo path tuỳ ý
+            endpoint = getattr(route, "path", None) or "unmatched"
+            _record(endpoint, trace, elapsed)
+            if span is not None:
+                span.__exit__(None, None, None)
+            _current.reset(token)
@@ -1,4 +1,12 @@
+import json
 import re
+from datetime import datetime
+
+# Biên dịch sẵn một lần khi import
+_NAME_AFTER_KEYWORD = re.compile(
+    r"chiến dịch\s+(.+?)(?=\s+(?:có|gồm|với|được|là)\b|\s*\?|\s*$)", re.IGNORECASE
+)
+_NAME_AFTER_VERB = re.compile(r"(?:tham gia|đăng ký|vào)\s+(chiến dịch\s+)?(.+)", re.IGNORECASE)
 
 def extract_campaign_name(text: str):
     """
@@ -11,13 +19,26 @@ def extract_campaign_name(text: str):
     text = text.replace("\n", " ")
 
     # Dạng 1: chứa từ "chiến dịch"
-    match1 = re.search(r"chiến dịch\s+(.+?)(?=\s+(có|gồm|với|được|là|\?|$))", text, re.IGNORECASE)
+    match1 = _NAME_AFTER_KEYWORD.search(text)
     if match1:
         return match1.group(1).strip().title()
 
     # Dạng 2: chứa từ "tham gia", "đăng ký", "vào" → lấy từ sau
-    match2 = re.search(r"(?:tham gia|đăng ký|vào)\s+(chiến dịch\s+)?(.+)", text, re.IGNORECASE)
+    match2 = _NAME_AFTER_VERB.search(text)
     if match2:
         return match2.group(2).strip().title()
 
     return None
+
+def format_date(d):
+    try:
+        if isinstance(d, str):
+            return datetime.strptime(d, "%Y-%m-%dT%H:%M:%S.%fZ").strftime("%d/%m/%Y")
+        return d.strftime("%d/%m/%Y")
+    except:
+        return str(d)
+
+def sse_event(payload: dict, event: str = None) -> str:
+    """Một event Server-Sent Events (dùng cho /chat/stream và /checkin/bulk)."""
+    lines = f"event: {event}\n" if event else ""
+    return lines + f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
@@ -1,6 +1,6 @@
 import express from 'express'
 import { wrapRequestHandler } from '../utils/handlers.js'
-import { postCheckin } from "../controllers/checkin.controller.js";
+import { postCheckin, postCheckinBulk } from "../controllers/checkin.controller.js";
 import { getCheckinList } from "../controllers/checkin.controller.js";
 import { accessTokenValidator } from '../middlewares/users.middlewares.js';
 
@@ -8,6 +8,8 @@ const checkinRoutes = express.Router()
 
 checkinRoutes.post("/", wrapRequestHandler(postCheckin));
 
+checkinRoutes.post("/bulk", wrapRequestHandler(postCheckinBulk));
+
 checkinRoutes.get("/:phasedayId", wrapRequestHandler(getCheckinList));
 
 export default checkinRoutes
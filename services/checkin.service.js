@@ -4,6 +4,7 @@ import PhaseDay from "../models/phaseDay.model.js"
 import Campaign from "../models/campaign.model.js";
 import User from "../models/users.model.js";
 import dayjs from "dayjs";
+import mongoose from "mongoose";
 
 export const createCheckin = async ({ userId, campaignId, phaseId, phasedayId, method }) => {
     const existed = await Checkin.findOne({ userId, phasedayId });
@@ -24,6 +25,76 @@ export const createCheckin = async ({ userId, campaignId, phaseId, phasedayId, m
     return { status: 201, message: "✅ Check-in đã được lưu!" };
 };
 
+// Ghi nhiều check-in một lượt (đồng bộ check-in offline từ llm_backend /checkin/bulk).
+// Trả về [{ status, message }] cùng thứ tự với items, mã status giống createCheckin.
+export const createCheckinsBulk = async (items) => {
+    const results = new Array(items.length);
+    const valid = [];
+    items.forEach((item, i) => {
+        const { userId, campaignId, phaseId, phasedayId, method } = item || {};
+        if (!userId || !campaignId || !phaseId || !phasedayId || !method) {
+            results[i] = { status: 400, message: "Thiếu thông tin bắt buộc." };
+        } else if (!["face", "manual"].includes(method)) {
+            results[i] = { status: 400, message: "Phương thức check-in không hợp lệ." };
+        } else if (![userId, campaignId, phaseId, phasedayId].every(id => mongoose.Types.ObjectId.isValid(id))) {
+            results[i] = { status: 400, message: "Id không hợp lệ." };
+        } else {
+            valid.push(i);
+        }
+    });
+    if (valid.length === 0) return results;
+
+    // Một query cho mọi cặp (userId, phasedayId) thay vì findOne từng cái
+    const existed = await Checkin.find(
+        { $or: valid.map(i => ({ userId: items[i].userId, phasedayId: items[i].phasedayId })) },
+        "userId phasedayId"
+    ).lean();
+    const seen = new Set(existed.map(c => `${c.userId}:${c.phasedayId}`));
+
+    const toInsert = [];
+    for (const i of valid) {
+        const key = `${items[i].userId}:${items[i].phasedayId}`;
+        if (seen.has(key)) {
+            results[i] = { status: 409, message: "Đã check-in hôm nay rồi!" };
+        } else {
+            seen.add(key);
+            toInsert.push(i);
+        }
+    }
+    if (toInsert.length === 0) return results;
+
+    const docs = toInsert.map(i => {
+        const { userId, campaignId, phaseId, phasedayId, method } = items[i];
+        return { userId, campaignId, phaseId, phasedayId, method, createdAt: new Date() };
+    });
+    const failed = new Map();
+    try {
+        await Checkin.insertMany(docs, { ordered: false });
+    } catch (err) {
+        if (!err.writeErrors) throw err;
+        for (const writeError of err.writeErrors) {
+            failed.set(writeError.index, writeError);
+        }
+    }
+    toInsert.forEach((i, pos) => {
+        const writeError = failed.get(pos);
+        if (!writeError) {
+            results[i] = { status: 201, message: "✅ Check-in đã được lưu!" };
+            return;
+        }
+        // Mongoose có thể trả WriteError của driver hoặc bản sao { err, index }
+        const code = writeError.code ?? writeError.err?.code;
+        if (code === 11000) {
+            // Trùng unique index (userId, phasedayId) do request khác ghi chen vào: coi như đã check-in
+            results[i] = { status: 409, message: "Đã check-in hôm nay rồi!" };
+        } else {
+            const detail = writeError.errmsg ?? writeError.err?.errmsg ?? writeError.message ?? "không rõ";
+            results[i] = { status: 500, message: `Không lưu được check-in: ${detail}` };
+        }
+    });
+    return results;
+};
+
 export const getCheckinStatusByPhaseday = async (phasedayId) => {
     const phaseday = await PhaseDay.findById(phasedayId);
     if (!phaseday) throw new Error("Phaseday không tồn tại");